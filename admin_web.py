@@ -3,9 +3,18 @@ from __future__ import annotations
 
 import uvicorn
 
-from app.config import ADMIN_WEB_BIND, ADMIN_WEB_PORT
-from app.webadmin.server import app
+from app.config import ADMIN_WEB_BIND, ADMIN_WEB_PORT, ADMIN_WEB_WORKERS
+from app.db import init_db
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host=ADMIN_WEB_BIND, port=ADMIN_WEB_PORT, reload=False)
+    # migrate once up front; every worker runs init_db again, but then finds nothing to do
+    init_db()
+    uvicorn.run(
+        "app.webadmin.server:create_admin_app",
+        factory=True,
+        host=ADMIN_WEB_BIND,
+        port=ADMIN_WEB_PORT,
+        workers=ADMIN_WEB_WORKERS,
+        reload=False,
+    )
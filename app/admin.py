@@ -1,16 +1,22 @@
+import asyncio
+
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from datetime import datetime
+from html import escape
 
 from .config import CURRENCY, ADMIN_IDS
 from .db import db_execute
+from .metrics import HANDLER_SECONDS, UPDATES_TOTAL
+from .profiler import ProfilerBusy, current_profile, parse_target, start_profile, stop_profile
+from .watchdog import monitor as loop_monitor
 from .states import AdminStates
 from .keyboards import kb_admin_actions
 from .utils import is_admin
 
-router = Router()
+router = Router(name="admin")
 
 @router.message(Command("admin"))
 async def on_admin_cmd(m: Message):
@@ -27,7 +33,9 @@ async def on_admin_cmd(m: Message):
         "– برای هر سفارش جدید، اعلان دریافت می‌کنید و با دکمه‌های زیر پیام می‌گیرید.\n"
         "– دستورات کاربردی:\n"
         "/pending - لیست 10 سفارش منتظر تایید\n"
-        "/search <id> - نمایش یک سفارش"
+        "/search <id> - نمایش یک سفارش\n"
+        "/stats - تاخیر حلقه رویداد و کندترین هندلرها\n"
+        "/profile <handler|user:id|all> [ثانیه|تعدادu] - پروفایل نمونه‌برداری"
     )
     await m.answer(text)
 
@@ -61,7 +69,7 @@ async def on_admin_search(m: Message):
         await m.answer("استفاده درست: /search 123")
         return
     oid = int(parts[1])
-    row = db_execute("SELECT * FROM orders WHERE id=?", (oid,), fetchone=True)
+    row = db_execute("SELECT * FROM order_view WHERE id=?", (oid,), fetchone=True)
     if not row:
         await m.answer("سفارش یافت نشد.")
         return
@@ -74,6 +82,86 @@ async def on_admin_search(m: Message):
     )
     await m.answer(text, reply_markup=kb_admin_actions(row["id"]))
 
+@router.message(Command("stats"))
+async def on_admin_stats(m: Message):
+    if not is_admin(m.from_user.id, ADMIN_IDS):
+        await m.answer("دسترسی ادمین ندارید.")
+        return
+    loop = loop_monitor.stats()
+    lines = [
+        "📊 وضعیت ربات",
+        f"آپدیت‌های دریافتی: <b>{int(UPDATES_TOTAL.total())}</b>",
+        "",
+        f"⏱ تاخیر حلقه رویداد ({loop['window_samples']} نمونه اخیر):",
+        f"p50: {loop['lag_p50_ms']} ms | p99: {loop['lag_p99_ms']} ms | بیشینه: {loop['lag_max_ms']} ms",
+        f"انسداد بیش از {loop['threshold_ms']:.0f} ms: <b>{loop['stalls']}</b> بار",
+    ]
+    for stall in loop["recent_stalls"][:3]:
+        duration = f"{stall['duration_ms']:.0f} ms" if stall["duration_ms"] is not None else "در جریان"
+        when = datetime.fromtimestamp(stall["at"]).strftime("%H:%M:%S")
+        lines.append(f"– {when} | {duration} | <code>{escape(stall['where'])}</code>")
+    slowest = sorted(HANDLER_SECONDS.series().items(), key=lambda item: item[1][1], reverse=True)[:5]
+    if slowest:
+        lines += ["", "🐢 هندلرها با بیشترین زمان کل:"]
+        for (router_name, handler), (count, total) in slowest:
+            lines.append(
+                f"– <code>{escape(router_name)}.{escape(handler)}</code> | {count} بار | میانگین {total / count * 1000:.1f} ms"
+            )
+    await m.answer("\n".join(lines))
+
+PROFILE_USAGE = (
+    "استفاده درست:\n"
+    "/profile cb_receipt_confirm 60 — نمونه‌برداری از یک هندلر به مدت ۶۰ ثانیه\n"
+    "/profile user:123456 20u — ۲۰ آپدیت بعدی یک کاربر\n"
+    "/profile all 30 — کل ربات\n"
+    "/profile stop — توقف و ذخیره"
+)
+
+async def _report_profile(m: Message, session):
+    try:
+        path = await session.wait()
+    except Exception:
+        await m.answer("❌ ذخیره پروفایل با خطا مواجه شد.")
+        return
+    await m.answer(
+        f"✅ پروفایل <code>{escape(session.describe())}</code> ذخیره شد.\n"
+        f"نمونه‌ها: {session.samples} | آپدیت‌ها: {session.handled}\n"
+        f"فایل: <code>{escape(path.name)}</code> (بخش «پروفایل‌ها» در پنل مدیریت)"
+    )
+
+@router.message(Command("profile"))
+async def on_admin_profile(m: Message):
+    if not is_admin(m.from_user.id, ADMIN_IDS):
+        await m.answer("دسترسی ادمین ندارید.")
+        return
+    parts = m.text.strip().split()
+    if len(parts) < 2:
+        running = current_profile()
+        status_line = f"در حال اجرا: <code>{escape(running.describe())}</code>\n\n" if running else ""
+        await m.answer(status_line + PROFILE_USAGE)
+        return
+    if parts[1] == "stop":
+        if stop_profile() is None:
+            await m.answer("پروفایلی در حال اجرا نیست.")
+        return
+    limit = parts[2] if len(parts) > 2 else "30"
+    try:
+        options = parse_target(parts[1])
+        if limit.endswith("u"):
+            options["updates"] = int(limit[:-1])
+        else:
+            options["seconds"] = int(limit)
+    except ValueError:
+        await m.answer(PROFILE_USAGE)
+        return
+    try:
+        session = start_profile("bot", **options)
+    except ProfilerBusy:
+        await m.answer("یک پروفایل در حال اجراست؛ ابتدا /profile stop را بزنید.")
+        return
+    await m.answer(f"⏺ نمونه‌برداری شروع شد: <code>{escape(session.describe())}</code>")
+    asyncio.create_task(_report_profile(m, session))
+
 @router.callback_query(F.data.startswith("admin:"))
 async def on_admin_action(c: CallbackQuery, state: FSMContext):
     if not is_admin(c.from_user.id, ADMIN_IDS):
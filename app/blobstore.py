@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .config import BLOB_STORE_DIR, BLOB_STORE_MAX_AGE_DAYS, BLOB_STORE_MAX_MB
+from .db import delete_blob_content, get_blob, list_blob_contents, save_blob, touch_blob
+
+log = logging.getLogger(__name__)
+
+BLOB_ROOT = Path(BLOB_STORE_DIR)
+THUMB_SIZE = (320, 320)
+# last_access only feeds eviction, which is by the day; don't write it on every read
+TOUCH_INTERVAL = timedelta(hours=1)
+
+
+@dataclass(frozen=True)
+class Blob:
+    sha256: str
+    size: int
+    media_type: str
+    filename: str
+    path: Path
+    thumb_path: Path | None
+
+
+def blob_path(sha256: str) -> Path:
+    return BLOB_ROOT / sha256[:2] / sha256
+
+
+def thumb_path(sha256: str) -> Path:
+    return BLOB_ROOT / "thumbs" / f"{sha256}.jpg"
+
+
+def _row_to_blob(row: dict) -> Blob:
+    sha = row["sha256"]
+    thumb = thumb_path(sha) if int(row.get("has_thumb") or 0) else None
+    return Blob(
+        sha256=sha,
+        size=int(row.get("size") or 0),
+        media_type=row.get("media_type") or "application/octet-stream",
+        filename=row.get("filename") or sha,
+        path=blob_path(sha),
+        thumb_path=thumb,
+    )
+
+
+def lookup(file_id: str) -> Blob | None:
+    if not file_id:
+        return None
+    row = get_blob(file_id)
+    if not row:
+        return None
+    blob = _row_to_blob(row)
+    if not blob.path.exists():
+        return None
+    stale = (datetime.now() - TOUCH_INTERVAL).isoformat(timespec="seconds")
+    if (row.get("last_access") or "") < stale:
+        touch_blob(file_id)
+    return blob
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # unique per writer: the bot and several admin workers may store the same content
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    finally:
+        Path(tmp).unlink(missing_ok=True)
+
+
+def _make_thumb(sha256: str, data: bytes) -> bool:
+    target = thumb_path(sha256)
+    if target.exists():
+        return True
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.thumbnail(THUMB_SIZE)
+            out = io.BytesIO()
+            img.convert("RGB").save(out, "JPEG", quality=80)
+    except Exception:
+        # not an image (pdf receipts etc.)
+        return False
+    _write_atomic(target, out.getvalue())
+    return True
+
+
+def store(file_id: str, data: bytes, media_type: str | None, filename: str | None) -> Blob:
+    """Save ``data`` under its content hash; identical files are stored once."""
+
+    sha = hashlib.sha256(data).hexdigest()
+    path = blob_path(sha)
+    if not path.exists():
+        _write_atomic(path, data)
+    has_thumb = bool(media_type and media_type.startswith("image/")) and _make_thumb(sha, data)
+    save_blob(file_id, sha, len(data), media_type, filename, has_thumb)
+    return Blob(
+        sha256=sha,
+        size=len(data),
+        media_type=media_type or "application/octet-stream",
+        filename=filename or sha,
+        path=path,
+        thumb_path=thumb_path(sha) if has_thumb else None,
+    )
+
+
+def evict(max_bytes: int | None = None, max_age_days: int | None = None) -> int:
+    """Drop least recently used content beyond the size limit or older than the age limit."""
+
+    if max_bytes is None:
+        max_bytes = BLOB_STORE_MAX_MB * 1024 * 1024
+    if max_age_days is None:
+        max_age_days = BLOB_STORE_MAX_AGE_DAYS
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat(timespec="seconds")
+    contents = list_blob_contents()
+    total = sum(int(row.get("size") or 0) for row in contents)
+    removed = 0
+    for row in contents:
+        too_old = (row.get("last_access") or "") < cutoff
+        if total <= max_bytes and not too_old:
+            break
+        sha = row["sha256"]
+        blob_path(sha).unlink(missing_ok=True)
+        thumb_path(sha).unlink(missing_ok=True)
+        delete_blob_content(sha)
+        total -= int(row.get("size") or 0)
+        removed += 1
+    if removed:
+        log.info("blob store evicted %s items", removed)
+    return removed
+
+
+__all__ = ["Blob", "evict", "lookup", "store"]
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from aiogram import Router
+from aiogram.filters import Filter
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery
+
+CallbackHandler = Callable[..., Awaitable[Any]]
+
+SEPARATOR = ":"
+
+_CONVERTERS: dict[str, Callable[[str], Any]] = {"str": str, "int": int}
+# "{name:spec}" may itself contain the separator, so split outside braces only
+_SEGMENT_RE = re.compile(r"\{[^}]*\}|[^%s]+" % re.escape(SEPARATOR))
+
+
+def _split_pattern(pattern: str) -> list[str]:
+    return _SEGMENT_RE.findall(pattern)
+
+
+@dataclass(frozen=True)
+class CallbackRoute:
+    pattern: str
+    handler: CallbackHandler
+
+    def build(self, **params: Any) -> str:
+        """Render ``callback_data`` for this route, e.g. ``route.build(order_id=5)``."""
+
+        parts = []
+        for segment in _split_pattern(self.pattern):
+            if segment.startswith("{"):
+                name = segment[1:-1].partition(":")[0]
+                parts.append(str(params[name]))
+            else:
+                parts.append(segment)
+        return SEPARATOR.join(parts)
+
+
+class _Param:
+    __slots__ = ("name", "spec", "convert")
+
+    def __init__(self, segment: str) -> None:
+        name, _, spec = segment[1:-1].partition(":")
+        if not name:
+            raise ValueError(f"Empty parameter name in {segment!r}")
+        self.name = name
+        self.spec = spec or "str"
+        if self.spec in _CONVERTERS:
+            self.convert = _CONVERTERS[self.spec]
+        else:
+            # "{mode:my|pre}" only matches one of the listed values
+            choices = frozenset(self.spec.split("|"))
+
+            def _choice(value: str) -> str:
+                if value not in choices:
+                    raise ValueError(value)
+                return value
+
+            self.convert = _choice
+
+
+class _Node:
+    __slots__ = ("children", "param", "child", "route")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.param: _Param | None = None
+        self.child: _Node | None = None
+        self.route: CallbackRoute | None = None
+
+
+class CallbackTable:
+    """``callback_data`` dispatcher: exact strings in a dict, patterns in a segment trie.
+
+    Patterns are ``:``-separated; ``{name}``, ``{name:int}`` and ``{name:a|b}``
+    segments are passed to the handler as keyword arguments::
+
+        @callbacks.route("cart:cancel:{order_id:int}")
+        async def cb_cancel(callback, state, order_id): ...
+    """
+
+    def __init__(self) -> None:
+        self._exact: dict[str, CallbackRoute] = {}
+        self._root = _Node()
+        self._routes: list[CallbackRoute] = []
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    @property
+    def routes(self) -> list[CallbackRoute]:
+        return list(self._routes)
+
+    def add(self, pattern: str, handler: CallbackHandler) -> CallbackRoute:
+        route = CallbackRoute(pattern, handler)
+        if "{" not in pattern:
+            if pattern in self._exact:
+                raise ValueError(f"Duplicate callback route {pattern!r}")
+            self._exact[pattern] = route
+            self._routes.append(route)
+            return route
+
+        node = self._root
+        for segment in _split_pattern(pattern):
+            if segment.startswith("{"):
+                param = _Param(segment)
+                if node.param is None:
+                    node.param = param
+                    node.child = _Node()
+                elif (node.param.name, node.param.spec) != (param.name, param.spec):
+                    raise ValueError(
+                        f"Conflicting parameter {segment!r} in {pattern!r}; "
+                        f"already registered as {{{node.param.name}:{node.param.spec}}}"
+                    )
+                node = node.child
+            else:
+                node = node.children.setdefault(segment, _Node())
+        if node.route is not None:
+            raise ValueError(f"Duplicate callback route {pattern!r}")
+        node.route = route
+        self._routes.append(route)
+        return route
+
+    def route(self, *patterns: str) -> Callable[[CallbackHandler], CallbackHandler]:
+        def decorator(handler: CallbackHandler) -> CallbackHandler:
+            for pattern in patterns:
+                self.add(pattern, handler)
+            return handler
+
+        return decorator
+
+    def resolve(self, data: str | None) -> tuple[CallbackRoute, dict[str, Any]] | None:
+        if not data:
+            return None
+        route = self._exact.get(data)
+        if route is not None:
+            return route, {}
+        params: dict[str, Any] = {}
+        route = self._walk(self._root, data.split(SEPARATOR), 0, params)
+        if route is None:
+            return None
+        return route, params
+
+    def _walk(
+        self, node: _Node, segments: list[str], index: int, params: dict[str, Any]
+    ) -> CallbackRoute | None:
+        if index == len(segments):
+            return node.route
+        segment = segments[index]
+        literal = node.children.get(segment)
+        if literal is not None:
+            found = self._walk(literal, segments, index + 1, params)
+            if found is not None:
+                return found
+        if node.param is not None:
+            try:
+                value = node.param.convert(segment)
+            except ValueError:
+                return None
+            found = self._walk(node.child, segments, index + 1, params)
+            if found is not None:
+                params[node.param.name] = value
+                return found
+        return None
+
+    def filter(self) -> "CallbackTableFilter":
+        return CallbackTableFilter(self)
+
+    def attach(self, router: Router) -> None:
+        """Register one aiogram handler that forwards matching callbacks to the table.
+
+        Call before other ``callback_query`` handlers are registered so table
+        routes are checked first; unmatched callbacks fall through to them.
+        """
+
+        @router.callback_query(self.filter())
+        async def _dispatch_callback(
+            callback: CallbackQuery,
+            state: FSMContext,
+            callback_route: CallbackRoute,
+            callback_params: dict[str, Any],
+        ) -> Any:
+            return await callback_route.handler(callback, state, **callback_params)
+
+
+class CallbackTableFilter(Filter):
+    def __init__(self, table: CallbackTable) -> None:
+        self.table = table
+
+    async def __call__(self, callback: CallbackQuery) -> bool | dict[str, Any]:
+        resolved = self.table.resolve(callback.data)
+        if resolved is None:
+            return False
+        route, params = resolved
+        return {"callback_route": route, "callback_params": params}
+
+
+__all__ = ["CallbackRoute", "CallbackTable", "CallbackTableFilter"]
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+from aiogram.types import Update
+
+log = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1.0
+
+
+class UpdateCapture:
+    """Append raw incoming updates to a gzip JSONL stream for later replay.
+
+    One line per update: ``{"ts": <epoch received>, "ms": <handling time>,
+    "update": {...}}``. Updates only reference files by ``file_id``, so no file
+    contents end up in the capture. Each process start appends a new gzip
+    member, which ``read_capture`` reads back as one stream.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = gzip.open(self.path, "at", encoding="utf-8")
+        self._flushed_at = time.monotonic()
+        self.count = 0
+
+    def write(self, update: Update, received_at: float, elapsed: float) -> None:
+        if self._file is None:
+            return
+        line = {
+            "ts": round(received_at, 6),
+            "ms": round(elapsed * 1000, 3),
+            "update": update.model_dump(mode="json", exclude_none=True, by_alias=True),
+        }
+        self._file.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.count += 1
+        now = time.monotonic()
+        if now - self._flushed_at >= FLUSH_INTERVAL:
+            # sync flush keeps everything written so far readable if the bot is killed
+            self._file.flush()
+            self._flushed_at = now
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            log.info("Captured %s updates to %s", self.count, self.path)
+
+
+def read_capture(path: str | Path) -> Iterator[dict[str, Any]]:
+    """Yield capture lines in order; tolerates a stream cut off by a crash."""
+
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        try:
+            for raw in fh:
+                raw = raw.strip()
+                if not raw:
+                    continue
+                try:
+                    yield json.loads(raw)
+                except ValueError:
+                    # partially written last line
+                    return
+        except EOFError:
+            return
+
+
+__all__ = ["UpdateCapture", "read_capture"]
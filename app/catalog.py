@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import functools
 import os
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Sequence
+from typing import Any, Callable, Sequence, TypeVar
 
 from dotenv import load_dotenv, set_key
 
@@ -11,20 +13,68 @@ from .db import normalize_product_key
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 ENV_FILE = ROOT_DIR / ".env"
-_ENV_FILE_MTIME: float | None = None
+_ENV_LOADED = False
+# -1.0 while there is no .env file (settings come from the real environment)
+_ENV_FILE_MTIME = -1.0
+_ENV_CHECKED_AT = 0.0
+# how often (seconds) the .env mtime is checked; changes made in this process apply at once
+ENV_CHECK_INTERVAL = 1.0
+_CATALOG_VERSION = 0
+
+T = TypeVar("T")
 
 
 def _refresh_env(force: bool = False) -> None:
     """Reload .env values into the current process when the file changes."""
 
-    global _ENV_FILE_MTIME
+    global _ENV_LOADED, _ENV_FILE_MTIME, _ENV_CHECKED_AT, _CATALOG_VERSION
+    now = time.monotonic()
+    if not force and _ENV_LOADED and now - _ENV_CHECKED_AT < ENV_CHECK_INTERVAL:
+        return
+    _ENV_CHECKED_AT = now
     try:
         mtime = ENV_FILE.stat().st_mtime
     except FileNotFoundError:
-        mtime = None
-    if force or _ENV_FILE_MTIME is None or mtime != _ENV_FILE_MTIME:
+        mtime = -1.0
+    if force or not _ENV_LOADED or mtime != _ENV_FILE_MTIME:
         load_dotenv(dotenv_path=str(ENV_FILE), override=True)
+        _ENV_LOADED = True
         _ENV_FILE_MTIME = mtime
+        _CATALOG_VERSION += 1
+        _VARIANT_CACHE.clear()
+
+
+def catalog_version() -> int:
+    """Counter that changes whenever prices or availability may have changed."""
+
+    _refresh_env()
+    return _CATALOG_VERSION
+
+
+def catalog_cached(fn: Callable[..., T]) -> Callable[..., T]:
+    """Memoize ``fn(*args)`` until the catalog version changes.
+
+    Meant for menu texts and keyboards that depend on prices; the returned
+    objects are shared and must not be mutated.
+    """
+
+    cache: dict[tuple[Any, ...], T] = {}
+    seen_version: list[int] = [-1]
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any) -> T:
+        version = catalog_version()
+        if version != seen_version[0]:
+            cache.clear()
+            seen_version[0] = version
+        try:
+            return cache[args]
+        except KeyError:
+            value = cache[args] = fn(*args)
+            return value
+
+    wrapper.cache_clear = cache.clear  # type: ignore[attr-defined]
+    return wrapper
 
 
 @dataclass(frozen=True)
@@ -194,11 +244,22 @@ _ADMIN_TITLES: dict[str, str] = {
 }
 
 
+_VARIANT_CACHE: dict[str, dict[str, object]] = {}
+
+
 def get_variant(variant_code: str) -> dict[str, object]:
     _refresh_env()
+    cached = _VARIANT_CACHE.get(variant_code)
+    if cached is not None:
+        return dict(cached)
     if variant_code not in _VARIANTS:
         raise KeyError(f"Unknown product variant: {variant_code}")
-    meta = _VARIANTS[variant_code]
+    variant = _load_variant(_VARIANTS[variant_code])
+    _VARIANT_CACHE[variant_code] = variant
+    return dict(variant)
+
+
+def _load_variant(meta: VariantMeta) -> dict[str, object]:
     price_str = _env_value(meta.price_keys, meta.default_price)
     amount = _price_to_int(price_str)
     available = _env_bool(meta.availability_key, meta.default_available)
@@ -309,6 +370,8 @@ TG_PREMIUM_VARIANTS: dict[str, str] = {
 __all__ = [
     "AI_VARIANT_MAP",
     "TG_PREMIUM_VARIANTS",
+    "catalog_cached",
+    "catalog_version",
     "get_variant",
     "get_variant_price_amount",
     "get_variant_price_text",
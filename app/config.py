@@ -1,14 +1,39 @@
 import os
+from pathlib import Path
+
 from dotenv import load_dotenv
+from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 
+from .metrics import TelegramAPIMetrics
+
 load_dotenv()
 
 # --- Telegram & App config ---
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_IDS = [int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip()]
 DB_PATH = os.getenv("DB_PATH", "data.db")
+# statements slower than this go to the "app.db.slow" logger (and SLOW_QUERY_LOG if set)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "").strip()
+TELEGRAM_PRODUCTION_API = "https://api.telegram.org"
+# local Bot API server or the benchmarks' fake one, e.g. http://127.0.0.1:8081
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", TELEGRAM_PRODUCTION_API).rstrip("/")
+# gzip JSONL of raw incoming updates for benchmarks/replay_updates.py; empty = off
+UPDATE_CAPTURE_PATH = os.getenv("UPDATE_CAPTURE_PATH", "").strip()
+# Prometheus text endpoint of the bot process (GET /metrics); port 0 disables it
+BOT_METRICS_BIND = os.getenv("BOT_METRICS_BIND", "127.0.0.1")
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", "9101"))
+# event-loop watchdog (app/watchdog.py): lag sampling period and the stall that gets a stack trace logged
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100"))
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "250"))
+# on-demand sampling profiler (/profile, admin panel «پروفایل‌ها»); folded stacks are written here
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "600"))
 
 BUSINESS_NAME = os.getenv("BUSINESS_NAME", "فروشگاه پرمیوم")
 CARD_NUMBER = os.getenv("CARD_NUMBER", "---- ---- ---- ----")
@@ -30,6 +55,19 @@ FORCE_JOIN_MESSAGE = os.getenv(
 # --- Default bot properties (aiogram 3.7+) ---
 DEFAULT_BOT_PROPS = DefaultBotProperties(parse_mode=ParseMode.HTML)
 
+
+def create_bot(api_base: str | None = None) -> Bot:
+    """``Bot`` bound to ``TELEGRAM_API_BASE`` (or ``api_base``) instead of always api.telegram.org."""
+
+    base = (api_base or TELEGRAM_API_BASE).rstrip("/")
+    session = None
+    if base != TELEGRAM_PRODUCTION_API:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(base))
+    bot = Bot(BOT_TOKEN, session=session, default=DEFAULT_BOT_PROPS)
+    bot.session.middleware(TelegramAPIMetrics())
+    return bot
+
+
 # --- Plans (قدیمی؛ برای سازگاری) ---
 _LEGACY_PLANS_META = [
     ("svcA_1m", "PLAN_SVCA_1M", "سرویس A — ۱ ماهه", "300000"),
@@ -93,4 +131,34 @@ ADMIN_WEB_USER = os.getenv("ADMIN_WEB_USER", "admin")
 ADMIN_WEB_PASS = os.getenv("ADMIN_WEB_PASS", "admin")
 ADMIN_WEB_BIND = os.getenv("ADMIN_WEB_BIND", "127.0.0.1")
 ADMIN_WEB_PORT = int(os.getenv("ADMIN_WEB_PORT", "8080"))
+# uvicorn worker processes for admin_web.py; each opens its own bot session and DB pool.
+# Above 1, /metrics labels samples with the answering worker's pid and panel profiling is off
+ADMIN_WEB_WORKERS = int(os.getenv("ADMIN_WEB_WORKERS", "1"))
+ADMIN_DB_POOL_SIZE = int(os.getenv("ADMIN_DB_POOL_SIZE", "8"))
 ADMIN_WEB_SECRET = os.getenv("ADMIN_WEB_SECRET", BOT_TOKEN[::-1] + "_secret")
+# bearer token letting a scraper read /metrics without a login session
+ADMIN_METRICS_TOKEN = os.getenv("ADMIN_METRICS_TOKEN", "")
+# bearer token for internal tools calling the /api/v1 JSON API without a login session
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+# query count / time footer on every admin page
+ADMIN_DEBUG_FOOTER = os.getenv("ADMIN_DEBUG_FOOTER", "0") == "1"
+ADMIN_FILE_CACHE_DIR = os.getenv("ADMIN_FILE_CACHE_DIR", str(Path(__file__).resolve().parents[1] / "file_cache"))
+ADMIN_FILE_CACHE_MAX_MB = int(os.getenv("ADMIN_FILE_CACHE_MAX_MB", "256"))
+# compiled Jinja2 templates, reused across restarts; inside the project like the other caches,
+# not under a shared /tmp where another user could plant bytecode
+ADMIN_TEMPLATE_CACHE_DIR = os.getenv(
+    "ADMIN_TEMPLATE_CACHE_DIR", str(Path(__file__).resolve().parents[1] / "template_cache")
+)
+# responses smaller than this are sent uncompressed
+ADMIN_COMPRESS_MIN_BYTES = int(os.getenv("ADMIN_COMPRESS_MIN_BYTES", "500"))
+# how often the live dashboard polls the events table, and how many events it keeps
+ADMIN_LIVE_INTERVAL_MS = int(os.getenv("ADMIN_LIVE_INTERVAL_MS", "1000"))
+ADMIN_LIVE_KEEP_EVENTS = int(os.getenv("ADMIN_LIVE_KEEP_EVENTS", "10000"))
+# how often the outbox worker looks for due messages (new ones wake it at once), and when it gives up
+ADMIN_OUTBOX_POLL_MS = int(os.getenv("ADMIN_OUTBOX_POLL_MS", "2000"))
+ADMIN_OUTBOX_MAX_ATTEMPTS = int(os.getenv("ADMIN_OUTBOX_MAX_ATTEMPTS", "8"))
+
+# ---- Local blob store (prefetched receipts / attachments) ----
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", str(Path(__file__).resolve().parents[1] / "blob_store"))
+BLOB_STORE_MAX_MB = int(os.getenv("BLOB_STORE_MAX_MB", "2048"))
+BLOB_STORE_MAX_AGE_DAYS = int(os.getenv("BLOB_STORE_MAX_AGE_DAYS", "180"))
@@ -1,26 +1,128 @@
+import contextvars
+import os
+import queue
 import sqlite3
-from contextlib import closing
+import sys
+import threading
+import time
+from contextlib import closing, contextmanager
 from datetime import datetime, timedelta
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable, Iterator
 from .config import DB_PATH, ORDER_ID_MIN_VALUE, PAYMENT_TIMEOUT_MIN
+from .metrics import ORDER_TRANSITIONS_TOTAL, observe_query
+from .querylog import InstrumentedConnection
+from .records import Record, record_type
 
-def _connect():
-    con = sqlite3.connect(DB_PATH)
+# called with every SQL statement run on connections opened while registered
+_QUERY_LISTENERS: list[Callable[[str], None]] = []
+
+
+def add_query_listener(listener: Callable[[str], None]) -> None:
+    _QUERY_LISTENERS.append(listener)
+
+
+def remove_query_listener(listener: Callable[[str], None]) -> None:
+    if listener in _QUERY_LISTENERS:
+        _QUERY_LISTENERS.remove(listener)
+
+
+def _trace_statement(sql: str) -> None:
+    for listener in _QUERY_LISTENERS:
+        listener(sql)
+
+
+def _connect(**kwargs: Any):
+    con = sqlite3.connect(DB_PATH, factory=InstrumentedConnection, **kwargs)
     con.row_factory = sqlite3.Row
+    if _QUERY_LISTENERS:
+        con.set_trace_callback(_trace_statement)
     return con
 
-def db_execute(
-    sql,
-    params=(),
-    *,
-    fetchone=False,
-    fetchall=False,
-    return_lastrowid=False,
-    commit: bool | None = None,
-):
-    with closing(_connect()) as con:
+
+_pool: queue.LifoQueue | None = None
+_pool_path: str | None = None
+
+
+def open_pool(size: int) -> None:
+    """Keep up to ``size`` connections open in this process and reuse them for every query.
+
+    Without a pool (the default, e.g. in the bot) each query opens its own
+    connection. Call after forking: connections never cross processes.
+    """
+
+    global _pool, _pool_path
+    close_pool()
+    _pool = queue.LifoQueue(maxsize=size)
+    _pool_path = DB_PATH
+
+
+def close_pool() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    while pool is not None and not pool.empty():
+        pool.get_nowait().close()
+
+
+@contextmanager
+def _connection() -> Iterator[sqlite3.Connection]:
+    unit = _active_unit()
+    if unit is None:
+        with _pooled_connection() as con:
+            yield con
+        return
+    if unit.patches:
+        # deferred order updates land before anything else reads or writes
+        unit.flush()
+    with _pooled_connection() as con:
+        changes = con.total_changes
+        try:
+            yield con
+        finally:
+            if con.total_changes != changes:
+                unit.forget()
+
+
+@contextmanager
+def _pooled_connection() -> Iterator[sqlite3.Connection]:
+    pool = _pool
+    if pool is None or _pool_path != DB_PATH:
+        with closing(_connect()) as con:
+            yield con
+        return
+    try:
+        con = pool.get_nowait()
+        con.set_trace_callback(_trace_statement if _QUERY_LISTENERS else None)
+    except queue.Empty:
+        # exports stream from a worker thread, so pooled connections move between threads
+        con = _connect(check_same_thread=False)
+    try:
+        yield con
+    finally:
+        if con.in_transaction:
+            con.rollback()
+        con.isolation_level = ""
+        try:
+            pool.put_nowait(con)
+        except queue.Full:
+            con.close()
+
+
+def _forget_connections() -> None:
+    # a forked worker must not touch its parent's sqlite handles; just drop them
+    global _pool, _version_con
+    _pool = None
+    _version_con = None
+
+
+os.register_at_fork(after_in_child=_forget_connections)
+
+
+def _execute(sql, params, fetchone, fetchall, return_lastrowid, commit, row_type=None):
+    with _connection() as con:
         cur = con.cursor()
         cur.execute("PRAGMA foreign_keys=ON;")
+        if row_type is not None:
+            cur.row_factory = row_type.from_row
         cur.execute(sql, params)
         do_commit = True if commit is None else bool(commit)
         if do_commit:
@@ -29,12 +131,172 @@ def db_execute(
             return cur.lastrowid
         if fetchone:
             r = cur.fetchone()
+            if row_type is not None:
+                return r
             return dict(r) if r else None
         if fetchall:
+            if row_type is not None:
+                return cur.fetchall()
             return [dict(x) for x in cur.fetchall()]
     return None
 
 
+def db_execute(
+    sql,
+    params=(),
+    *,
+    fetchone=False,
+    fetchall=False,
+    return_lastrowid=False,
+    commit: bool | None = None,
+    row_type: type[Record] | None = None,
+):
+    # timed under the name of the app.db function that issued the query
+    caller = sys._getframe(1).f_code.co_name
+    start = time.perf_counter()
+    try:
+        return _execute(sql, params, fetchone, fetchall, return_lastrowid, commit, row_type)
+    finally:
+        observe_query(caller, time.perf_counter() - start)
+
+
+@contextmanager
+def transaction():
+    """Yield a cursor inside a single ``BEGIN IMMEDIATE`` transaction."""
+
+    # frame 1 is contextlib's __enter__, frame 2 the function using the transaction
+    caller = sys._getframe(2).f_code.co_name
+    start = time.perf_counter()
+    try:
+        with _connection() as con:
+            con.isolation_level = None
+            cur = con.cursor()
+            cur.execute("PRAGMA foreign_keys=ON;")
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                yield cur
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            cur.execute("COMMIT")
+    finally:
+        observe_query(caller, time.perf_counter() - start)
+
+
+# ===== Unit of work =====
+
+class UnitOfWork:
+    """Rows read and order fields written while the bot handles one update (see ``unit_of_work``).
+
+    ``get_order`` and ``get_user`` return the row the unit loaded first, and
+    the ``set_order_*`` setters only patch that row. The patches are written
+    as one UPDATE per order (and per details row) in a single transaction when the unit ends, or
+    earlier, just before any other statement runs, so every query still sees
+    them. Any other write empties the identity map.
+    """
+
+    def __init__(self) -> None:
+        self.orders: dict[int, dict[str, Any] | None] = {}
+        self.users: dict[int, dict[str, Any] | None] = {}
+        self.patches: dict[int, dict[str, Any]] = {}
+        self.closed = False
+
+    def forget(self) -> None:
+        self.orders.clear()
+        self.users.clear()
+
+    def patch_order(self, order_id: int, fields: dict[str, Any]) -> None:
+        self.patches.setdefault(order_id, {}).update(fields)
+        row = self.orders.get(order_id)
+        if row is not None:
+            row.update(fields)
+
+    def flush(self) -> None:
+        patches, self.patches = self.patches, {}
+        if not patches:
+            return
+        now = datetime.now().isoformat(timespec="seconds")
+        with transaction() as cur:
+            for order_id, fields in patches.items():
+                _update_order_cur(cur, order_id, fields, now)
+
+
+_current_unit: contextvars.ContextVar[UnitOfWork | None] = contextvars.ContextVar("unit_of_work", default=None)
+
+
+def _active_unit() -> UnitOfWork | None:
+    unit = _current_unit.get()
+    # tasks spawned by a handler inherit the context and may outlive its unit
+    return unit if unit is not None and not unit.closed else None
+
+
+@contextmanager
+def unit_of_work() -> Iterator[UnitOfWork]:
+    """Run the block as one unit of work; nested calls join the outer unit."""
+
+    unit = _active_unit()
+    if unit is not None:
+        yield unit
+        return
+    unit = UnitOfWork()
+    token = _current_unit.set(unit)
+    try:
+        yield unit
+    finally:
+        # writes made before an error are kept, as they were without a unit
+        try:
+            unit.flush()
+        finally:
+            unit.closed = True
+            _current_unit.reset(token)
+
+
+def _upsert_order_details_cur(cur, order_id: int, fields: dict[str, Any], now: str) -> None:
+    fields = {**fields, "updated_at": now}
+    columns = ", ".join(fields)
+    placeholders = ", ".join("?" for _ in fields)
+    assignments = ", ".join(f"{column}=excluded.{column}" for column in fields)
+    cur.execute(
+        f"INSERT INTO order_details(order_id, {columns}) VALUES(?, {placeholders}) "
+        f"ON CONFLICT(order_id) DO UPDATE SET {assignments}",
+        (order_id, *fields.values()),
+    )
+
+
+def _update_order_cur(cur, order_id: int, fields: dict[str, Any], now: str) -> None:
+    """Write ``fields`` to ``orders`` and/or ``order_details``; only the rows written get a new ``updated_at``."""
+
+    core = {k: v for k, v in fields.items() if k not in ORDER_DETAIL_COLUMNS}
+    details = {k: v for k, v in fields.items() if k in ORDER_DETAIL_COLUMNS}
+    if core:
+        core["updated_at"] = now
+        assignments = ", ".join(f"{column}=?" for column in core)
+        cur.execute(f"UPDATE orders SET {assignments} WHERE id=?", (*core.values(), order_id))
+    if details:
+        _upsert_order_details_cur(cur, order_id, details, now)
+
+
+def _update_order(order_id: int, **fields: Any) -> None:
+    if _defer_order_update(order_id, **fields):
+        return
+    with transaction() as cur:
+        _update_order_cur(cur, order_id, fields, datetime.now().isoformat(timespec="seconds"))
+
+
+def _defer_order_update(order_id: int, **fields: Any) -> bool:
+    unit = _active_unit()
+    if unit is None:
+        return False
+    unit.patch_order(order_id, fields)
+    return True
+
+
+def _count_transitions(payloads: Iterable[dict[str, Any] | None]) -> None:
+    for payload in payloads:
+        if payload is not None:
+            ORDER_TRANSITIONS_TOTAL.inc(str(payload["from_status"]), str(payload["to_status"]))
+
+
 def _ensure_order_sequence_min(min_order_id: int) -> None:
     """Ensure that the next order ID is at least ``min_order_id``."""
 
@@ -46,7 +308,7 @@ def _ensure_order_sequence_min(min_order_id: int) -> None:
         return
 
     target_seq = target - 1
-    with closing(_connect()) as con:
+    with _connection() as con:
         cur = con.cursor()
         cur.execute("SELECT IFNULL(MAX(id), 0) FROM orders")
         current_max = cur.fetchone()[0] or 0
@@ -109,6 +371,8 @@ def normalize_product_key(category: str | None, code: str | None, account_mode:
 
 def init_db():
     with closing(_connect()) as con:
+        # several admin workers may start at once; the first one migrates, the others wait for it
+        con.execute("BEGIN IMMEDIATE")
         cur = con.cursor()
         # users
         cur.execute("""
@@ -125,9 +389,9 @@ def init_db():
         cur.execute("""
         CREATE TABLE IF NOT EXISTS orders(
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER, username TEXT, first_name TEXT,
+            user_id INTEGER,
             plan_id TEXT, plan_title TEXT, price TEXT,
-            receipt_file_id TEXT, receipt_text TEXT,
+            receipt_file_id TEXT,
             status TEXT, created_at TEXT, updated_at TEXT
         );
         """)
@@ -158,7 +422,6 @@ def init_db():
             ("orders", "service_code", "TEXT"),
             ("orders", "account_mode", "TEXT"),
             ("orders", "customer_email", "TEXT"),
-            ("orders", "customer_secret_encrypted", "TEXT"),
             ("orders", "amount_total", "INTEGER"),
             ("orders", "currency", "TEXT"),
             ("orders", "payment_type", "TEXT"),
@@ -171,8 +434,6 @@ def init_db():
             ("orders", "discount_code", "TEXT"),
             ("orders", "discount_applied_at", "TEXT"),
             ("orders", "notes", "TEXT"),
-            ("orders", "customer_message", "TEXT"),
-            ("orders", "manager_note", "TEXT"),
             ("orders", "internal_cost", "INTEGER DEFAULT 0"),
             ("orders", "net_revenue", "INTEGER DEFAULT 0"),
             ("orders", "product_code", "TEXT"),
@@ -194,6 +455,38 @@ def init_db():
             if _table_exists(con, t) and not _col_exists(con, t, c):
                 cur.execute(f"ALTER TABLE {t} ADD COLUMN {c} {typ};")
 
+        # large, rarely read order fields, kept out of the hot orders row (see order_view)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS order_details(
+            order_id INTEGER PRIMARY KEY REFERENCES orders(id) ON DELETE CASCADE,
+            receipt_text TEXT,
+            customer_message TEXT,
+            manager_note TEXT,
+            customer_secret_encrypted TEXT,
+            updated_at TEXT
+        );
+        """)
+        moved = [c for c in ORDER_DETAIL_COLUMNS if _col_exists(con, "orders", c)]
+        if moved:
+            cols = ", ".join(moved)
+            filled = " OR ".join(f"COALESCE({c}, '') <> ''" for c in moved)
+            cur.execute(
+                f"INSERT OR IGNORE INTO order_details(order_id, {cols}, updated_at) "
+                f"SELECT id, {cols}, updated_at FROM orders WHERE {filled};"
+            )
+        # the customer's name is read from users; orders only kept a copy of it
+        for c in (*moved, "username", "first_name"):
+            if _col_exists(con, "orders", c):
+                cur.execute(f"ALTER TABLE orders DROP COLUMN {c};")
+        # the order row as it was before the split, for detail views and the writers' shims
+        cur.execute(f"""
+        CREATE VIEW IF NOT EXISTS order_view AS
+        SELECT orders.*, users.username, users.first_name, {", ".join(f"d.{c}" for c in ORDER_DETAIL_COLUMNS)}
+        FROM orders
+        LEFT JOIN users ON users.user_id = orders.user_id
+        LEFT JOIN order_details d ON d.order_id = orders.id;
+        """)
+
         # wallet transactions
         cur.execute("""
         CREATE TABLE IF NOT EXISTS wallet_tx(
@@ -337,24 +630,237 @@ def init_db():
         cur.execute(
             "CREATE INDEX IF NOT EXISTS idx_discount_redemptions_user ON discount_redemptions(user_id);"
         )
+
+        # local copies of telegram files (receipts / attachments)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blobs(
+                file_id TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                media_type TEXT,
+                filename TEXT,
+                has_thumb INTEGER DEFAULT 0,
+                created_at TEXT,
+                last_access TEXT
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_blobs_sha ON blobs(sha256);")
+
+        # telegram messages owed to users by admin actions, drained by the admin panel's outbox worker
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                order_id INTEGER,
+                text TEXT NOT NULL,
+                reply_markup TEXT,
+                status TEXT NOT NULL DEFAULT 'PENDING', -- PENDING/SENDING/SENT/FAILED
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TEXT,
+                last_error TEXT,
+                created_at TEXT,
+                sent_at TEXT
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_outbox_order ON outbox(order_id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_outbox_user ON outbox(user_id);")
+
+        # integer UTC epoch copies of the timestamps that range queries filter on (see EPOCH_COLUMNS)
+        for table, columns in EPOCH_COLUMNS.items():
+            for column in columns:
+                ts = f"{column}_ts"
+                if not _col_exists(con, table, ts):
+                    cur.execute(f"ALTER TABLE {table} ADD COLUMN {ts} INTEGER;")
+                    cur.execute(f"UPDATE {table} SET {ts} = {_epoch_sql(column)} WHERE {column} IS NOT NULL;")
+                for op, when in (("INSERT", "INSERT"), ("UPDATE", f"UPDATE OF {column}")):
+                    cur.execute(
+                        f"""
+                        CREATE TRIGGER IF NOT EXISTS trg_{table}_{ts}_{op.lower()} AFTER {when} ON {table}
+                        BEGIN
+                            UPDATE {table} SET {ts} = {_epoch_sql(f"NEW.{column}")} WHERE rowid = NEW.rowid;
+                        END;
+                        """
+                    )
+        # covers the dashboard's 7- and 30-day count and revenue
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_created_ts ON orders(created_at_ts, amount_total);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_deadline_ts ON orders(status, await_deadline_ts);")
+        cur.execute("DROP INDEX IF EXISTS idx_outbox_due;")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due_ts ON outbox(status, next_attempt_at_ts);")
+
+        # per-group write counters for cheap "has anything changed" checks (see change_versions)
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS change_counters(name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0);"
+        )
+        for table, group in CHANGE_GROUPS.items():
+            cur.execute("INSERT OR IGNORE INTO change_counters(name, version) VALUES(?, 0)", (group,))
+            for op in ("INSERT", "UPDATE", "DELETE"):
+                trigger = f"trg_{table}_{op.lower()}_version"
+                when = op
+                if op == "UPDATE" and table in CHANGE_COLUMNS:
+                    when = f"UPDATE OF {', '.join(CHANGE_COLUMNS[table])}"
+                existing = cur.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name=?", (trigger,)).fetchone()
+                if existing and (f"AFTER {when} ON" not in existing[0] or f"WHERE name = '{group}'" not in existing[0]):
+                    # the table moved to another group or its watched columns changed
+                    cur.execute(f"DROP TRIGGER {trigger}")
+                cur.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {when} ON {table}
+                    BEGIN
+                        UPDATE change_counters SET version = version + 1 WHERE name = '{group}';
+                    END;
+                    """
+                )
+
+        # change feed tailed by the admin panel's live updates (see list_events_after)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS events(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                ref_id INTEGER,
+                status TEXT,
+                old_status TEXT,
+                amount INTEGER,
+                created_at TEXT DEFAULT (datetime('now', 'localtime'))
+            );
+            """
+        )
+        cur.execute("DROP TRIGGER IF EXISTS trg_event_wallet_created;")
+        for name, trigger in EVENT_TRIGGERS.items():
+            cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_event_{name} {trigger}")
         con.commit()
 
+
+# columns of order_details, written through _update_order_cur
+ORDER_DETAIL_COLUMNS = ("receipt_text", "customer_message", "manager_note", "customer_secret_encrypted")
+
+# table -> timestamp columns mirrored into an integer ``<column>_ts`` (UTC epoch seconds) by triggers,
+# so range checks compare integers in SQL instead of ISO strings or fromisoformat() in Python
+EPOCH_COLUMNS = {
+    "orders": ("created_at", "await_deadline"),
+    "coupons": ("expires_at",),
+    "discount_codes": ("expires_at",),
+    "outbox": ("next_attempt_at",),
+}
+
+
+def _epoch_sql(value: str) -> str:
+    # the stored ISO strings are naive local time, like datetime.now()
+    return f"CAST(strftime('%s', {value}, 'utc') AS INTEGER)"
+
+
+# table -> change_counters group bumped by triggers on every write, from any process
+CHANGE_GROUPS = {
+    "orders": "orders",
+    # only the order detail page shows these, so editing them leaves the order lists cached
+    "order_details": "order_details",
+    "order_manager_messages": "order_details",
+    "users": "users",
+    "user_manager_messages": "users",
+    "wallet_tx": "wallet",
+    "service_messages": "messages",
+    "service_message_replies": "messages",
+    "coupons": "coupons",
+    "coupon_redemptions": "coupons",
+    "discount_codes": "discounts",
+    "discount_redemptions": "discounts",
+    "blobs": "blobs",
+    "outbox": "outbox",
+}
+
+# tables whose UPDATE bumps the counter only for these columns; blobs.last_access
+# is touched by serving a thumbnail and must not invalidate the page showing it
+CHANGE_COLUMNS = {
+    "blobs": ("sha256", "size", "has_thumb"),
+}
+
+EVENT_TRIGGERS = {
+    "order_created": """AFTER INSERT ON orders BEGIN
+        INSERT INTO events(kind, ref_id, status) VALUES('order.created', NEW.id, NEW.status);
+    END;""",
+    "order_status": """AFTER UPDATE OF status ON orders WHEN OLD.status IS NOT NEW.status BEGIN
+        INSERT INTO events(kind, ref_id, status, old_status) VALUES('order.status', NEW.id, NEW.status, OLD.status);
+    END;""",
+    "message_created": """AFTER INSERT ON service_messages BEGIN
+        INSERT INTO events(kind, ref_id, status) VALUES('message.created', NEW.id, NEW.category);
+    END;""",
+    # wallet_tx keeps abs(delta) and RESERVE goes either way, so the signed change comes from the balance itself
+    "wallet_balance": """AFTER UPDATE OF wallet_balance ON users
+        WHEN OLD.wallet_balance IS NOT NEW.wallet_balance BEGIN
+        INSERT INTO events(kind, ref_id, amount)
+        VALUES('wallet.balance', NEW.user_id, COALESCE(NEW.wallet_balance, 0) - COALESCE(OLD.wallet_balance, 0));
+    END;""",
+    "user_created": """AFTER INSERT ON users BEGIN
+        INSERT INTO events(kind, ref_id) VALUES('user.created', NEW.user_id);
+    END;""",
+}
+
+_version_con: sqlite3.Connection | None = None
+_version_path: str | None = None
+_data_version: int | None = None
+_change_versions: dict[str, int] = {}
+_changed_at: dict[str, float] = {}
+_version_lock = threading.Lock()
+
+
+def change_versions() -> tuple[dict[str, int], dict[str, float]]:
+    """``({group: version}, {group: time of the last change seen})``.
+
+    A dedicated long-lived connection polls ``PRAGMA data_version``, which
+    moves only when another connection (this process or the other one)
+    commits. The counters table is re-read only then, so on an idle shop a
+    check costs one PRAGMA.
+    """
+
+    global _version_con, _version_path, _data_version
+    with _version_lock:
+        if _version_con is None or _version_path != DB_PATH:
+            if _version_con is not None:
+                _version_con.close()
+            _version_con = sqlite3.connect(DB_PATH, check_same_thread=False)
+            _version_path = DB_PATH
+            _data_version = None
+            _change_versions.clear()
+        data_version = _version_con.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != _data_version:
+            now = time.time()
+            for name, version in _version_con.execute("SELECT name, version FROM change_counters"):
+                if _change_versions.get(name) != version:
+                    _change_versions[name] = version
+                    _changed_at[name] = now
+            _data_version = data_version
+        return _change_versions, _changed_at
+
+
 def ensure_user(user_id: int, username: str, first_name: str):
     now = datetime.now().isoformat(timespec="seconds")
-    row = db_execute("SELECT user_id FROM users WHERE user_id=?", (user_id,), fetchone=True)
+    row = db_execute("SELECT username, first_name FROM users WHERE user_id=?", (user_id,), fetchone=True)
     if not row:
         db_execute(
             "INSERT INTO users(user_id, username, first_name, created_at, updated_at) VALUES(?,?,?,?,?)",
             (user_id, username, first_name or "", now, now)
         )
-    else:
+    elif (row["username"], row["first_name"]) != (username, first_name or ""):
+        # most updates come from unchanged profiles; an UPDATE would bump the users
+        # change group and drop every cached admin page
         db_execute(
             "UPDATE users SET username=?, first_name=?, updated_at=? WHERE user_id=?",
             (username, first_name or "", now, user_id),
         )
 
 def get_user(user_id: int):
-    return db_execute("SELECT * FROM users WHERE user_id=?", (user_id,), fetchone=True)
+    unit = _active_unit()
+    if unit is not None and user_id in unit.users:
+        return unit.users[user_id]
+    row = db_execute("SELECT * FROM users WHERE user_id=?", (user_id,), fetchone=True)
+    if unit is not None:
+        unit.users[user_id] = row
+    return row
 
 
 def is_user_contact_verified(user_id: int) -> bool:
@@ -373,18 +879,20 @@ def set_user_contact_verified(user_id: int, phone_number: str) -> None:
 
 def change_wallet(user_id: int, delta: int, tx_type: str, note: str = "", order_id: int | None = None):
     # delta: مثبت => افزایش موجودی، منفی => کسر
-    u = get_user(user_id)
-    if not u:
-        return False
-    new_bal = int(u["wallet_balance"]) + int(delta)
-    if new_bal < 0:
-        return False
+    # checked and applied in SQL: a balance cached by the unit of work may be stale
+    delta = int(delta)
     now = datetime.now().isoformat(timespec="seconds")
-    db_execute("UPDATE users SET wallet_balance=?, updated_at=? WHERE user_id=?", (new_bal, now, user_id))
-    db_execute(
-        "INSERT INTO wallet_tx(user_id, order_id, amount, type, note, created_at) VALUES(?,?,?,?,?,?)",
-        (user_id, order_id, abs(delta), tx_type, note, now)
-    )
+    with transaction() as cur:
+        cur.execute(
+            "UPDATE users SET wallet_balance=wallet_balance+?, updated_at=? WHERE user_id=? AND wallet_balance+?>=0",
+            (delta, now, user_id, delta),
+        )
+        if not cur.rowcount:
+            return False
+        cur.execute(
+            "INSERT INTO wallet_tx(user_id, order_id, amount, type, note, created_at) VALUES(?,?,?,?,?,?)",
+            (user_id, order_id, abs(delta), tx_type, note, now),
+        )
     return True
 
 def create_order(
@@ -409,21 +917,23 @@ def create_order(
     original_value = amount_total if amount_original is None else int(amount_original)
     oid = db_execute("""
         INSERT INTO orders(
-            user_id, username, first_name,
+            user_id,
             plan_id, plan_title, price,
             status, created_at, updated_at,
             amount_total, currency, service_category, service_code,
             account_mode, customer_email, notes,
-            customer_secret_encrypted, product_code, amount_original
-        ) VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+            product_code, amount_original
+        ) VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
     """, (
-        user["user_id"], user["username"], user["first_name"] or "",
+        user["user_id"],
         None, title, str(amount_total),
         "AWAITING_PAYMENT", now.isoformat(timespec="seconds"), now.isoformat(timespec="seconds"),
         amount_total, currency, service_category, service_code,
         account_mode or "", customer_email or "", notes or "",
-        customer_secret or "", product_code, original_value
+        product_code, original_value
     ), return_lastrowid=True)
+    if customer_secret:
+        set_order_customer_secret(oid, customer_secret)
     # تنظیم ددلاین ۱۵ دقیقه
     await_deadline = (now + timedelta(minutes=PAYMENT_TIMEOUT_MIN)).isoformat(timespec="seconds")
     db_execute("UPDATE orders SET await_deadline=? WHERE id=?", (await_deadline, oid))
@@ -438,10 +948,7 @@ def create_order(
     return oid
 
 def set_order_status(order_id: int, status: str):
-    db_execute(
-        "UPDATE orders SET status=?, updated_at=? WHERE id=?",
-        (status, datetime.now().isoformat(timespec="seconds"), order_id),
-    )
+    _update_order(order_id, status=status)
 
 
 def set_order_deadline(order_id: int, deadline: datetime | str | None) -> None:
@@ -451,35 +958,25 @@ def set_order_deadline(order_id: int, deadline: datetime | str | None) -> None:
         value = None
     else:
         value = str(deadline)
-    db_execute(
-        "UPDATE orders SET await_deadline=?, updated_at=? WHERE id=?",
-        (value, datetime.now().isoformat(timespec="seconds"), order_id),
-    )
+    _update_order(order_id, await_deadline=value)
 
 def set_order_receipt(order_id: int, file_id: str | None, text: str | None):
-    db_execute("UPDATE orders SET receipt_file_id=?, receipt_text=?, updated_at=? WHERE id=?",
-               (file_id, text, datetime.now().isoformat(timespec="seconds"), order_id))
+    _update_order(order_id, receipt_file_id=file_id, receipt_text=text)
 
 def set_order_payment_type(order_id: int, ptype: str):
-    db_execute("UPDATE orders SET payment_type=?, updated_at=? WHERE id=?", (ptype, datetime.now().isoformat(timespec="seconds"), order_id))
+    _update_order(order_id, payment_type=ptype)
 
 def set_order_wallet_reserved(order_id: int, amount: int):
-    db_execute("UPDATE orders SET wallet_reserved_amount=?, updated_at=? WHERE id=?", (amount, datetime.now().isoformat(timespec="seconds"), order_id))
+    _update_order(order_id, wallet_reserved_amount=amount)
 
 def set_order_wallet_used(order_id: int, amount: int):
-    db_execute("UPDATE orders SET wallet_used_amount=?, updated_at=? WHERE id=?", (amount, datetime.now().isoformat(timespec="seconds"), order_id))
+    _update_order(order_id, wallet_used_amount=amount)
 
 def set_order_customer_message(order_id: int, message: str | None):
-    db_execute(
-        "UPDATE orders SET customer_message=?, updated_at=? WHERE id=?",
-        (message or "", datetime.now().isoformat(timespec="seconds"), order_id),
-    )
+    _update_order(order_id, customer_message=message or "")
 
 def set_order_manager_note(order_id: int, note: str | None):
-    db_execute(
-        "UPDATE orders SET manager_note=?, updated_at=? WHERE id=?",
-        (note or "", datetime.now().isoformat(timespec="seconds"), order_id),
-    )
+    _update_order(order_id, manager_note=note or "")
 
 
 def add_order_manager_message(order_id: int, user_id: int | None, message: str) -> int:
@@ -548,13 +1045,79 @@ def set_order_financials(order_id: int, cost_amount: int) -> None:
     )
 
 def set_order_customer_secret(order_id: int, secret: str | None):
-    db_execute(
-        "UPDATE orders SET customer_secret_encrypted=?, updated_at=? WHERE id=?",
-        (secret or "", datetime.now().isoformat(timespec="seconds"), order_id),
-    )
+    _update_order(order_id, customer_secret_encrypted=secret or "")
+
+# ===== Order projections =====
+# each order list selects only the columns it shows, as tuple-backed records instead of dicts
+
+# admin order tables: orders page, dashboard, user and order detail pages
+ORDER_SUMMARY_COLUMNS = (
+    "id",
+    "user_id",
+    "username",
+    "first_name",
+    "customer_email",
+    "plan_title",
+    "service_category",
+    "service_code",
+    "price",
+    "amount_total",
+    "status",
+    "payment_type",
+    "receipt_file_id",
+    "created_at",
+    "updated_at",
+)
+# bot order history (_fmt_order_line, _fmt_order_for_user)
+ORDER_LINE_COLUMNS = (
+    "id",
+    "service_category",
+    "service_code",
+    "account_mode",
+    "notes",
+    "customer_email",
+    "price",
+    "amount_total",
+    "wallet_used_amount",
+    "payment_type",
+    "status",
+    "created_at",
+)
+# bot cart (_fmt_cart_order)
+CART_ORDER_COLUMNS = (
+    "id",
+    "service_category",
+    "service_code",
+    "notes",
+    "price",
+    "amount_subtotal",
+    "discount_amount",
+    "discount_code",
+    "amount_total",
+    "wallet_reserved_amount",
+    "payment_type",
+    "status",
+    "await_deadline",
+    "await_deadline_ts",
+    "created_at",
+)
+OrderSummary = record_type("OrderSummary", ORDER_SUMMARY_COLUMNS)
+OrderLine = record_type("OrderLine", ORDER_LINE_COLUMNS)
+CartOrder = record_type("CartOrder", CART_ORDER_COLUMNS)
+
+
+def _columns(record: type[Record]) -> str:
+    return ", ".join(record._fields)
+
 
 def get_order(order_id: int):
-    return db_execute("SELECT * FROM orders WHERE id=?", (order_id,), fetchone=True)
+    unit = _active_unit()
+    if unit is not None and order_id in unit.orders:
+        return unit.orders[order_id]
+    row = db_execute("SELECT * FROM order_view WHERE id=?", (order_id,), fetchone=True)
+    if unit is not None:
+        unit.orders[order_id] = row
+    return row
 
 def user_has_delivered_order(user_id: int) -> bool:
     row = db_execute(
@@ -568,28 +1131,27 @@ def user_has_delivered_order(user_id: int) -> bool:
     )
     return bool(row)
 
-def list_cart_orders(user_id: int):
-    return db_execute("""
-        SELECT * FROM orders
-        WHERE user_id=? AND status='AWAITING_PAYMENT' AND (await_deadline IS NULL OR await_deadline > ?)
-        ORDER BY await_deadline ASC
-    """, (user_id, datetime.now().isoformat(timespec="seconds")), fetchall=True)
+def list_cart_orders(user_id: int) -> list[CartOrder]:
+    return db_execute(f"""
+        SELECT {_columns(CartOrder)} FROM orders
+        WHERE user_id=? AND status='AWAITING_PAYMENT' AND (await_deadline_ts IS NULL OR await_deadline_ts > ?)
+        ORDER BY await_deadline_ts ASC
+    """, (user_id, int(time.time())), fetchall=True, row_type=CartOrder)
 
 def expire_orders_and_refund():
     # سفارش‌های در انتظار پرداخت که ددلاین گذشته
-    expired = db_execute("""
-        SELECT * FROM orders
-        WHERE status='AWAITING_PAYMENT' AND await_deadline IS NOT NULL AND await_deadline <= ?
-    """, (datetime.now().isoformat(timespec="seconds"),), fetchall=True)
-    for o in expired:
-        rid = int(o["id"])
-        reserved = int(o.get("wallet_reserved_amount") or 0)
-        if reserved > 0:
-            # refund
-            change_wallet(o["user_id"], reserved, "REFUND", note=f"Expire order #{rid}", order_id=rid)
-            set_order_wallet_reserved(rid, 0)
-        release_order_discount(rid)
-        set_order_status(rid, "EXPIRED")
+    now = datetime.now().isoformat(timespec="seconds")
+    expired = []
+    with transaction() as cur:
+        cur.execute("""
+            SELECT * FROM orders
+            WHERE status='AWAITING_PAYMENT' AND await_deadline_ts <= ?
+        """, (int(time.time()),))
+        for row in cur.fetchall():
+            payload = _transition_cur(cur, dict(row), "EXPIRED", now)
+            if payload is not None:
+                expired.append(payload)
+    _count_transitions(expired)
     return expired
 
 
@@ -721,14 +1283,9 @@ def redeem_coupon(user_id: int, code: str) -> tuple[bool, dict[str, Any] | None,
     if limit and used >= limit:
         return False, None, "ظرفیت استفاده از این کوپن تکمیل شده است."
 
-    expires_at = coupon.get("expires_at")
-    if expires_at:
-        try:
-            expire_dt = datetime.fromisoformat(str(expires_at))
-            if datetime.now() > expire_dt:
-                return False, None, "تاریخ انقضای این کوپن گذشته است."
-        except ValueError:
-            pass
+    expires_at_ts = coupon.get("expires_at_ts")
+    if expires_at_ts is not None and time.time() > expires_at_ts:
+        return False, None, "تاریخ انقضای این کوپن گذشته است."
 
     already = db_execute(
         "SELECT id FROM coupon_redemptions WHERE coupon_id=? AND user_id=?",
@@ -955,7 +1512,7 @@ def apply_discount_to_order(
         return False, None, "کد تخفیف نامعتبر است."
 
     now = datetime.now().isoformat(timespec="seconds")
-    with closing(_connect()) as con:
+    with _connection() as con:
         cur = con.cursor()
         cur.execute("PRAGMA foreign_keys=ON;")
         cur.execute("SELECT * FROM orders WHERE id=?", (order_id,))
@@ -999,13 +1556,9 @@ def apply_discount_to_order(
         if limit_value <= 0:
             return False, None, "ظرفیت این کد معتبر نیست."
 
-        expires_at = discount.get("expires_at")
-        if expires_at:
-            try:
-                if datetime.fromisoformat(str(expires_at)) < datetime.now():
-                    return False, None, "تاریخ انقضای این کد گذشته است."
-            except ValueError:
-                pass
+        expires_at_ts = discount.get("expires_at_ts")
+        if expires_at_ts is not None and expires_at_ts < time.time():
+            return False, None, "تاریخ انقضای این کد گذشته است."
 
         cur.execute(
             "SELECT status FROM discount_redemptions WHERE discount_id=? AND user_id=?",
@@ -1092,61 +1645,67 @@ def apply_discount_to_order(
     return True, summary, None
 
 
+def _release_order_discount_cur(cur, order_id: int, now: str) -> None:
+    cur.execute(
+        "SELECT amount_subtotal, discount_amount, amount_total FROM orders WHERE id=?",
+        (order_id,),
+    )
+    row = cur.fetchone()
+    if not row:
+        return
+    order = dict(row)
+    subtotal, discount_amount, total = _order_pricing_snapshot(order)
+    if subtotal <= 0:
+        subtotal = total + discount_amount
+    cur.execute(
+        """
+        UPDATE orders
+        SET amount_total=?, discount_amount=0, discount_code_id=NULL,
+            discount_code='', discount_applied_at=NULL, updated_at=?
+        WHERE id=?
+        """,
+        (max(subtotal, 0), now, order_id),
+    )
+    cur.execute(
+        "DELETE FROM discount_redemptions WHERE order_id=? AND status='APPLIED'",
+        (order_id,),
+    )
+
+
 def release_order_discount(order_id: int) -> None:
-    with closing(_connect()) as con:
+    with _connection() as con:
         cur = con.cursor()
         cur.execute("PRAGMA foreign_keys=ON;")
-        cur.execute(
-            "SELECT amount_subtotal, discount_amount, amount_total FROM orders WHERE id=?",
-            (order_id,),
-        )
-        row = cur.fetchone()
-        if not row:
-            return
-        order = dict(row)
-        subtotal, discount_amount, total = _order_pricing_snapshot(order)
-        if subtotal <= 0:
-            subtotal = total + discount_amount
-        now = datetime.now().isoformat(timespec="seconds")
-        cur.execute(
-            """
-            UPDATE orders
-            SET amount_total=?, discount_amount=0, discount_code_id=NULL,
-                discount_code='', discount_applied_at=NULL, updated_at=?
-            WHERE id=?
-            """,
-            (max(subtotal, 0), now, order_id),
-        )
-        cur.execute(
-            "DELETE FROM discount_redemptions WHERE order_id=? AND status='APPLIED'",
-            (order_id,),
-        )
+        _release_order_discount_cur(cur, order_id, datetime.now().isoformat(timespec="seconds"))
         con.commit()
 
 
+def _confirm_order_discount_cur(cur, order_id: int, now: str) -> None:
+    cur.execute(
+        "SELECT id, discount_id, status FROM discount_redemptions WHERE order_id=?",
+        (order_id,),
+    )
+    row = cur.fetchone()
+    if not row:
+        return
+    status = str(row[2] or "").upper()
+    if status == "CONFIRMED":
+        return
+    cur.execute(
+        "UPDATE discount_redemptions SET status='CONFIRMED', confirmed_at=? WHERE id=?",
+        (now, row[0]),
+    )
+    cur.execute(
+        "UPDATE discount_codes SET used_count=used_count+1, updated_at=? WHERE id=?",
+        (now, row[1]),
+    )
+
+
 def confirm_order_discount(order_id: int) -> None:
-    with closing(_connect()) as con:
+    with _connection() as con:
         cur = con.cursor()
         cur.execute("PRAGMA foreign_keys=ON;")
-        cur.execute(
-            "SELECT id, discount_id, status FROM discount_redemptions WHERE order_id=?",
-            (order_id,),
-        )
-        row = cur.fetchone()
-        if not row:
-            return
-        status = str(row[2] or "").upper()
-        if status == "CONFIRMED":
-            return
-        now = datetime.now().isoformat(timespec="seconds")
-        cur.execute(
-            "UPDATE discount_redemptions SET status='CONFIRMED', confirmed_at=? WHERE id=?",
-            (now, row[0]),
-        )
-        cur.execute(
-            "UPDATE discount_codes SET used_count=used_count+1, updated_at=? WHERE id=?",
-            (now, row[1]),
-        )
+        _confirm_order_discount_cur(cur, order_id, datetime.now().isoformat(timespec="seconds"))
         con.commit()
 
 # ====== Stats & History ======
@@ -1171,7 +1730,7 @@ def get_user_stats(user_id: int):
         "orders_done": int(done or 0),
     }
 
-def list_orders_by_category(user_id: int, category: str, limit: int = 10, offset: int = 0):
+def list_orders_by_category(user_id: int, category: str, limit: int = 10, offset: int = 0) -> list[OrderLine]:
     where = "user_id=?"
     params = [user_id]
     if category == "inprog":
@@ -1183,9 +1742,9 @@ def list_orders_by_category(user_id: int, category: str, limit: int = 10, offset
     else:
         where += " AND 1=0"  # ناشناخته
 
-    sql = f"SELECT * FROM orders WHERE {where} ORDER BY id DESC LIMIT ? OFFSET ?"
+    sql = f"SELECT {_columns(OrderLine)} FROM orders WHERE {where} ORDER BY id DESC LIMIT ? OFFSET ?"
     params += [limit, offset]
-    return db_execute(sql, tuple(params), fetchall=True)
+    return db_execute(sql, tuple(params), fetchall=True, row_type=OrderLine)
 
 def count_orders_by_category(user_id: int, category: str):
     where = "user_id=?"
@@ -1249,9 +1808,9 @@ def _build_where(parts: Iterable[str]) -> str:
 
 
 def get_dashboard_snapshot():
-    now = datetime.now()
-    last_7_days = (now - timedelta(days=7)).isoformat(timespec="seconds")
-    last_30_days = (now - timedelta(days=30)).isoformat(timespec="seconds")
+    now = int(time.time())
+    last_7_days = now - 7 * 86400
+    last_30_days = now - 30 * 86400
 
     totals = db_execute(
         "SELECT COUNT(*) AS total FROM orders",
@@ -1288,24 +1847,21 @@ def get_dashboard_snapshot():
         """
         SELECT COALESCE(SUM(amount_total), 0) AS total
         FROM orders
-        WHERE created_at >= ?
+        WHERE created_at_ts >= ?
     """,
         (last_30_days,),
         fetchone=True,
     )["total"]
     new_orders_week = db_execute(
-        "SELECT COUNT(*) AS c FROM orders WHERE created_at >= ?",
+        "SELECT COUNT(*) AS c FROM orders WHERE created_at_ts >= ?",
         (last_7_days,),
         fetchone=True,
     )["c"]
 
-    wallet_totals = {
-        row["type"]: row["total"]
-        for row in db_execute(
-            "SELECT type, COALESCE(SUM(amount), 0) AS total FROM wallet_tx GROUP BY type",
-            fetchall=True,
-        )
-    }
+    wallet_balance = db_execute(
+        "SELECT COALESCE(SUM(wallet_balance), 0) AS total FROM users",
+        fetchone=True,
+    )["total"]
 
     return {
         "orders_total": totals["total"],
@@ -1317,16 +1873,176 @@ def get_dashboard_snapshot():
         "revenue_total": revenue_total or 0,
         "revenue_30_days": revenue_30 or 0,
         "new_orders_week": new_orders_week or 0,
-        "wallet_totals": wallet_totals,
+        "wallet_balance": wallet_balance or 0,
         "status_counts": status_counts,
     }
 
 
-def list_recent_orders(limit: int = 8):
+def list_recent_orders(limit: int = 8) -> list[OrderSummary]:
     return db_execute(
-        "SELECT * FROM orders ORDER BY created_at DESC LIMIT ?",
+        f"SELECT {_columns(OrderSummary)} FROM order_view ORDER BY created_at_ts DESC LIMIT ?",
         (limit,),
         fetchall=True,
+        row_type=OrderSummary,
+    )
+
+
+def latest_event_id() -> int:
+    row = db_execute("SELECT COALESCE(MAX(id), 0) AS id FROM events", fetchone=True)
+    return row["id"] if row else 0
+
+
+def list_events_after(after_id: int, limit: int = 500):
+    """Feed events newer than ``after_id``, oldest first, with the order row they refer to."""
+
+    return db_execute(
+        """
+        SELECT e.id, e.kind, e.ref_id, e.status, e.old_status, e.amount, e.created_at,
+               o.user_id, u.username, u.first_name, o.plan_title, o.service_code, o.customer_email,
+               o.amount_total, o.price, o.created_at AS order_created_at, o.updated_at AS order_updated_at
+        FROM events e
+        LEFT JOIN orders o ON e.kind LIKE 'order.%' AND o.id = e.ref_id
+        LEFT JOIN users u ON u.user_id = o.user_id
+        WHERE e.id > ?
+        ORDER BY e.id
+        LIMIT ?
+        """,
+        (after_id, limit),
+        fetchall=True,
+    )
+
+
+def prune_events(keep: int) -> int:
+    """Drop all but the newest ``keep`` feed events; returns the number removed."""
+
+    with transaction() as cur:
+        cur.execute("DELETE FROM events WHERE id <= (SELECT COALESCE(MAX(id), 0) FROM events) - ?", (keep,))
+        return cur.rowcount
+
+
+OUTBOX_STATUS_LABELS = {
+    "PENDING": "در صف ارسال",
+    "SENDING": "در حال ارسال",
+    "SENT": "ارسال شد",
+    "FAILED": "ناموفق",
+}
+
+
+def enqueue_outbox(
+    kind: str,
+    user_id: int,
+    text: str,
+    *,
+    order_id: int | None = None,
+    reply_markup: str | None = None,
+) -> int:
+    now = datetime.now().isoformat(timespec="seconds")
+    return db_execute(
+        """
+        INSERT INTO outbox(kind, user_id, order_id, text, reply_markup, status, next_attempt_at, created_at)
+        VALUES(?,?,?,?,?,'PENDING',?,?)
+        """,
+        (kind, user_id, order_id, text, reply_markup, now, now),
+        return_lastrowid=True,
+    )
+
+
+def enqueue_outbox_many(kind: str, messages: Iterable[tuple[int, int | None, str]]) -> int:
+    """Queue ``(user_id, order_id, text)`` messages in one transaction; returns how many."""
+
+    now = datetime.now().isoformat(timespec="seconds")
+    rows = [(kind, user_id, order_id, text, now, now) for user_id, order_id, text in messages]
+    if not rows:
+        return 0
+    with transaction() as cur:
+        cur.executemany(
+            """
+            INSERT INTO outbox(kind, user_id, order_id, text, status, next_attempt_at, created_at)
+            VALUES(?,?,?,?,'PENDING',?,?)
+            """,
+            rows,
+        )
+    return len(rows)
+
+
+def claim_outbox(limit: int, lease_seconds: int) -> list[dict[str, Any]]:
+    """Take up to ``limit`` due messages for sending.
+
+    Claimed rows are ``SENDING`` until ``lease_seconds`` from now; if the
+    sender dies before reporting back, they become due again after that.
+    """
+
+    now = datetime.now()
+    lease_until = (now + timedelta(seconds=lease_seconds)).isoformat(timespec="seconds")
+    with transaction() as cur:
+        cur.execute(
+            """
+            SELECT * FROM outbox
+            WHERE status IN ('PENDING','SENDING') AND next_attempt_at_ts <= ?
+            ORDER BY id
+            LIMIT ?
+            """,
+            (int(now.timestamp()), limit),
+        )
+        rows = [dict(row) for row in cur.fetchall()]
+        cur.executemany(
+            "UPDATE outbox SET status='SENDING', attempts=attempts+1, next_attempt_at=? WHERE id=?",
+            [(lease_until, row["id"]) for row in rows],
+        )
+    for row in rows:
+        row["attempts"] += 1
+    return rows
+
+
+def complete_outbox(outbox_id: int) -> None:
+    now = datetime.now().isoformat(timespec="seconds")
+    db_execute(
+        "UPDATE outbox SET status='SENT', sent_at=?, last_error=NULL WHERE id=?",
+        (now, outbox_id),
+    )
+
+
+def fail_outbox(outbox_id: int, error: str, retry_at: datetime | None = None) -> None:
+    """Record a failed attempt; retried at ``retry_at``, or given up on when it is ``None``."""
+
+    if retry_at is None:
+        db_execute(
+            "UPDATE outbox SET status='FAILED', next_attempt_at=NULL, last_error=? WHERE id=?",
+            (error[:500], outbox_id),
+        )
+    else:
+        db_execute(
+            "UPDATE outbox SET status='PENDING', next_attempt_at=?, last_error=? WHERE id=?",
+            (retry_at.isoformat(timespec="seconds"), error[:500], outbox_id),
+        )
+
+
+def retry_outbox(outbox_id: int) -> dict[str, Any] | None:
+    """Put a ``FAILED`` message back in the queue; returns it, or ``None`` if it was not failed."""
+
+    now = datetime.now().isoformat(timespec="seconds")
+    with transaction() as cur:
+        cur.execute(
+            "UPDATE outbox SET status='PENDING', attempts=0, next_attempt_at=? WHERE id=? AND status='FAILED'",
+            (now, outbox_id),
+        )
+        if not cur.rowcount:
+            return None
+        cur.execute("SELECT * FROM outbox WHERE id=?", (outbox_id,))
+        return dict(cur.fetchone())
+
+
+def list_outbox(*, order_id: int | None = None, user_id: int | None = None, limit: int = 20) -> list[dict[str, Any]]:
+    if order_id is not None:
+        where, params = "order_id=?", (order_id,)
+    elif user_id is not None:
+        where, params = "user_id=?", (user_id,)
+    else:
+        where, params = "1=1", ()
+    return db_execute(
+        f"SELECT * FROM outbox WHERE {where} ORDER BY id DESC LIMIT ?",
+        (*params, limit),
+        fetchall=True,
     )
 
 
@@ -1346,14 +2062,11 @@ def list_recent_wallet_tx(limit: int = 10):
     )
 
 
-def list_orders(
-    *,
+def _order_filters(
     status: str | None = None,
     search: str | None = None,
-    limit: int = 20,
-    offset: int = 0,
     user_id: int | None = None,
-):
+) -> tuple[list[str], list[Any]]:
     where_parts: list[str] = []
     params: list[Any] = []
 
@@ -1374,39 +2087,30 @@ def list_orders(
         else:
             like = f"%{term.lower()}%"
             where_parts.append(
-                "(LOWER(username) LIKE ? OR LOWER(first_name) LIKE ? OR LOWER(plan_title) LIKE ? OR LOWER(customer_email) LIKE ?)"
+                "(user_id IN (SELECT user_id FROM users WHERE LOWER(username) LIKE ? OR LOWER(first_name) LIKE ?)"
+                " OR LOWER(plan_title) LIKE ? OR LOWER(customer_email) LIKE ?)"
             )
             params.extend([like, like, like, like])
+    return where_parts, params
+
 
+def list_orders(
+    *,
+    status: str | None = None,
+    search: str | None = None,
+    limit: int = 20,
+    offset: int = 0,
+    user_id: int | None = None,
+) -> list[OrderSummary]:
+    where_parts, params = _order_filters(status, search, user_id)
     where_sql = _build_where(where_parts)
-    sql = f"SELECT * FROM orders WHERE {where_sql} ORDER BY created_at DESC LIMIT ? OFFSET ?"
+    sql = f"SELECT {_columns(OrderSummary)} FROM order_view WHERE {where_sql} ORDER BY created_at_ts DESC LIMIT ? OFFSET ?"
     params.extend([limit, offset])
-    return db_execute(sql, tuple(params), fetchall=True)
+    return db_execute(sql, tuple(params), fetchall=True, row_type=OrderSummary)
 
 
 def count_orders(status: str | None = None, search: str | None = None, user_id: int | None = None) -> int:
-    where_parts: list[str] = []
-    params: list[Any] = []
-    if user_id is not None:
-        where_parts.append("user_id=?")
-        params.append(user_id)
-    if status and status != "all":
-        where_parts.append("status=?")
-        params.append(status)
-    if search:
-        term = search.strip()
-        if term.startswith("#"):
-            term = term[1:]
-        if term.isdigit():
-            where_parts.append("id=?")
-            params.append(int(term))
-        else:
-            like = f"%{term.lower()}%"
-            where_parts.append(
-                "(LOWER(username) LIKE ? OR LOWER(first_name) LIKE ? OR LOWER(plan_title) LIKE ? OR LOWER(customer_email) LIKE ?)"
-            )
-            params.extend([like, like, like, like])
-
+    where_parts, params = _order_filters(status, search, user_id)
     where_sql = _build_where(where_parts)
     sql = f"SELECT COUNT(*) AS c FROM orders WHERE {where_sql}"
     result = db_execute(sql, tuple(params), fetchone=True)
@@ -1417,6 +2121,224 @@ def update_order_notes(order_id: int, notes: str) -> None:
     set_order_manager_note(order_id, notes)
 
 
+# ===== Order state machine =====
+
+# مجاز بودن انتقال وضعیت‌ها؛ وضعیت‌های نهایی به جایی منتقل نمی‌شوند
+ORDER_TRANSITIONS: dict[str, frozenset[str]] = {
+    "AWAITING_PAYMENT": frozenset(
+        {"PENDING_CONFIRM", "PENDING_PLAN", "IN_PROGRESS", "REJECTED", "CANCELED", "EXPIRED"}
+    ),
+    "PENDING_CONFIRM": frozenset(
+        {"AWAITING_PAYMENT", "IN_PROGRESS", "READY_TO_DELIVER", "DELIVERED", "COMPLETED", "REJECTED", "CANCELED"}
+    ),
+    "PENDING_PLAN": frozenset({"IN_PROGRESS", "REJECTED", "CANCELED"}),
+    "IN_PROGRESS": frozenset({"READY_TO_DELIVER", "DELIVERED", "COMPLETED", "REJECTED"}),
+    "READY_TO_DELIVER": frozenset({"IN_PROGRESS", "DELIVERED", "COMPLETED", "REJECTED"}),
+    "DELIVERED": frozenset({"AWAITING_PAYMENT", "IN_PROGRESS", "COMPLETED", "REJECTED"}),
+    "COMPLETED": frozenset(),
+    "EXPIRED": frozenset(),
+    "REJECTED": frozenset(),
+    "CANCELED": frozenset(),
+}
+# وضعیت‌های قدیمی که معادل «در حال انجام» هستند
+ORDER_TRANSITIONS["APPROVED"] = ORDER_TRANSITIONS["IN_PROGRESS"]
+ORDER_TRANSITIONS["PLAN_CONFIRMED"] = ORDER_TRANSITIONS["IN_PROGRESS"]
+
+# وضعیت‌هایی که با رسیدن به آن‌ها مبلغ رزرو کیف پول قطعی می‌شود
+WALLET_SETTLE_STATUSES = {"IN_PROGRESS", "READY_TO_DELIVER", "DELIVERED", "COMPLETED"}
+FINAL_ORDER_STATUSES = {status for status, targets in ORDER_TRANSITIONS.items() if not targets}
+
+_TRANSITION_COLUMNS = {
+    "receipt_file_id",
+    "receipt_text",
+    "customer_message",
+    "payment_type",
+    "await_deadline",
+}
+
+
+def can_transition(from_status: str | None, to_status: str) -> bool:
+    return to_status in ORDER_TRANSITIONS.get(from_status or "", frozenset())
+
+
+def _wallet_credit_cur(cur, user_id: int, amount: int, tx_type: str, note: str, order_id: int, now: str) -> None:
+    cur.execute(
+        "UPDATE users SET wallet_balance=wallet_balance+?, updated_at=? WHERE user_id=?",
+        (amount, now, user_id),
+    )
+    cur.execute(
+        "INSERT INTO wallet_tx(user_id, order_id, amount, type, note, created_at) VALUES(?,?,?,?,?,?)",
+        (user_id, order_id, abs(amount), tx_type, note, now),
+    )
+
+
+def _wallet_debit_cur(cur, user_id: int, amount: int, tx_type: str, note: str, order_id: int, now: str) -> bool:
+    cur.execute(
+        "UPDATE users SET wallet_balance=wallet_balance-?, updated_at=? WHERE user_id=? AND wallet_balance>=?",
+        (amount, now, user_id, amount),
+    )
+    if not cur.rowcount:
+        return False
+    cur.execute(
+        "INSERT INTO wallet_tx(user_id, order_id, amount, type, note, created_at) VALUES(?,?,?,?,?,?)",
+        (user_id, order_id, abs(amount), tx_type, note, now),
+    )
+    return True
+
+
+def _transition_cur(
+    cur,
+    order: dict[str, Any],
+    to_status: str,
+    now: str,
+    *,
+    wallet_debit: int = 0,
+    updates: dict[str, Any] | None = None,
+) -> dict[str, Any] | None:
+    oid = int(order["id"])
+    user_id = order.get("user_id")
+    from_status = order.get("status")
+    if not can_transition(from_status, to_status):
+        return None
+
+    reserved = int(order.get("wallet_reserved_amount") or 0)
+    used = int(order.get("wallet_used_amount") or 0)
+    refund_total = 0
+
+    if wallet_debit > 0:
+        if not _wallet_debit_cur(cur, user_id, wallet_debit, "DEBIT", f"Order #{oid}", oid, now):
+            return None
+        used += wallet_debit
+
+    if to_status in WALLET_SETTLE_STATUSES and reserved > 0:
+        reserved, used = 0, used + reserved
+    elif to_status == "REJECTED":
+        note = f"Order #{oid} rejected"
+        if reserved > 0:
+            _wallet_credit_cur(cur, user_id, reserved, "REFUND", note, oid, now)
+        if used > 0:
+            _wallet_credit_cur(cur, user_id, used, "REFUND", note, oid, now)
+        card_part = 0
+        if order.get("receipt_file_id") or order.get("receipt_text"):
+            card_part = max(int(order.get("amount_total") or 0) - reserved - used, 0)
+        if card_part > 0:
+            _wallet_credit_cur(cur, user_id, card_part, "CREDIT", f"Order #{oid} card refund", oid, now)
+        refund_total = reserved + used + card_part
+        reserved = used = 0
+    elif to_status in {"CANCELED", "EXPIRED"}:
+        if reserved > 0:
+            label = "Cancel" if to_status == "CANCELED" else "Expire"
+            _wallet_credit_cur(cur, user_id, reserved, "REFUND", f"{label} order #{oid}", oid, now)
+            refund_total = reserved
+            reserved = 0
+
+    columns = {
+        "status": to_status,
+        "wallet_reserved_amount": reserved,
+        "wallet_used_amount": used,
+        "updated_at": now,
+    }
+    details = {}
+    for key, value in (updates or {}).items():
+        if key not in _TRANSITION_COLUMNS:
+            raise ValueError(f"column {key} cannot be changed by an order transition")
+        value = value.isoformat(timespec="seconds") if isinstance(value, datetime) else value
+        if key in ORDER_DETAIL_COLUMNS:
+            details[key] = value
+        else:
+            columns[key] = value
+    assignments = ", ".join(f"{col}=?" for col in columns)
+    cur.execute(
+        f"UPDATE orders SET {assignments} WHERE id=? AND status=?",
+        (*columns.values(), oid, from_status),
+    )
+    if not cur.rowcount:
+        return None
+    if details:
+        _upsert_order_details_cur(cur, oid, details, now)
+
+    if to_status in {"CANCELED", "EXPIRED"}:
+        _release_order_discount_cur(cur, oid, now)
+    elif from_status == "AWAITING_PAYMENT" and to_status in {"PENDING_CONFIRM", "IN_PROGRESS"}:
+        _confirm_order_discount_cur(cur, oid, now)
+
+    cur.execute("SELECT * FROM order_view WHERE id=?", (oid,))
+    return {
+        "order_id": oid,
+        "user_id": user_id,
+        "from_status": from_status,
+        "to_status": to_status,
+        "refund_total": refund_total,
+        "order": dict(cur.fetchone()),
+    }
+
+
+def transition_order(
+    order_id: int,
+    to_status: str,
+    *,
+    allowed_from: Iterable[str] | None = None,
+    user_id: int | None = None,
+    wallet_debit: int = 0,
+    updates: dict[str, Any] | None = None,
+) -> dict[str, Any] | None:
+    """Move an order to ``to_status`` with all wallet/discount effects in one transaction.
+
+    The status is compare-and-set against the value read inside the transaction, so
+    repeated or racing requests become no-ops. Returns the notification payload
+    (``order_id``, ``user_id``, ``from_status``, ``to_status``, ``refund_total`` and the
+    updated ``order``) or ``None`` when nothing changed.
+    """
+
+    if to_status not in ORDER_TRANSITIONS:
+        raise ValueError(f"unknown order status {to_status}")
+    allowed = set(allowed_from) if allowed_from is not None else None
+    now = datetime.now().isoformat(timespec="seconds")
+    with transaction() as cur:
+        cur.execute("SELECT * FROM order_view WHERE id=?", (order_id,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        order = dict(row)
+        if user_id is not None and order.get("user_id") != user_id:
+            return None
+        if allowed is not None and order.get("status") not in allowed:
+            return None
+        payload = _transition_cur(cur, order, to_status, now, wallet_debit=wallet_debit, updates=updates)
+    _count_transitions([payload])
+    return payload
+
+
+def transition_orders(
+    order_ids: Iterable[int],
+    to_status: str,
+    *,
+    allowed_from: Iterable[str] | None = None,
+) -> list[dict[str, Any]]:
+    """Apply the same transition to several orders in a single transaction."""
+
+    if to_status not in ORDER_TRANSITIONS:
+        raise ValueError(f"unknown order status {to_status}")
+    ids = sorted({int(x) for x in order_ids})
+    if not ids:
+        return []
+    allowed = set(allowed_from) if allowed_from is not None else None
+    now = datetime.now().isoformat(timespec="seconds")
+    changed: list[dict[str, Any]] = []
+    with transaction() as cur:
+        placeholders = ",".join("?" for _ in ids)
+        cur.execute(f"SELECT * FROM order_view WHERE id IN ({placeholders})", ids)
+        for row in cur.fetchall():
+            order = dict(row)
+            if allowed is not None and order.get("status") not in allowed:
+                continue
+            payload = _transition_cur(cur, order, to_status, now)
+            if payload is not None:
+                changed.append(payload)
+    _count_transitions(changed)
+    return changed
+
+
 def list_wallet_tx_for_order(order_id: int) -> list[dict[str, Any]]:
     return db_execute(
         "SELECT * FROM wallet_tx WHERE order_id=? ORDER BY created_at DESC",
@@ -1425,7 +2347,7 @@ def list_wallet_tx_for_order(order_id: int) -> list[dict[str, Any]]:
     )
 
 
-def list_users(search: str | None = None, limit: int = 20, offset: int = 0):
+def _user_filters(search: str | None = None) -> tuple[list[str], list[Any]]:
     where_parts: list[str] = []
     params: list[Any] = []
     if search:
@@ -1436,6 +2358,11 @@ def list_users(search: str | None = None, limit: int = 20, offset: int = 0):
             params.append(int(term))
         where_parts.append("(LOWER(username) LIKE ? OR LOWER(first_name) LIKE ?)")
         params.extend([like, like])
+    return where_parts, params
+
+
+def list_users(search: str | None = None, limit: int = 20, offset: int = 0):
+    where_parts, params = _user_filters(search)
     where_sql = _build_where(where_parts)
     sql = f"SELECT * FROM users WHERE {where_sql} ORDER BY created_at DESC LIMIT ? OFFSET ?"
     params.extend([limit, offset])
@@ -1443,16 +2370,7 @@ def list_users(search: str | None = None, limit: int = 20, offset: int = 0):
 
 
 def count_users(search: str | None = None) -> int:
-    where_parts: list[str] = []
-    params: list[Any] = []
-    if search:
-        term = search.strip()
-        like = f"%{term.lower()}%"
-        if term.isdigit():
-            where_parts.append("user_id=?")
-            params.append(int(term))
-        where_parts.append("(LOWER(username) LIKE ? OR LOWER(first_name) LIKE ?)")
-        params.extend([like, like])
+    where_parts, params = _user_filters(search)
     where_sql = _build_where(where_parts)
     sql = f"SELECT COUNT(*) AS c FROM users WHERE {where_sql}"
     result = db_execute(sql, tuple(params), fetchone=True)
@@ -1591,3 +2509,234 @@ def set_service_message_status(message_id: int, resolved: bool) -> None:
         "UPDATE service_messages SET is_resolved=?, updated_at=? WHERE id=?",
         (1 if resolved else 0, datetime.now().isoformat(timespec="seconds"), message_id),
     )
+
+
+# ===== Export =====
+
+EXPORT_CHUNK_SIZE = 1000
+
+
+def _iter_keyset(
+    table: str,
+    key: str,
+    where_parts: list[str],
+    params: list[Any],
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[list[dict[str, Any]]]:
+    # هر بخش یک کوئری کوتاه جداست تا قفل خواندن در طول خروجی گرفتن نگه داشته نشود
+    last_key = None
+    with _connection() as con:
+        cur = con.cursor()
+        while True:
+            parts = list(where_parts)
+            chunk_params = list(params)
+            if last_key is not None:
+                parts.append(f"{key}>?")
+                chunk_params.append(last_key)
+            cur.execute(
+                f"SELECT * FROM {table} WHERE {_build_where(parts)} ORDER BY {key} LIMIT ?",
+                (*chunk_params, chunk_size),
+            )
+            rows = [dict(r) for r in cur.fetchall()]
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            last_key = rows[-1][key]
+
+
+def iter_orders_export(
+    *,
+    status: str | None = None,
+    search: str | None = None,
+    user_id: int | None = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[list[dict[str, Any]]]:
+    where_parts, params = _order_filters(status, search, user_id)
+    return _iter_keyset("order_view", "id", where_parts, params, chunk_size)
+
+
+def iter_wallet_tx_export(
+    *, user_id: int | None = None, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[list[dict[str, Any]]]:
+    where_parts: list[str] = []
+    params: list[Any] = []
+    if user_id is not None:
+        where_parts.append("user_id=?")
+        params.append(user_id)
+    return _iter_keyset("wallet_tx", "id", where_parts, params, chunk_size)
+
+
+def iter_users_export(
+    *, search: str | None = None, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[list[dict[str, Any]]]:
+    where_parts, params = _user_filters(search)
+    return _iter_keyset("users", "user_id", where_parts, params, chunk_size)
+
+
+# ===== JSON API =====
+
+# resource name -> (table, key column); lists are newest key first
+API_RESOURCES = {
+    "orders": ("order_view", "id"),
+    "users": ("users", "user_id"),
+    "wallet_tx": ("wallet_tx", "id"),
+    "discounts": ("discount_codes", "id"),
+    "coupons": ("coupons", "id"),
+    "messages": ("service_messages", "id"),
+}
+# filters each list accepts; orders and users reuse the admin list filters, the rest are column equality
+API_FILTERS: dict[str, dict[str, type]] = {
+    "orders": {"status": str, "q": str, "user_id": int},
+    "users": {"q": str, "is_blocked": bool},
+    "wallet_tx": {"user_id": int, "order_id": int, "type": str},
+    "discounts": {"product_key": str, "is_active": bool},
+    "coupons": {"is_active": bool},
+    "messages": {"category": str, "is_resolved": bool},
+}
+# never leave the server through the API
+API_HIDDEN_COLUMNS = {"customer_secret_encrypted"}
+
+_api_columns: dict[str, tuple[str, ...]] = {}
+
+
+def api_columns(resource: str) -> tuple[str, ...]:
+    columns = _api_columns.get(resource)
+    if columns is None:
+        table, _ = API_RESOURCES[resource]
+        rows = db_execute(f"PRAGMA table_info({table})", fetchall=True)
+        columns = tuple(row["name"] for row in rows if row["name"] not in API_HIDDEN_COLUMNS)
+        _api_columns[resource] = columns
+    return columns
+
+
+def _api_select(resource: str, fields: Iterable[str] | None) -> str:
+    columns = api_columns(resource)
+    if not fields:
+        return ", ".join(columns)
+    _, key = API_RESOURCES[resource]
+    wanted = [key]
+    for field in fields:
+        if field not in columns:
+            raise ValueError(f"unknown field {field}")
+        if field not in wanted:
+            wanted.append(field)
+    return ", ".join(wanted)
+
+
+def _api_filters(resource: str, filters: dict[str, Any]) -> tuple[list[str], list[Any]]:
+    filters = dict(filters)
+    unknown = set(filters) - set(API_FILTERS[resource])
+    if unknown:
+        raise ValueError(f"unknown filter {sorted(unknown)[0]}")
+    if resource == "orders":
+        return _order_filters(filters.get("status"), filters.get("q"), filters.get("user_id"))
+    where_parts: list[str] = []
+    params: list[Any] = []
+    if resource == "users":
+        where_parts, params = _user_filters(filters.pop("q", None))
+    if resource == "discounts" and filters.get("product_key"):
+        filters["product_key"] = filters["product_key"].strip().upper()
+    for column, value in filters.items():
+        where_parts.append(f"{column}=?")
+        params.append(int(value) if isinstance(value, bool) else value)
+    return where_parts, params
+
+
+def list_api_rows(
+    resource: str,
+    *,
+    fields: Iterable[str] | None = None,
+    filters: dict[str, Any] | None = None,
+    before: int | None = None,
+    limit: int = 50,
+) -> list[dict[str, Any]]:
+    """One keyset page of ``resource``: rows with a key below ``before``, newest first, only ``fields``."""
+
+    table, key = API_RESOURCES[resource]
+    columns = _api_select(resource, fields)
+    where_parts, params = _api_filters(resource, filters or {})
+    if before is not None:
+        where_parts.append(f"{key}<?")
+        params.append(before)
+    sql = f"SELECT {columns} FROM {table} WHERE {_build_where(where_parts)} ORDER BY {key} DESC LIMIT ?"
+    params.append(limit)
+    return db_execute(sql, tuple(params), fetchall=True)
+
+
+def get_api_rows(resource: str, ids: Iterable[int], *, fields: Iterable[str] | None = None) -> list[dict[str, Any]]:
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return []
+    table, key = API_RESOURCES[resource]
+    columns = _api_select(resource, fields)
+    placeholders = ",".join("?" * len(ids))
+    rows = db_execute(f"SELECT {columns} FROM {table} WHERE {key} IN ({placeholders})", tuple(ids), fetchall=True)
+    by_key = {row[key]: row for row in rows}
+    return [by_key[i] for i in ids if i in by_key]
+
+
+# ===== Local blob store index =====
+
+def get_blob(file_id: str) -> dict[str, Any] | None:
+    return db_execute("SELECT * FROM blobs WHERE file_id=?", (file_id,), fetchone=True)
+
+
+def save_blob(
+    file_id: str,
+    sha256: str,
+    size: int,
+    media_type: str | None,
+    filename: str | None,
+    has_thumb: bool,
+) -> None:
+    now = datetime.now().isoformat(timespec="seconds")
+    db_execute(
+        """
+        INSERT INTO blobs(file_id, sha256, size, media_type, filename, has_thumb, created_at, last_access)
+        VALUES(?,?,?,?,?,?,?,?)
+        ON CONFLICT(file_id) DO UPDATE SET
+            sha256=excluded.sha256, size=excluded.size, media_type=excluded.media_type,
+            filename=excluded.filename, has_thumb=excluded.has_thumb, last_access=excluded.last_access
+        """,
+        (file_id, sha256, int(size), media_type or "", filename or "", 1 if has_thumb else 0, now, now),
+    )
+
+
+def touch_blob(file_id: str) -> None:
+    db_execute(
+        "UPDATE blobs SET last_access=? WHERE file_id=?",
+        (datetime.now().isoformat(timespec="seconds"), file_id),
+    )
+
+
+def list_blob_thumbs(file_ids: Iterable[str]) -> set[str]:
+    ids = [f for f in file_ids if f]
+    if not ids:
+        return set()
+    marks = ",".join("?" for _ in ids)
+    rows = db_execute(
+        f"SELECT file_id FROM blobs WHERE has_thumb=1 AND file_id IN ({marks})",
+        tuple(ids),
+        fetchall=True,
+    )
+    return {row["file_id"] for row in rows}
+
+
+def list_blob_contents() -> list[dict[str, Any]]:
+    """One row per stored content hash, least recently used first."""
+
+    return db_execute(
+        """
+        SELECT sha256, MAX(size) AS size, MAX(last_access) AS last_access
+        FROM blobs
+        GROUP BY sha256
+        ORDER BY last_access ASC
+        """,
+        fetchall=True,
+    )
+
+
+def delete_blob_content(sha256: str) -> None:
+    db_execute("DELETE FROM blobs WHERE sha256=?", (sha256,))
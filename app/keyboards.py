@@ -1,8 +1,12 @@
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from .config import CURRENCY, PLANS
 
+# کیبوردهای ثابت یک بار ساخته و بین همه پاسخ‌ها به اشتراک گذاشته می‌شوند (مدل‌های aiogram frozen هستند)
+
 # ====== Reply Keyboards ======
 REPLY_BTN_PRODUCTS = "🛍️ محصولات و خدمات"
 REPLY_BTN_CART = "🧺 سبد خرید"
@@ -10,6 +14,7 @@ REPLY_BTN_PROFILE = "👤 اطلاعات کاربری"
 REPLY_BTN_SUPPORT = "🛟 پشتیبانی"
 
 
+@lru_cache(maxsize=None)
 def reply_main() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[
@@ -22,6 +27,7 @@ def reply_main() -> ReplyKeyboardMarkup:
     )
 
 
+@lru_cache(maxsize=None)
 def reply_request_contact() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[
@@ -34,6 +40,7 @@ def reply_request_contact() -> ReplyKeyboardMarkup:
     )
 
 
+@lru_cache(maxsize=8)
 def ik_force_join(join_url: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     if join_url:
@@ -45,6 +52,7 @@ def ik_force_join(join_url: str) -> InlineKeyboardMarkup:
 
 # ====== Legacy Inline Keyboards (برای بخش‌هایی که هنوز بازطراحی نشده‌اند) ======
 
+@lru_cache(maxsize=None)
 def kb_home() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="🛒 خرید اکانت", callback_data="buy")
@@ -54,6 +62,7 @@ def kb_home() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def kb_plans() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for plan in PLANS:
@@ -78,6 +87,7 @@ def kb_admin_actions(order_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=None)
 def kb_account() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="🔄 بروزرسانی", callback_data="account_refresh")
@@ -89,6 +99,7 @@ def kb_account() -> InlineKeyboardMarkup:
 
 # ====== Shop Navigation ======
 
+@lru_cache(maxsize=None)
 def ik_shop_main() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="📣 خدمات تلگرام", callback_data="shop:tg")
@@ -99,6 +110,7 @@ def ik_shop_main() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def ik_ai_main() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="اکانت ChatGPT Team", callback_data="ai:team")
@@ -119,6 +131,7 @@ def ik_ai_buy_modes(plan_code: str, modes: list[dict[str, str]]) -> InlineKeyboa
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=32)
 def ik_ai_confirm_purchase(plan_code: str, mode: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="🛒 خرید", callback_data=f"ai:{plan_code}:mode:{mode}:buy")
@@ -127,6 +140,7 @@ def ik_ai_confirm_purchase(plan_code: str, mode: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def ik_tg_main() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="تلگرام پرمیوم", callback_data="tg:premium")
@@ -137,6 +151,7 @@ def ik_tg_main() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def ik_tg_premium_durations() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="3 ماهه", callback_data="tg:premium:3m")
@@ -147,6 +162,7 @@ def ik_tg_premium_durations() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def ik_tg_ready_options() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="اکانت از پیش ساخته‌شده", callback_data="tg:ready:pre")
@@ -156,6 +172,7 @@ def ik_tg_ready_options() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def ik_ready_pre_actions() -> InlineKeyboardMarkup:
     rows = [
         [InlineKeyboardButton(text="🛒 خرید", callback_data="tg:ready:pre:buy")],
@@ -164,6 +181,7 @@ def ik_ready_pre_actions() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=None)
 def ik_build_actions() -> InlineKeyboardMarkup:
     rows = [
         [InlineKeyboardButton(text="📝 ثبت درخواست", callback_data="build:request")],
@@ -172,6 +190,7 @@ def ik_build_actions() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=None)
 def ik_other_services_actions() -> InlineKeyboardMarkup:
     rows = [
         [InlineKeyboardButton(text="📝 درخواست محصول/خدمت", callback_data="other:request")],
@@ -195,6 +214,17 @@ def ik_cart_actions(order_id: int, *, enable_plan: bool = False) -> InlineKeyboa
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+def ik_cart_overview(order_id: int, other_ids: list[int], *, enable_plan: bool = False) -> InlineKeyboardMarkup:
+    rows = list(ik_cart_actions(order_id, enable_plan=enable_plan).inline_keyboard)
+    switch = [
+        InlineKeyboardButton(text=f"🧺 #{oid}", callback_data=f"cart:view:{oid}")
+        for oid in other_ids
+    ]
+    for i in range(0, len(switch), 3):
+        rows.append(switch[i:i + 3])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
 def ik_discount_question(order_id: int) -> InlineKeyboardMarkup:
     rows = [
         [
@@ -262,6 +292,7 @@ def ik_discount_controls(order_id: int, method: str) -> InlineKeyboardMarkup:
 
 # ====== Profile / History ======
 
+@lru_cache(maxsize=None)
 def ik_profile_actions() -> InlineKeyboardMarkup:
     rows = [
         [InlineKeyboardButton(text="🎟️ اعمال کوپن", callback_data="profile:coupon")],
@@ -270,6 +301,7 @@ def ik_profile_actions() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=None)
 def ik_coupon_controls() -> InlineKeyboardMarkup:
     rows = [
         [InlineKeyboardButton(text="✅ اعمال", callback_data="profile:coupon:submit")],
@@ -278,6 +310,7 @@ def ik_coupon_controls() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=None)
 def ik_history_menu() -> InlineKeyboardMarkup:
     rows = [
         [InlineKeyboardButton(text="🟡 سفارشات در حال انجام", callback_data="hist:show:inprog:p1")],
@@ -288,11 +321,36 @@ def ik_history_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def ik_history_more(cat: str, next_page: int) -> InlineKeyboardMarkup:
-    rows = [
-        [InlineKeyboardButton(text="⬇️ نمایش بیشتر", callback_data=f"hist:show:{cat}:p{next_page}")],
-        [InlineKeyboardButton(text="🔙 بازگشت", callback_data="hist:menu")],
-    ]
+def ik_history_page(
+    cat: str,
+    page: int,
+    pages: int,
+    order_ids: list[int],
+    expanded_id: int | None = None,
+) -> InlineKeyboardMarkup:
+    rows: list[list[InlineKeyboardButton]] = []
+    detail_buttons: list[InlineKeyboardButton] = []
+    for oid in order_ids:
+        if oid == expanded_id:
+            detail_buttons.append(
+                InlineKeyboardButton(text=f"🔼 #{oid}", callback_data=f"hist:show:{cat}:p{page}")
+            )
+        else:
+            detail_buttons.append(
+                InlineKeyboardButton(text=f"🔎 #{oid}", callback_data=f"hist:open:{cat}:p{page}:{oid}")
+            )
+    for i in range(0, len(detail_buttons), 3):
+        rows.append(detail_buttons[i:i + 3])
+    nav: list[InlineKeyboardButton] = []
+    if page > 1:
+        nav.append(InlineKeyboardButton(text="▶️ قبلی", callback_data=f"hist:show:{cat}:p{page - 1}"))
+    if pages > 1:
+        nav.append(InlineKeyboardButton(text=f"{page}/{pages}", callback_data=f"hist:show:{cat}:p{page}"))
+    if page < pages:
+        nav.append(InlineKeyboardButton(text="بعدی ◀️", callback_data=f"hist:show:{cat}:p{page + 1}"))
+    if nav:
+        rows.append(nav)
+    rows.append([InlineKeyboardButton(text="🔙 بازگشت", callback_data="hist:menu")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
@@ -319,6 +377,7 @@ __all__ = [
     "ik_build_actions",
     "ik_other_services_actions",
     "ik_cart_actions",
+    "ik_cart_overview",
     "ik_discount_question",
     "ik_discount_code_controls",
     "ik_card_receipt_prompt",
@@ -330,5 +389,5 @@ __all__ = [
     "ik_profile_actions",
     "ik_coupon_controls",
     "ik_history_menu",
-    "ik_history_more",
+    "ik_history_page",
 ]
@@ -1,15 +1,28 @@
 import asyncio
 import logging
+import time
 from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
 from aiogram.types import BotCommand, BotCommandScopeDefault, MenuButtonCommands
-from .config import BOT_TOKEN, DEFAULT_BOT_PROPS
-from .db import init_db, expire_orders_and_refund
+from .capture import UpdateCapture
+from .config import ADMIN_LIVE_KEEP_EVENTS, BOT_METRICS_BIND, BOT_METRICS_PORT, UPDATE_CAPTURE_PATH, create_bot
+from .db import init_db, expire_orders_and_refund, prune_events
+from .metrics import EXPIRED_ORDERS_TOTAL, EXPIRE_LOOP_SECONDS, start_metrics_server
+from .watchdog import monitor as loop_monitor
+from .middlewares import (
+    HandlerMetricsMiddleware,
+    UnitOfWorkMiddleware,
+    UpdateCaptureMiddleware,
+    UpdateMetricsMiddleware,
+)
+from .prefetch import prefetch_worker
 from .public import router as public_router
 from .admin import router as admin_router
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s | %(message)s")
 
+# the admin live feed prunes too, but only while a dashboard tab is open
+EVENTS_PRUNE_SECONDS = 300
+
 async def setup_bot_menu(bot: Bot):
     # دستورات (کامندها) که در دکمهٔ Menu نمایش داده می‌شود
     commands = [
@@ -25,35 +38,66 @@ async def setup_bot_menu(bot: Bot):
     await bot.set_chat_menu_button(menu_button=MenuButtonCommands())
 
 async def expire_loop(bot: Bot):
+    pruned_at = 0.0
     while True:
         try:
-            expired = expire_orders_and_refund()
+            if time.monotonic() - pruned_at >= EVENTS_PRUNE_SECONDS:
+                pruned_at = time.monotonic()
+                prune_events(ADMIN_LIVE_KEEP_EVENTS)
+            with EXPIRE_LOOP_SECONDS.time():
+                expired = expire_orders_and_refund()
+            EXPIRED_ORDERS_TOTAL.inc(amount=len(expired))
             for o in expired:
-                uid = o["user_id"]; oid = o["id"]
+                uid = o["user_id"]; oid = o["order_id"]
                 try:
                     await bot.send_message(uid, f"⏰ سفارش #{oid} به دلیل عدم پرداخت در ۱۵ دقیقه منقضی شد.")
                 except Exception:
                     pass
             if expired:
-                logging.info("Expired orders: %s", [e["id"] for e in expired])
+                logging.info("Expired orders: %s", [e["order_id"] for e in expired])
         except Exception as e:
             logging.exception("expire_loop error: %s", e)
         await asyncio.sleep(30)
 
-async def main():
-    init_db()
-    bot = Bot(BOT_TOKEN, default=DEFAULT_BOT_PROPS)
+def build_dispatcher() -> Dispatcher:
     dp = Dispatcher()
     dp.include_router(public_router)
     dp.include_router(admin_router)
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.update.outer_middleware(UnitOfWorkMiddleware())
+    # inner middlewares on the dispatcher wrap the handlers of every included router
+    handler_metrics = HandlerMetricsMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in {"update", "error"}:
+            observer.middleware(handler_metrics)
+    return dp
+
+async def main():
+    init_db()
+    bot = create_bot()
+    dp = build_dispatcher()
 
     # منو را ست کن
     await setup_bot_menu(bot)
 
+    loop_monitor.start()
     # تسک انقضا
     asyncio.create_task(expire_loop(bot))
+    # کپی محلی رسیدها و پیوست‌ها
+    asyncio.create_task(prefetch_worker(bot))
+    if BOT_METRICS_PORT:
+        await start_metrics_server(BOT_METRICS_BIND, BOT_METRICS_PORT)
 
-    await dp.start_polling(bot)
+    capture = None
+    if UPDATE_CAPTURE_PATH:
+        capture = UpdateCapture(UPDATE_CAPTURE_PATH)
+        dp.update.outer_middleware(UpdateCaptureMiddleware(capture))
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await loop_monitor.stop()
+        if capture is not None:
+            capture.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
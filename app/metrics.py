@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import web
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], *extra: str) -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    parts.extend(label for label in extra if label)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), registry: "Registry | None" = None) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        (registry or REGISTRY).register(self)
+
+    def _check(self, labels: tuple[str, ...]) -> None:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+
+    def samples(self, const: str = "") -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self, const: str = "") -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples(const))
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic counter; label values are passed positionally: ``c.inc("get_order")``."""
+
+    kind = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        values = self._values
+        if labels not in values:
+            self._check(labels)
+            values[labels] = 0
+        values[labels] += amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def samples(self, const: str = "") -> Iterator[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels, const)} {_number(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args: Any, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (+Inf last), sum, count]
+        self._values: dict[tuple[str, ...], list[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            self._check(labels)
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def snapshot(self, *labels: str) -> tuple[int, float]:
+        """``(count, sum)`` for one label set."""
+
+        entry = self._values.get(labels)
+        return (entry[2], entry[1]) if entry else (0, 0.0)
+
+    def series(self) -> dict[tuple[str, ...], tuple[int, float]]:
+        """``{labels: (count, sum)}`` for every label set seen so far."""
+
+        return {labels: (entry[2], entry[1]) for labels, entry in self._values.items()}
+
+    def samples(self, const: str = "") -> Iterator[str]:
+        for labels, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, const, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels, const)} {total!r}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels, const)} {count}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> _Metric | None:
+        return self._metrics.get(name)
+
+    def render(self, **const_labels: str) -> str:
+        """Text exposition; ``const_labels`` are added to every sample, e.g. ``worker="1234"``."""
+
+        const = ",".join(f'{name}="{_escape(str(value))}"' for name, value in const_labels.items())
+        return "\n".join(metric.render(const) for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+UPDATES_TOTAL = Counter("bot_updates_total", "Updates received by the dispatcher.", ("type",))
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Handler run time.", ("router", "handler"))
+HANDLER_ERRORS_TOTAL = Counter("bot_handler_errors_total", "Handlers that raised.", ("router", "handler"))
+UPDATE_QUERIES = Histogram("bot_update_queries", "SQL queries run while handling one update.", ("type",), buckets=COUNT_BUCKETS)
+
+DB_QUERIES_TOTAL = Counter(
+    "db_queries_total", "db_execute calls and transactions by calling app.db function.", ("function",)
+)
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "db_execute / transaction time by calling app.db function.", ("function",))
+
+TELEGRAM_REQUESTS_TOTAL = Counter("telegram_api_requests_total", "Bot API calls by method and outcome.", ("method", "status"))
+TELEGRAM_REQUEST_SECONDS = Histogram("telegram_api_request_seconds", "Bot API call latency.", ("method",))
+
+EXPIRE_LOOP_SECONDS = Histogram("expire_loop_seconds", "Duration of one expire_loop pass.")
+EXPIRED_ORDERS_TOTAL = Counter("expire_loop_expired_orders_total", "Orders expired by expire_loop.")
+
+ORDER_TRANSITIONS_TOTAL = Counter("order_transitions_total", "Committed order status transitions.", ("from", "to"))
+
+ADMIN_HTTP_SECONDS = Histogram(
+    "admin_http_request_seconds", "Admin panel request time.", ("method", "route", "status")
+)
+ADMIN_HTTP_QUERIES = Histogram(
+    "admin_http_request_queries", "SQL queries run for one admin panel request.", ("route",), buckets=COUNT_BUCKETS
+)
+ADMIN_PAGE_CACHE_TOTAL = Counter(
+    "admin_page_cache_total", "Cacheable admin page requests by outcome (304, hit, miss, bypass).", ("page", "result")
+)
+OUTBOX_DELIVERIES_TOTAL = Counter(
+    "outbox_deliveries_total", "Outbox send attempts by message kind and outcome (sent, retry, failed).", ("kind", "result")
+)
+
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds", "How late the loop monitor's periodic wake-up ran.", buckets=LAG_BUCKETS
+)
+EVENT_LOOP_STALLS_TOTAL = Counter(
+    "event_loop_stalls_total", "Event loop stalls over LOOP_BLOCK_THRESHOLD_MS by the app function blocking it.", ("where",)
+)
+
+
+def observe_query(function: str, elapsed: float) -> None:
+    DB_QUERIES_TOTAL.inc(function)
+    DB_QUERY_SECONDS.observe(elapsed, function)
+
+
+_STATUS_BY_ERROR = (
+    (TelegramRetryAfter, "429"),
+    (TelegramBadRequest, "400"),
+    (TelegramForbiddenError, "403"),
+    (TelegramNotFound, "404"),
+    (TelegramServerError, "5xx"),
+    (TelegramNetworkError, "network"),
+)
+
+
+class TelegramAPIMetrics(BaseRequestMiddleware):
+    """Bot session middleware counting and timing every Bot API call."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Any:
+        name = method.__api_method__
+        status = "200"
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as exc:
+            status = next((code for error, code in _STATUS_BY_ERROR if isinstance(exc, error)), "error")
+            raise
+        finally:
+            TELEGRAM_REQUEST_SECONDS.observe(time.perf_counter() - start, name)
+            TELEGRAM_REQUESTS_TOTAL.inc(name, status)
+
+
+async def _metrics_view(request: web.Request) -> web.Response:
+    return web.Response(body=REGISTRY.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Serve ``GET /metrics`` from the bot process on ``host:port``."""
+
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_view)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+__all__ = [
+    "ADMIN_HTTP_QUERIES",
+    "ADMIN_HTTP_SECONDS",
+    "ADMIN_PAGE_CACHE_TOTAL",
+    "CONTENT_TYPE",
+    "Counter",
+    "DB_QUERIES_TOTAL",
+    "DB_QUERY_SECONDS",
+    "EVENT_LOOP_LAG_SECONDS",
+    "EVENT_LOOP_STALLS_TOTAL",
+    "EXPIRED_ORDERS_TOTAL",
+    "EXPIRE_LOOP_SECONDS",
+    "HANDLER_ERRORS_TOTAL",
+    "HANDLER_SECONDS",
+    "Histogram",
+    "ORDER_TRANSITIONS_TOTAL",
+    "OUTBOX_DELIVERIES_TOTAL",
+    "REGISTRY",
+    "Registry",
+    "TELEGRAM_REQUESTS_TOTAL",
+    "TELEGRAM_REQUEST_SECONDS",
+    "TelegramAPIMetrics",
+    "UPDATES_TOTAL",
+    "UPDATE_QUERIES",
+    "observe_query",
+    "start_metrics_server",
+]
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import time
+
 from aiogram import BaseMiddleware
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, Message, Update
 from typing import Any, Awaitable, Callable, Dict
 
-from .db import is_user_blocked
+from .capture import UpdateCapture
+from .db import is_user_blocked, unit_of_work
+from .metrics import HANDLER_ERRORS_TOTAL, HANDLER_SECONDS, UPDATE_QUERIES, UPDATES_TOTAL
+from .profiler import current_profile
+from .querylog import track_queries
 
 
 class BlockedUserMiddleware(BaseMiddleware):
@@ -24,4 +30,102 @@ class BlockedUserMiddleware(BaseMiddleware):
         return await handler(event, data)
 
 
-__all__ = ["BlockedUserMiddleware"]
+class UpdateCaptureMiddleware(BaseMiddleware):
+    """Outer ``dp.update`` middleware feeding every update into an ``UpdateCapture``."""
+
+    def __init__(self, capture: UpdateCapture) -> None:
+        self.capture = capture
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        received_at = time.time()
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.capture.write(event, received_at, time.perf_counter() - start)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer ``dp.update`` middleware counting updates and the queries each one runs."""
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type or "unknown"
+        UPDATES_TOTAL.inc(update_type)
+        # handlers can read data["query_log"]; the count also feeds bot_update_queries
+        with track_queries() as log:
+            data["query_log"] = log
+            try:
+                return await handler(event, data)
+            finally:
+                UPDATE_QUERIES.observe(log.count, update_type)
+
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    """Outer ``dp.update`` middleware handling each update inside one ``unit_of_work``.
+
+    Repeated ``get_order``/``get_user`` calls are served from the unit, and the
+    order setters a handler calls are written together when it returns.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        with unit_of_work() as unit:
+            data["unit_of_work"] = unit
+            return await handler(event, data)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware timing the matched handler, labelled by router and handler name.
+
+    Also reports handled updates to a running ``/profile`` session.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        router = data.get("event_router")
+        router_name = router.name if router is not None else "?"
+        route = data.get("callback_route")
+        target = route.handler if route is not None else getattr(data.get("handler"), "callback", None)
+        handler_name = getattr(target, "__name__", "?")
+        profile = current_profile()
+        if profile is not None:
+            user = data.get("event_from_user")
+            user_id = user.id if user is not None else None
+            profiled_task = profile.enter(user_id)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS_TOTAL.inc(router_name, handler_name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - start, router_name, handler_name)
+            if profile is not None:
+                profile.exit(profiled_task, handler_name, user_id)
+
+
+__all__ = [
+    "BlockedUserMiddleware",
+    "HandlerMetricsMiddleware",
+    "UnitOfWorkMiddleware",
+    "UpdateCaptureMiddleware",
+    "UpdateMetricsMiddleware",
+]
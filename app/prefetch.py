@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import mimetypes
+import time
+from pathlib import Path
+
+from aiogram import Bot
+
+from . import blobstore
+
+log = logging.getLogger(__name__)
+
+_queue: asyncio.Queue[str] = asyncio.Queue()
+_pending: set[str] = set()
+
+MAX_ATTEMPTS = 4
+EVICT_INTERVAL = 3600
+
+
+def enqueue_prefetch(file_id: str | None) -> None:
+    """Schedule a Telegram file to be copied into the local blob store."""
+
+    if not file_id or file_id in _pending:
+        return
+    _pending.add(file_id)
+    _queue.put_nowait(file_id)
+
+
+async def _fetch(bot: Bot, file_id: str) -> None:
+    tg_file = await bot.get_file(file_id)
+    buffer = await bot.download_file(tg_file.file_path)
+    data = buffer.read()
+    filename = Path(tg_file.file_path or file_id).name
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    await asyncio.to_thread(blobstore.store, file_id, data, media_type, filename)
+
+
+async def prefetch_worker(bot: Bot) -> None:
+    last_evict = 0.0
+    while True:
+        if time.monotonic() - last_evict > EVICT_INTERVAL:
+            try:
+                await asyncio.to_thread(blobstore.evict)
+            except Exception as e:
+                log.exception("blob eviction error: %s", e)
+            last_evict = time.monotonic()
+        try:
+            file_id = await asyncio.wait_for(_queue.get(), timeout=EVICT_INTERVAL)
+        except asyncio.TimeoutError:
+            continue
+        try:
+            if blobstore.lookup(file_id) is not None:
+                continue
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                try:
+                    await _fetch(bot, file_id)
+                    break
+                except Exception as e:
+                    if attempt == MAX_ATTEMPTS:
+                        log.warning("prefetch of %s failed: %s", file_id, e)
+                    else:
+                        await asyncio.sleep(2 ** attempt)
+        finally:
+            _pending.discard(file_id)
+            _queue.task_done()
+
+
+__all__ = ["enqueue_prefetch", "prefetch_worker"]
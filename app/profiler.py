@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from .config import PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_MAX_SECONDS
+
+log = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = ".folded"
+_NAME_RE = re.compile(r"^[\w.-]+\.folded$")
+_SCOPE_RE = re.compile(r"[^\w.]+")
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _frame_label(frame: Any) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class ProfileSession:
+    """One sampling run of the event-loop thread, written as folded stacks.
+
+    Every ``interval`` seconds a background thread reads the loop thread's
+    current stack. Samples taken while the loop waits for I/O are dropped.
+    ``handler`` keeps samples whose stack passes through a function of that
+    name (a bot handler or an admin endpoint). ``user_id`` keeps samples from
+    updates sent by that user. The run ends after ``seconds`` or after
+    ``updates`` matching updates/requests, whichever comes first. Output is
+    one ``frame;frame;frame count`` line per distinct stack, the input format
+    of flamegraph.pl and speedscope.
+    """
+
+    def __init__(
+        self,
+        process: str,
+        handler: str | None = None,
+        user_id: int | None = None,
+        seconds: float | None = None,
+        updates: int | None = None,
+        interval: float = PROFILE_INTERVAL_MS / 1000,
+    ) -> None:
+        self.process = process
+        self.handler = handler
+        self.user_id = user_id
+        self.seconds = min(seconds or PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS)
+        self.updates = updates
+        self.interval = interval
+        self.started_at = time.time()
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.handled = 0
+        self.path: Path | None = None
+        self._task_users: dict[asyncio.Task, int] = {}
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._done: asyncio.Future[Path] = self._loop.create_future()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    @property
+    def scope(self) -> str:
+        if self.handler:
+            return self.handler
+        if self.user_id is not None:
+            return f"user{self.user_id}"
+        return "all"
+
+    @property
+    def running(self) -> bool:
+        return not self._done.done()
+
+    def describe(self) -> str:
+        limit = f"{self.updates} updates / {self.seconds:.0f}s" if self.updates else f"{self.seconds:.0f}s"
+        return f"{self.scope} ({limit})"
+
+    def enter(self, user_id: int | None) -> asyncio.Task | None:
+        """Bind the current task to ``user_id`` for user-scoped runs."""
+
+        if self.user_id is None or user_id != self.user_id:
+            return None
+        task = asyncio.current_task()
+        if task is not None:
+            self._task_users[task] = user_id
+        return task
+
+    def exit(self, task: asyncio.Task | None, handler: str, user_id: int | None) -> None:
+        if task is not None:
+            self._task_users.pop(task, None)
+        if self._stop.is_set():
+            return
+        if self.handler is not None and handler != self.handler:
+            return
+        if self.user_id is not None and user_id != self.user_id:
+            return
+        self.handled += 1
+        if self.updates and self.handled >= self.updates:
+            self._stop.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def wait(self) -> Path:
+        return await asyncio.shield(self._done)
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self._loop_thread)
+        stack: list[Any] = []
+        while frame is not None and frame.f_globals.get("__name__") != "asyncio.events":
+            stack.append(frame)
+            frame = frame.f_back
+        if frame is None or not stack:
+            # the loop is waiting in select(), not running a callback
+            return
+        if self.handler is not None and not any(f.f_code.co_name == self.handler for f in stack):
+            return
+        if self.user_id is not None:
+            task = asyncio.current_task(self._loop)
+            if self._task_users.get(task) != self.user_id:
+                return
+        self.stacks[";".join(_frame_label(f) for f in reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + self.seconds
+        try:
+            while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+                self._sample()
+            path = self._write()
+        except Exception as exc:  # pragma: no cover - never take the process down
+            log.exception("Profiler failed")
+            self._loop.call_soon_threadsafe(_resolve, self._done, None, exc)
+            return
+        self._loop.call_soon_threadsafe(_resolve, self._done, path, None)
+
+    def _write(self) -> Path:
+        directory = Path(PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.fromtimestamp(self.started_at).strftime("%Y%m%d-%H%M%S")
+        path = directory / f"{stamp}-{self.process}-{_SCOPE_RE.sub('_', self.scope)}{PROFILE_SUFFIX}"
+        lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        path.write_text("\n".join(lines) + ("\n" if lines else ""), encoding="utf-8")
+        self.path = path
+        log.info("Profile %s: %s samples, %s updates -> %s", self.describe(), self.samples, self.handled, path)
+        return path
+
+
+def _resolve(future: asyncio.Future, path: Path | None, exc: BaseException | None) -> None:
+    if future.done():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(path)
+
+
+_session: ProfileSession | None = None
+
+
+def current_profile() -> ProfileSession | None:
+    """The running session, if any; middlewares check this on every update."""
+
+    session = _session
+    return session if session is not None and session.running else None
+
+
+def start_profile(process: str, **options: Any) -> ProfileSession:
+    """Start sampling this process; one session at a time."""
+
+    global _session
+    if current_profile() is not None:
+        raise ProfilerBusy("a profile is already running")
+    _session = ProfileSession(process, **options)
+    _session._thread.start()
+    return _session
+
+
+def stop_profile() -> ProfileSession | None:
+    session = current_profile()
+    if session is not None:
+        session.stop()
+    return session
+
+
+def parse_target(target: str) -> dict[str, Any]:
+    """``all``, ``user:<id>`` or a handler/endpoint function name."""
+
+    target = target.strip()
+    if target == "all":
+        return {}
+    if target.startswith("user:") and target[5:].isdigit():
+        return {"user_id": int(target[5:])}
+    if target.isidentifier():
+        return {"handler": target}
+    raise ValueError(target)
+
+
+def list_profiles() -> list[dict[str, Any]]:
+    directory = Path(PROFILE_DIR)
+    if not directory.is_dir():
+        return []
+    items = []
+    for path in directory.glob(f"*{PROFILE_SUFFIX}"):
+        stat = path.stat()
+        items.append({"name": path.name, "size": stat.st_size, "modified": datetime.fromtimestamp(stat.st_mtime)})
+    items.sort(key=lambda item: item["modified"], reverse=True)
+    return items
+
+
+def profile_path(name: str) -> Path | None:
+    """Path of a stored profile by file name; rejects anything outside PROFILE_DIR."""
+
+    if not _NAME_RE.match(name):
+        return None
+    path = Path(PROFILE_DIR) / name
+    return path if path.is_file() else None
+
+
+__all__ = [
+    "PROFILE_SUFFIX",
+    "ProfileSession",
+    "ProfilerBusy",
+    "current_profile",
+    "list_profiles",
+    "parse_target",
+    "profile_path",
+    "start_profile",
+    "stop_profile",
+]
@@ -1,6 +1,11 @@
 from aiogram import Router
 
-router = Router()
+from ..callbacks import CallbackTable
+
+router = Router(name="public")
+# callback_data routes; looked up before the filter-based handlers below
+callbacks = CallbackTable()
+callbacks.attach(router)
 
 # Import handler modules so that they register callbacks on the shared router.
 from . import start  # noqa: F401
@@ -21,4 +26,4 @@ router.include_router(channel_gate.router)
 router.message.outer_middleware(BlockedUserMiddleware())
 router.callback_query.outer_middleware(BlockedUserMiddleware())
 
-__all__ = ["router"]
+__all__ = ["callbacks", "router"]
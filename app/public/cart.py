@@ -1,25 +1,22 @@
-from aiogram import F
+from datetime import datetime
+from typing import Any
+
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 
-from . import router
+from . import callbacks, router
 from .helpers import _notify_admins, _order_title
 from ..checkout import send_checkout_prompt
 from ..config import ADMIN_IDS, CARD_NAME, CARD_NUMBER, CURRENCY
 from ..db import (
     apply_discount_to_order,
     change_wallet,
-    confirm_order_discount,
     get_order,
     get_user,
     is_user_contact_verified,
-    release_order_discount,
-    set_order_customer_message,
     set_order_payment_type,
-    set_order_receipt,
-    set_order_status,
     set_order_wallet_reserved,
-    set_order_wallet_used,
+    transition_order,
     user_has_delivered_order,
 )
 from ..keyboards import (
@@ -33,10 +30,18 @@ from ..keyboards import (
     reply_main,
     reply_request_contact,
 )
+from ..prefetch import enqueue_prefetch
 from ..states import CheckoutStates, VerifyStates
 from ..utils import mention
 
 
+def _order_ready_for_payment(order: dict[str, Any]) -> bool:
+    if order.get("status") != "AWAITING_PAYMENT":
+        return False
+    deadline = order.get("await_deadline")
+    return not deadline or str(deadline) > datetime.now().isoformat(timespec="seconds")
+
+
 async def _require_contact_verification(callback: CallbackQuery, state: FSMContext) -> bool:
     if is_user_contact_verified(callback.from_user.id):
         return True
@@ -179,20 +184,6 @@ async def _continue_payment(callback: CallbackQuery, state: FSMContext, method:
         enable_plan = order.get("service_category") == "AI"
         await callback.message.answer(summary, reply_markup=ik_cart_actions(order_id, enable_plan=enable_plan))
 
-@router.callback_query(F.data.startswith("cart:paycard:"))
-async def cb_cart_paycard(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await _require_contact_verification(callback, state):
-        return
-    order_id = int(callback.data.split(":")[2])
-    order = get_order(order_id)
-    if not order or order["user_id"] != callback.from_user.id or not _order_ready_for_payment(order):
-        await callback.answer("سفارش نامعتبر یا منقضی است.", show_alert=True)
-        return
-    if await _prompt_discount_choice(callback, state, order, "card"):
-        return
-    await _start_card_payment(callback, state, order)
-
-
 async def _start_wallet_payment(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
     order = get_order(order_id)
     if not order or order["user_id"] != callback.from_user.id:
@@ -255,15 +246,10 @@ async def _run_payment_method(
         await callback.answer("روش پرداخت نامعتبر است.", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("cart:paycard:"))
-async def cb_cart_paycard(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.route("cart:paycard:{order_id:int}")
+async def cb_cart_paycard(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
     if not await _require_contact_verification(callback, state):
         return
-    try:
-        order_id = int(callback.data.split(":")[2])
-    except (IndexError, ValueError):
-        await callback.answer("سفارش نامعتبر است.", show_alert=True)
-        return
     await _start_card_payment(callback, state, order_id)
 
 
@@ -342,9 +328,8 @@ async def on_card_comment(message: Message, state: FSMContext) -> None:
     await state.set_state(CheckoutStates.wait_card_confirm)
 
 
-@router.callback_query(F.data.startswith("cart:rcpt:edit:"))
-async def cb_receipt_edit(callback: CallbackQuery, state: FSMContext) -> None:
-    order_id = int(callback.data.split(":")[3])
+@callbacks.route("cart:rcpt:edit:{order_id:int}")
+async def cb_receipt_edit(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
     data = await state.get_data()
     current = data.get("order_receipt_for")
     if not current or int(current) != order_id:
@@ -355,9 +340,8 @@ async def cb_receipt_edit(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("cart:rcpt:confirm:"))
-async def cb_receipt_confirm(callback: CallbackQuery, state: FSMContext) -> None:
-    order_id = int(callback.data.split(":")[3])
+@callbacks.route("cart:rcpt:confirm:{order_id:int}")
+async def cb_receipt_confirm(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
     data = await state.get_data()
     current = data.get("order_receipt_for")
     if not current or int(current) != order_id:
@@ -374,10 +358,22 @@ async def cb_receipt_confirm(callback: CallbackQuery, state: FSMContext) -> None
     receipt_comment = data.get("receipt_comment") or ""
     receipt_kind = data.get("receipt_kind")
 
-    set_order_receipt(order_id, receipt_file_id, receipt_text)
-    set_order_customer_message(order_id, receipt_comment)
-    set_order_status(order_id, "PENDING_CONFIRM")
-    confirm_order_discount(order_id)
+    payload = transition_order(
+        order_id,
+        "PENDING_CONFIRM",
+        allowed_from={"AWAITING_PAYMENT"},
+        user_id=callback.from_user.id,
+        updates={
+            "receipt_file_id": receipt_file_id,
+            "receipt_text": receipt_text,
+            "customer_message": receipt_comment,
+        },
+    )
+    if payload is None:
+        await callback.answer("سفارش یافت نشد یا منقضی شده است.", show_alert=True)
+        await state.clear()
+        return
+    enqueue_prefetch(receipt_file_id)
 
     await callback.message.answer(
         f"✅ رسید سفارش #{order_id} ثبت شد.\nوضعیت: «در انتظار تایید پرداخت»",
@@ -409,15 +405,10 @@ async def cb_receipt_confirm(callback: CallbackQuery, state: FSMContext) -> None
             pass
 
 
-@router.callback_query(F.data.startswith("cart:paywallet:"))
-async def cb_cart_paywallet(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.route("cart:paywallet:{order_id:int}")
+async def cb_cart_paywallet(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
     if not await _require_contact_verification(callback, state):
         return
-    try:
-        order_id = int(callback.data.split(":")[2])
-    except (IndexError, ValueError):
-        await callback.answer("سفارش نامعتبر است.", show_alert=True)
-        return
     await _start_wallet_payment(callback, state, order_id)
 
 
@@ -442,9 +433,8 @@ async def on_wallet_comment(message: Message, state: FSMContext) -> None:
     await message.answer("📝 توضیح شما ذخیره شد. برای نهایی کردن پرداخت روی «تایید پرداخت» بزنید.")
 
 
-@router.callback_query(F.data.startswith("cart:wallet:confirm:"))
-async def cb_wallet_confirm(callback: CallbackQuery, state: FSMContext) -> None:
-    order_id = int(callback.data.split(":")[3])
+@callbacks.route("cart:wallet:confirm:{order_id:int}")
+async def cb_wallet_confirm(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
     data = await state.get_data()
     current = data.get("wallet_for")
     if not current or int(current) != order_id:
@@ -460,15 +450,18 @@ async def cb_wallet_confirm(callback: CallbackQuery, state: FSMContext) -> None:
     if int(user["wallet_balance"]) < amount:
         await callback.answer("موجودی کیف پول کافی نیست.", show_alert=True)
         return
-    if not change_wallet(callback.from_user.id, -amount, "DEBIT", note=f"Order #{order_id}", order_id=order_id):
+    comment = data.get("wallet_comment") or ""
+    payload = transition_order(
+        order_id,
+        "IN_PROGRESS",
+        allowed_from={"AWAITING_PAYMENT"},
+        user_id=callback.from_user.id,
+        wallet_debit=amount,
+        updates={"payment_type": "WALLET", "customer_message": comment},
+    )
+    if payload is None:
         await callback.answer("عدم امکان کسر از کیف پول.", show_alert=True)
         return
-    comment = data.get("wallet_comment") or ""
-    set_order_wallet_used(order_id, amount)
-    set_order_payment_type(order_id, "WALLET")
-    set_order_customer_message(order_id, comment)
-    set_order_status(order_id, "IN_PROGRESS")
-    confirm_order_discount(order_id)
     await callback.message.answer(
         f"✅ پرداخت کیف پول برای سفارش #{order_id} انجام شد.\nوضعیت: «در حال انجام»",
         reply_markup=reply_main(),
@@ -481,11 +474,10 @@ async def cb_wallet_confirm(callback: CallbackQuery, state: FSMContext) -> None:
     await _notify_admins(callback.bot, notice)
 
 
-@router.callback_query(F.data.startswith("cart:payplan:"))
-async def cb_cart_payplan(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.route("cart:payplan:{order_id:int}")
+async def cb_cart_payplan(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
     if not await _require_contact_verification(callback, state):
         return
-    order_id = int(callback.data.split(":")[2])
     order = get_order(order_id)
     if not order or order["user_id"] != callback.from_user.id or order["status"] != "AWAITING_PAYMENT":
         await callback.answer("سفارش نامعتبر یا منقضی است.", show_alert=True)
@@ -538,9 +530,8 @@ async def on_plan_comment(message: Message, state: FSMContext) -> None:
     await state.set_state(CheckoutStates.wait_plan_confirm)
 
 
-@router.callback_query(F.data.startswith("cart:plan:edit:"))
-async def cb_plan_edit(callback: CallbackQuery, state: FSMContext) -> None:
-    order_id = int(callback.data.split(":")[3])
+@callbacks.route("cart:plan:edit:{order_id:int}")
+async def cb_plan_edit(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
     data = await state.get_data()
     current = data.get("plan_for")
     if not current or int(current) != order_id:
@@ -551,9 +542,8 @@ async def cb_plan_edit(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("cart:plan:confirm:"))
-async def cb_plan_confirm(callback: CallbackQuery, state: FSMContext) -> None:
-    order_id = int(callback.data.split(":")[3])
+@callbacks.route("cart:plan:confirm:{order_id:int}")
+async def cb_plan_confirm(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
     data = await state.get_data()
     current = data.get("plan_for")
     if not current or int(current) != order_id:
@@ -569,9 +559,17 @@ async def cb_plan_confirm(callback: CallbackQuery, state: FSMContext) -> None:
         await state.clear()
         return
     comment = data.get("plan_comment") or ""
-    set_order_customer_message(order_id, comment)
-    set_order_status(order_id, "PENDING_PLAN")
-    set_order_payment_type(order_id, "FIRST_PLAN")
+    payload = transition_order(
+        order_id,
+        "PENDING_PLAN",
+        allowed_from={"AWAITING_PAYMENT"},
+        user_id=callback.from_user.id,
+        updates={"payment_type": "FIRST_PLAN", "customer_message": comment},
+    )
+    if payload is None:
+        await callback.answer("سفارش یافت نشد یا منقضی شده است.", show_alert=True)
+        await state.clear()
+        return
     await callback.message.answer(
         f"✅ درخواست طرح خرید اول برای سفارش #{order_id} ثبت شد.\nوضعیت: «در انتظار تایید طرح»",
         reply_markup=reply_main(),
@@ -590,36 +588,15 @@ async def cb_plan_confirm(callback: CallbackQuery, state: FSMContext) -> None:
     await _notify_admins(callback.bot, notice)
 
 
-@router.callback_query(F.data.startswith("cart:paymix:"))
-async def cb_cart_paymix(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.route("cart:paymix:{order_id:int}")
+async def cb_cart_paymix(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
     if not await _require_contact_verification(callback, state):
         return
-    try:
-        order_id = int(callback.data.split(":")[2])
-    except (IndexError, ValueError):
-        await callback.answer("سفارش نامعتبر است.", show_alert=True)
-        return
     await _start_mix_payment(callback, state, order_id)
 
 
-def _parse_discount_payload(data: str) -> tuple[str | None, int | None]:
-    parts = data.split(":")
-    if len(parts) < 5:
-        return None, None
-    method = parts[3]
-    try:
-        order_id = int(parts[4])
-    except (TypeError, ValueError):
-        return method, None
-    return method, order_id
-
-
-@router.callback_query(F.data.startswith("cart:discount:yes:"))
-async def cb_discount_yes(callback: CallbackQuery, state: FSMContext) -> None:
-    method, order_id = _parse_discount_payload(callback.data)
-    if method not in {"card", "wallet", "mix"} or not order_id:
-        await callback.answer("درخواست نامعتبر است.", show_alert=True)
-        return
+@callbacks.route("cart:discount:yes:{method:card|wallet|mix}:{order_id:int}")
+async def cb_discount_yes(callback: CallbackQuery, state: FSMContext, method: str, order_id: int) -> None:
     order = get_order(order_id)
     if not order or order["user_id"] != callback.from_user.id:
         await callback.answer("سفارش یافت نشد یا منقضی شده است.", show_alert=True)
@@ -648,12 +625,8 @@ async def cb_discount_yes(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("cart:discount:no:"))
-async def cb_discount_no(callback: CallbackQuery, state: FSMContext) -> None:
-    method, order_id = _parse_discount_payload(callback.data)
-    if method not in {"card", "wallet", "mix"} or not order_id:
-        await callback.answer("درخواست نامعتبر است.", show_alert=True)
-        return
+@callbacks.route("cart:discount:no:{method:card|wallet|mix}:{order_id:int}")
+async def cb_discount_no(callback: CallbackQuery, state: FSMContext, method: str, order_id: int) -> None:
     order = get_order(order_id)
     if not order or order["user_id"] != callback.from_user.id:
         await callback.answer("سفارش یافت نشد یا منقضی شده است.", show_alert=True)
@@ -669,12 +642,8 @@ async def cb_discount_no(callback: CallbackQuery, state: FSMContext) -> None:
     await _run_payment_method(callback, state, method, order_id)
 
 
-@router.callback_query(F.data.startswith("cart:discount:cancel:"))
-async def cb_discount_cancel(callback: CallbackQuery, state: FSMContext) -> None:
-    method, order_id = _parse_discount_payload(callback.data)
-    if method not in {"card", "wallet", "mix"} or not order_id:
-        await callback.answer("درخواست نامعتبر است.", show_alert=True)
-        return
+@callbacks.route("cart:discount:cancel:{method:card|wallet|mix}:{order_id:int}")
+async def cb_discount_cancel(callback: CallbackQuery, state: FSMContext, method: str, order_id: int) -> None:
     order = get_order(order_id)
     if not order or order["user_id"] != callback.from_user.id:
         await callback.answer("سفارش یافت نشد یا منقضی شده است.", show_alert=True)
@@ -696,12 +665,8 @@ async def cb_discount_cancel(callback: CallbackQuery, state: FSMContext) -> None
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("cart:discount:apply:"))
-async def cb_discount_apply(callback: CallbackQuery, state: FSMContext) -> None:
-    method, order_id = _parse_discount_payload(callback.data)
-    if method not in {"card", "wallet", "mix"} or not order_id:
-        await callback.answer("درخواست نامعتبر است.", show_alert=True)
-        return
+@callbacks.route("cart:discount:apply:{method:card|wallet|mix}:{order_id:int}")
+async def cb_discount_apply(callback: CallbackQuery, state: FSMContext, method: str, order_id: int) -> None:
     order = get_order(order_id)
     if not order or order["user_id"] != callback.from_user.id:
         await callback.answer("سفارش یافت نشد یا منقضی شده است.", show_alert=True)
@@ -839,19 +804,17 @@ async def on_mixed_amount(message: Message, state: FSMContext) -> None:
     await state.set_state(CheckoutStates.wait_card_receipt)
 
 
-@router.callback_query(F.data.startswith("cart:cancel:"))
-async def cb_cart_cancel(callback: CallbackQuery, state: FSMContext) -> None:
-    order_id = int(callback.data.split(":")[2])
-    order = get_order(order_id)
-    if not order or order["user_id"] != callback.from_user.id or order["status"] not in ("AWAITING_PAYMENT", "PENDING_CONFIRM"):
+@callbacks.route("cart:cancel:{order_id:int}")
+async def cb_cart_cancel(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
+    payload = transition_order(
+        order_id,
+        "CANCELED",
+        allowed_from={"AWAITING_PAYMENT", "PENDING_CONFIRM"},
+        user_id=callback.from_user.id,
+    )
+    if payload is None:
         await callback.answer("قابل لغو نیست.", show_alert=True)
         return
-    reserved = int(order.get("wallet_reserved_amount") or 0)
-    if reserved > 0:
-        change_wallet(callback.from_user.id, reserved, "REFUND", note=f"Cancel order #{order_id}", order_id=order_id)
-        set_order_wallet_reserved(order_id, 0)
-    release_order_discount(order_id)
-    set_order_status(order_id, "CANCELED")
     await state.update_data(discount_flow=None, discount_code_value=None)
     await callback.message.answer(f"❌ سفارش #{order_id} لغو شد.", reply_markup=reply_main())
     await callback.answer()
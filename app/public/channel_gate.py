@@ -7,7 +7,7 @@ from aiogram.types import CallbackQuery, Message
 from ..config import FORCE_JOIN_MESSAGE, REQUIRED_CHANNEL_ID, REQUIRED_CHANNEL_LINK
 from ..keyboards import ik_force_join, reply_main
 
-router = Router()
+router = Router(name="channel_gate")
 
 
 def _channel_target():
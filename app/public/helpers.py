@@ -4,6 +4,9 @@ from html import escape
 from html import escape
 from typing import Any
 
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup
+
 from ..config import CURRENCY, ADMIN_IDS
 
 
@@ -62,6 +65,31 @@ async def _notify_admins(bot: Any, text: str) -> None:
             pass
 
 
+async def _edit_or_answer(
+    callback: CallbackQuery, text: str, reply_markup: InlineKeyboardMarkup | None = None
+) -> None:
+    """Replace the callback's message in place; fall back to a new message."""
+
+    try:
+        await callback.message.edit_text(text, reply_markup=reply_markup)
+    except TelegramBadRequest as exc:
+        if "message is not modified" in str(exc):
+            return
+        await callback.message.answer(text, reply_markup=reply_markup)
+
+
+def _fmt_order_line(order: dict[str, Any]) -> str:
+    title = _order_title(
+        order.get("service_category", ""),
+        order.get("service_code", ""),
+        order.get("notes"),
+    )
+    amount = int(order.get("amount_total") or order.get("price") or 0)
+    status = _status_fa(order.get("status") or "")
+    created = (order.get("created_at") or "")[:10]
+    return f"<code>#{order['id']}</code> {title} — {amount} {CURRENCY} — <b>{status}</b> — {created}"
+
+
 def _fmt_order_for_user(order: dict[str, Any]) -> str:
     title = _order_title(
         order.get("service_category", ""),
@@ -128,7 +156,9 @@ def _fmt_order_for_user(order: dict[str, Any]) -> str:
 
 
 __all__ = [
+    "_edit_or_answer",
     "_fmt_order_for_user",
+    "_fmt_order_line",
     "_notify_admins",
     "_order_title",
     "_price_to_int",
@@ -1,24 +1,72 @@
-from aiogram import F
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup
 
-from . import router
-from .helpers import _fmt_order_for_user
+from . import callbacks
+from .helpers import _edit_or_answer, _fmt_order_for_user, _fmt_order_line
 from ..config import CURRENCY
 from ..db import count_orders_by_category, get_user_stats, list_orders_by_category
-from ..keyboards import ik_history_menu, ik_history_more, ik_profile_actions
+from ..keyboards import ik_history_menu, ik_history_page, ik_profile_actions
 
+HISTORY_PAGE_SIZE = 10
 
-@router.callback_query(F.data == "hist:menu")
+_CATEGORY_LABELS = {
+    "inprog": "🟡 سفارشات در حال انجام",
+    "done": "✅ سفارشات تکمیل‌شده",
+    "all": "📚 تمام سفارشات",
+}
+_CATEGORY = "{category:" + "|".join(_CATEGORY_LABELS) + "}"
+
+
+def _render_history_page(
+    user_id: int, category: str, page: int, expanded_id: int | None = None
+) -> tuple[str, InlineKeyboardMarkup]:
+    category_label = _CATEGORY_LABELS.get(category, category)
+    total = count_orders_by_category(user_id, category)
+    if not total:
+        return f"{category_label}\n\nموردی یافت نشد.", ik_history_menu()
+
+    pages = max((total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE, 1)
+    page = min(max(page, 1), pages)
+    rows = list_orders_by_category(
+        user_id, category, limit=HISTORY_PAGE_SIZE, offset=(page - 1) * HISTORY_PAGE_SIZE
+    )
+
+    lines = [f"{category_label} — مجموع: {total}", ""]
+    lines.extend(_fmt_order_line(order) for order in rows)
+    expanded = next((order for order in rows if order["id"] == expanded_id), None)
+    if expanded is not None:
+        lines.extend(["", _fmt_order_for_user(expanded)])
+    else:
+        lines.extend(["", "برای دیدن جزئیات، شماره سفارش را از دکمه‌های زیر انتخاب کنید."])
+
+    markup = ik_history_page(
+        category,
+        page,
+        pages,
+        [int(order["id"]) for order in rows],
+        expanded_id=expanded["id"] if expanded is not None else None,
+    )
+    return "\n".join(lines), markup
+
+
+def _parse_page(token: str) -> int:
+    try:
+        return int(token[1:]) if token.startswith("p") else 1
+    except ValueError:
+        return 1
+
+
+@callbacks.route("hist:menu")
 async def cb_hist_menu(callback: CallbackQuery, state: FSMContext) -> None:
-    await callback.message.answer("🧾 تاریخچه سفارشات — یک دسته را انتخاب کنید:", reply_markup=ik_history_menu())
+    await _edit_or_answer(callback, "🧾 تاریخچه سفارشات — یک دسته را انتخاب کنید:", ik_history_menu())
     await callback.answer()
 
 
-@router.callback_query(F.data == "hist:back")
+@callbacks.route("hist:back")
 async def cb_hist_back(callback: CallbackQuery, state: FSMContext) -> None:
     stats = get_user_stats(callback.from_user.id)
-    await callback.message.answer(
+    await _edit_or_answer(
+        callback,
         "👤 <b>اطلاعات کاربری</b>\n"
         f"• موجودی کیف پول: <b>{stats['wallet_balance']} {CURRENCY}</b>\n"
         f"• تعداد سفارش‌ها: <b>{stats['orders_total']}</b>\n"
@@ -26,45 +74,24 @@ async def cb_hist_back(callback: CallbackQuery, state: FSMContext) -> None:
         f"• سفارشات تکمیل‌شده: <b>{stats['orders_done']}</b>\n"
         f"• تعداد زیرمجموعه‌ها: <b>{stats['ref_count']}</b>\n"
         f"• درآمد شما: <b>{stats['earnings_total']} {CURRENCY}</b>",
-        reply_markup=ik_profile_actions(),
+        ik_profile_actions(),
     )
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("hist:show:"))
-async def cb_hist_show(callback: CallbackQuery, state: FSMContext) -> None:
-    _, _, category, page_token = callback.data.split(":")
-    page = int(page_token.replace("p", "")) if page_token.startswith("p") else 1
-    page_size = 10
-    offset = (page - 1) * page_size
-
-    category_label = {
-        "inprog": "🟡 سفارشات در حال انجام",
-        "done": "✅ سفارشات تکمیل‌شده",
-        "all": "📚 تمام سفارشات",
-    }.get(category, category)
-
-    total = count_orders_by_category(callback.from_user.id, category)
-    rows = list_orders_by_category(callback.from_user.id, category, limit=page_size, offset=offset)
-
-    if page == 1:
-        await callback.message.answer(f"{category_label} — مجموع: {total}")
-
-    if not rows:
-        if page == 1:
-            await callback.message.answer("موردی یافت نشد.", reply_markup=ik_history_menu())
-        else:
-            await callback.message.answer("مورد دیگری برای نمایش نیست.", reply_markup=ik_history_more(category, page))
-        await callback.answer()
-        return
+@callbacks.route(f"hist:show:{_CATEGORY}:{{page}}")
+async def cb_hist_show(callback: CallbackQuery, state: FSMContext, category: str, page: str) -> None:
+    text, markup = _render_history_page(callback.from_user.id, category, _parse_page(page))
+    await _edit_or_answer(callback, text, markup)
+    await callback.answer()
 
-    for order in rows:
-        await callback.message.answer(_fmt_order_for_user(order))
-
-    has_more = (offset + len(rows)) < total
-    if has_more:
-        await callback.message.answer("—", reply_markup=ik_history_more(category, page + 1))
-    else:
-        await callback.message.answer("پایان لیست.", reply_markup=ik_history_menu())
 
+@callbacks.route(f"hist:open:{_CATEGORY}:{{page}}:{{order_id:int}}")
+async def cb_hist_open(
+    callback: CallbackQuery, state: FSMContext, category: str, page: str, order_id: int
+) -> None:
+    text, markup = _render_history_page(
+        callback.from_user.id, category, _parse_page(page), expanded_id=order_id
+    )
+    await _edit_or_answer(callback, text, markup)
     await callback.answer()
@@ -1,12 +1,12 @@
-from datetime import datetime
+import time
 
 from aiogram import F
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
 
-from . import router
+from . import callbacks, router
 from .channel_gate import ensure_member_for_message
-from .helpers import _order_title, _status_fa
+from .helpers import _edit_or_answer, _fmt_order_line, _order_title, _status_fa
 from ..config import CURRENCY, SUPPORT_USERNAME
 from ..db import ensure_user, get_user_stats, list_cart_orders
 from ..keyboards import (
@@ -14,7 +14,7 @@ from ..keyboards import (
     REPLY_BTN_PRODUCTS,
     REPLY_BTN_PROFILE,
     REPLY_BTN_SUPPORT,
-    ik_cart_actions,
+    ik_cart_overview,
     ik_profile_actions,
     ik_shop_main,
     reply_main,
@@ -28,6 +28,68 @@ async def on_reply_products(message: Message, state: FSMContext) -> None:
     await message.answer("به بخش خرید خوش آمدید:", reply_markup=ik_shop_main())
 
 
+def _fmt_cart_order(order: dict, now: float) -> str:
+    ttl = ""
+    if order.get("await_deadline_ts") is not None:
+        remain = max(order["await_deadline_ts"] - now, 0)
+        minutes = int(remain // 60)
+        seconds = int(remain % 60)
+        ttl = f"\n⏳ مهلت باقی‌مانده: {minutes:02d}:{seconds:02d}"
+    title = _order_title(
+        order.get("service_category", ""),
+        order.get("service_code", ""),
+        order.get("notes"),
+    )
+    try:
+        amount = int(order.get("amount_total") or 0)
+    except (TypeError, ValueError):
+        amount = 0
+    try:
+        subtotal = int(order.get("amount_subtotal") or amount)
+    except (TypeError, ValueError):
+        subtotal = amount
+    try:
+        discount_amount = int(order.get("discount_amount") or 0)
+    except (TypeError, ValueError):
+        discount_amount = 0
+    reserved = int(order.get("wallet_reserved_amount") or 0)
+    remaining = max(amount - reserved, 0)
+    text_lines = [f"🧺 سفارش #{order['id']} — <b>{title}</b>"]
+    if discount_amount > 0:
+        text_lines.append(f"قیمت اصلی: <b>{subtotal} {CURRENCY}</b>")
+        text_lines.append(f"تخفیف: <b>{discount_amount} {CURRENCY}</b>")
+        text_lines.append(f"مبلغ قابل پرداخت: <b>{amount} {CURRENCY}</b>")
+        discount_code = str(order.get("discount_code") or "").strip()
+        if discount_code:
+            text_lines.append(f"کد تخفیف: <code>{discount_code}</code>")
+    else:
+        text_lines.append(f"مبلغ کل: <b>{amount} {CURRENCY}</b>")
+    text_lines.append(f"از کیف پول رزرو شده: <b>{reserved} {CURRENCY}</b>")
+    text_lines.append(f"باقیمانده برای پرداخت کارت: <b>{remaining} {CURRENCY}</b>")
+    text_lines.append(f"وضعیت: <b>{_status_fa(order['status'])}</b>{ttl}")
+    return "\n".join(text_lines)
+
+
+def _render_cart(
+    orders: list[dict], selected_id: int | None = None
+) -> tuple[str, InlineKeyboardMarkup]:
+    selected = next((o for o in orders if o["id"] == selected_id), orders[0])
+    others = [o for o in orders if o["id"] != selected["id"]]
+    lines = [_fmt_cart_order(selected, time.time())]
+    if others:
+        lines.append("")
+        lines.append(f"🧺 سایر سفارش‌های سبد ({len(others)}):")
+        lines.extend(_fmt_order_line(o) for o in others)
+    enable_plan = (
+        selected.get("service_category") == "AI"
+        and (selected.get("payment_type") or "") != "FIRST_PLAN_BILLING"
+    )
+    markup = ik_cart_overview(
+        selected["id"], [int(o["id"]) for o in others], enable_plan=enable_plan
+    )
+    return "\n".join(lines), markup
+
+
 @router.message(F.text == REPLY_BTN_CART)
 async def on_reply_cart(message: Message, state: FSMContext) -> None:
     if not await ensure_member_for_message(message):
@@ -42,58 +104,23 @@ async def on_reply_cart(message: Message, state: FSMContext) -> None:
         await message.answer("🧺 سبد خرید شما خالی است.", reply_markup=reply_main())
         return
 
-    now = datetime.now()
-    for order in orders:
-        ttl = ""
-        if order.get("await_deadline"):
-            try:
-                deadline = datetime.fromisoformat(order["await_deadline"])
-                remain = (deadline - now).total_seconds()
-                if remain < 0:
-                    remain = 0
-                minutes = int(remain // 60)
-                seconds = int(remain % 60)
-                ttl = f"\n⏳ مهلت باقی‌مانده: {minutes:02d}:{seconds:02d}"
-            except Exception:
-                pass
-        title = _order_title(
-            order.get("service_category", ""),
-            order.get("service_code", ""),
-            order.get("notes"),
-        )
-        try:
-            amount = int(order.get("amount_total") or 0)
-        except (TypeError, ValueError):
-            amount = 0
-        try:
-            subtotal = int(order.get("amount_subtotal") or amount)
-        except (TypeError, ValueError):
-            subtotal = amount
-        try:
-            discount_amount = int(order.get("discount_amount") or 0)
-        except (TypeError, ValueError):
-            discount_amount = 0
-        reserved = int(order.get("wallet_reserved_amount") or 0)
-        remaining = max(amount - reserved, 0)
-        text_lines = [f"🧺 سفارش #{order['id']} — <b>{title}</b>"]
-        if discount_amount > 0:
-            text_lines.append(f"قیمت اصلی: <b>{subtotal} {CURRENCY}</b>")
-            text_lines.append(f"تخفیف: <b>{discount_amount} {CURRENCY}</b>")
-            text_lines.append(f"مبلغ قابل پرداخت: <b>{amount} {CURRENCY}</b>")
-            discount_code = str(order.get("discount_code") or "").strip()
-            if discount_code:
-                text_lines.append(f"کد تخفیف: <code>{discount_code}</code>")
-        else:
-            text_lines.append(f"مبلغ کل: <b>{amount} {CURRENCY}</b>")
-        text_lines.append(f"از کیف پول رزرو شده: <b>{reserved} {CURRENCY}</b>")
-        text_lines.append(f"باقیمانده برای پرداخت کارت: <b>{remaining} {CURRENCY}</b>")
-        text_lines.append(f"وضعیت: <b>{_status_fa(order['status'])}</b>{ttl}")
-        text = "\n".join(text_lines)
-        enable_plan = (
-            order.get("service_category") == "AI"
-            and (order.get("payment_type") or "") != "FIRST_PLAN_BILLING"
-        )
-        await message.answer(text, reply_markup=ik_cart_actions(order["id"], enable_plan=enable_plan))
+    text, markup = _render_cart(orders)
+    await message.answer(text, reply_markup=markup)
+
+
+@callbacks.route("cart:view:{order_id:int}")
+async def cb_cart_view(callback: CallbackQuery, state: FSMContext, order_id: int) -> None:
+    orders = list_cart_orders(callback.from_user.id)
+    if not orders:
+        await _edit_or_answer(callback, "🧺 سبد خرید شما خالی است.")
+        await callback.answer()
+        return
+    text, markup = _render_cart(orders, order_id)
+    await _edit_or_answer(callback, text, markup)
+    if any(o["id"] == order_id for o in orders):
+        await callback.answer()
+    else:
+        await callback.answer("این سفارش دیگر در سبد خرید شما نیست.", show_alert=True)
 
 
 @router.message(F.text == REPLY_BTN_PROFILE)
@@ -134,7 +161,7 @@ async def on_reply_support(message: Message) -> None:
         )
 
 
-@router.callback_query(F.data == "shop:main")
+@callbacks.route("shop:main")
 async def cb_shop_main(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.message.edit_text("به بخش خرید خوش آمدید:")
     await callback.message.answer("منو:", reply_markup=ik_shop_main())
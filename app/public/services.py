@@ -1,8 +1,7 @@
-from aiogram import F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 
-from . import router
+from . import callbacks, router
 from .helpers import _notify_admins, _price_to_int
 from ..config import (
     ADMIN_IDS,
@@ -13,6 +12,7 @@ from ..config import (
 )
 from ..db import create_service_message, ensure_user, get_user
 from ..keyboards import ik_build_actions, ik_other_services_actions, reply_main
+from ..prefetch import enqueue_prefetch
 from ..states import ShopStates
 from ..utils import mention
 
@@ -25,7 +25,7 @@ def _format_price_label(value: str) -> str:
     return f"💰 قیمت پایه: <b>{formatted} {CURRENCY}</b>"
 
 
-@router.callback_query(F.data == "shop:buildbot")
+@callbacks.route("shop:buildbot")
 async def cb_shop_buildbot(callback: CallbackQuery, state: FSMContext) -> None:
     description = BUILD_BOT_DESC.strip()
     price_line = _format_price_label(BUILD_BOT_BASE_PRICE)
@@ -39,7 +39,7 @@ async def cb_shop_buildbot(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "build:request")
+@callbacks.route("build:request")
 async def cb_build_request(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.message.answer(
         "لطفاً توضیحات ربات مورد نظر، امکانات و نیازهای خود را به‌صورت کامل ارسال کنید.")
@@ -82,7 +82,7 @@ async def on_buildbot_requirements(message: Message, state: FSMContext) -> None:
     await state.clear()
 
 
-@router.callback_query(F.data == "shop:other")
+@callbacks.route("shop:other")
 async def cb_shop_other(callback: CallbackQuery, state: FSMContext) -> None:
     description = OTHER_SERVICES_DESC.strip()
     text = (
@@ -94,7 +94,7 @@ async def cb_shop_other(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "other:request")
+@callbacks.route("other:request")
 async def cb_other_request(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.message.answer(
         "لطفاً توضیح دهید چه محصول یا خدمتی نیاز دارید تا کارشناسان ما بررسی کنند.")
@@ -171,6 +171,7 @@ async def on_other_request_attachment(message: Message, state: FSMContext) -> No
         final_text,
         attachment_file_id=attachment_id,
     )
+    enqueue_prefetch(attachment_id)
 
     if attachment_id and message.photo:
         for admin_id in ADMIN_IDS:
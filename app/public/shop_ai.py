@@ -1,9 +1,11 @@
-from aiogram import F
+from functools import lru_cache
+
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
 
-from . import router
-from ..catalog import AI_VARIANT_MAP, get_variant
+from . import callbacks, router
+from .helpers import _order_title
+from ..catalog import AI_VARIANT_MAP, catalog_cached, get_variant
 from ..config import AI_PLANS, CURRENCY
 from ..db import create_order, ensure_user, get_user
 from ..keyboards import ik_ai_buy_modes, ik_ai_confirm_purchase, ik_ai_main, ik_cart_actions, reply_main
@@ -11,25 +13,29 @@ from ..states import ShopStates
 from ..utils import is_valid_email
 
 
-@router.callback_query(F.data == "shop:ai")
-async def cb_shop_ai(callback: CallbackQuery, state: FSMContext) -> None:
-    await callback.message.edit_text("🤖 لطفاً پلن مورد نظر خود را انتخاب کنید:", reply_markup=ik_ai_main())
-    await callback.answer()
+_PLAN_KEY_MAP = {"team": "gpt_team", "plus": "gpt_plus", "google": "google_pro"}
 
+# plans that can be bought on the customer's own account, and where the flow continues
+_MY_ACCOUNT_STATES = {
+    "team": ShopStates.ai_team_wait_email,
+    "plus": ShopStates.ai_plus_wait_email,
+}
 
-@router.callback_query(F.data == "ai:back")
-async def cb_ai_back(callback: CallbackQuery, state: FSMContext) -> None:
-    await cb_shop_ai(callback, state)
-    await callback.answer()
+_PLAN = "{plan:team|plus|google}"
+_MODE = "{mode:my|pre}"
 
 
-_PLAN_KEY_MAP = {"team": "gpt_team", "plus": "gpt_plus", "google": "google_pro"}
+@callbacks.route("shop:ai", "ai:back", f"ai:{_PLAN}:back")
+async def cb_shop_ai(callback: CallbackQuery, state: FSMContext, **_: str) -> None:
+    await callback.message.edit_text("🤖 لطفاً پلن مورد نظر خود را انتخاب کنید:", reply_markup=ik_ai_main())
+    await callback.answer()
 
 
 def _ai_plan_config(code: str) -> dict:
     return AI_PLANS[_PLAN_KEY_MAP[code]]
 
 
+@lru_cache(maxsize=None)
 def _ai_plan_description(code: str) -> str:
     plan = _ai_plan_config(code)
     return f"<b>{plan['title']}</b>\n\n{plan['desc']}"
@@ -57,6 +63,21 @@ def _mode_buttons(plan_code: str) -> list[dict[str, str]]:
     return items
 
 
+@catalog_cached
+def _mode_menu(plan_code: str) -> tuple[str, InlineKeyboardMarkup]:
+    description = _ai_plan_description(plan_code)
+    text = f"{description}\n\nلطفاً حالت خرید را انتخاب کنید:"
+    return text, ik_ai_buy_modes(plan_code, _mode_buttons(plan_code))
+
+
+@catalog_cached
+def _mode_detail_text(plan_code: str, mode: str) -> str:
+    variant = _variant_data(plan_code, mode)
+    description = _ai_plan_description(plan_code)
+    price_line = _price_line(int(variant["amount"]))
+    return f"{description}\n\nحالت انتخابی: <b>{_mode_label(mode)}</b>\n{price_line}"
+
+
 def _price_line(amount: int) -> str:
     if amount <= 0:
         return "💰 قیمت: <b>تنظیم نشده</b>"
@@ -87,97 +108,72 @@ async def _message_unavailable(message: Message, variant: dict[str, object]) ->
     await message.answer(_unavailable_text(variant), reply_markup=reply_main())
 
 
-@router.callback_query(F.data == "ai:team")
-async def cb_ai_team(callback: CallbackQuery, state: FSMContext) -> None:
-    description = _ai_plan_description("team")
-    await callback.message.edit_text(
-        f"{description}\n\nلطفاً حالت خرید را انتخاب کنید:",
-        reply_markup=ik_ai_buy_modes("team", _mode_buttons("team")),
-    )
+@callbacks.route(f"ai:{_PLAN}", f"ai:{_PLAN}:mode:{_MODE}:back")
+async def cb_ai_plan(callback: CallbackQuery, state: FSMContext, plan: str, **_: str) -> None:
+    text, markup = _mode_menu(plan)
+    await callback.message.edit_text(text, reply_markup=markup)
     await callback.answer()
 
 
-@router.callback_query(F.data == "ai:plus")
-async def cb_ai_plus(callback: CallbackQuery, state: FSMContext) -> None:
-    description = _ai_plan_description("plus")
-    await callback.message.edit_text(
-        f"{description}\n\nلطفاً حالت خرید را انتخاب کنید:",
-        reply_markup=ik_ai_buy_modes("plus", _mode_buttons("plus")),
-    )
-    await callback.answer()
-
-
-@router.callback_query(F.data == "ai:google")
-async def cb_ai_google(callback: CallbackQuery, state: FSMContext) -> None:
-    description = _ai_plan_description("google")
-    await callback.message.edit_text(
-        f"{description}\n\nلطفاً حالت خرید را انتخاب کنید:",
-        reply_markup=ik_ai_buy_modes("google", _mode_buttons("google")),
+@callbacks.route(f"ai:{_PLAN}:mode:{_MODE}")
+async def cb_ai_mode(callback: CallbackQuery, state: FSMContext, plan: str, mode: str) -> None:
+    variant = _variant_data(plan, mode)
+    if not variant["available"] or (mode == "my" and plan not in _MY_ACCOUNT_STATES):
+        await _alert_unavailable(callback, variant)
+        return
+    await callback.message.answer(
+        _mode_detail_text(plan, mode),
+        reply_markup=ik_ai_confirm_purchase(plan, mode),
     )
     await callback.answer()
 
 
-@router.callback_query(F.data == "ai:team:back")
-async def cb_ai_team_back(callback: CallbackQuery, state: FSMContext) -> None:
-    await cb_shop_ai(callback, state)
-
-
-@router.callback_query(F.data == "ai:plus:back")
-async def cb_ai_plus_back(callback: CallbackQuery, state: FSMContext) -> None:
-    await cb_shop_ai(callback, state)
-
-
-@router.callback_query(F.data == "ai:google:back")
-async def cb_ai_google_back(callback: CallbackQuery, state: FSMContext) -> None:
-    await cb_shop_ai(callback, state)
-
-
-@router.callback_query(F.data == "ai:team:mode:my:back")
-async def cb_ai_team_mode_my_back(callback: CallbackQuery, state: FSMContext) -> None:
-    await cb_ai_team(callback, state)
-
-
-@router.callback_query(F.data == "ai:team:mode:pre:back")
-async def cb_ai_team_mode_pre_back(callback: CallbackQuery, state: FSMContext) -> None:
-    await cb_ai_team(callback, state)
-
-
-@router.callback_query(F.data == "ai:plus:mode:my:back")
-async def cb_ai_plus_mode_my_back(callback: CallbackQuery, state: FSMContext) -> None:
-    await cb_ai_plus(callback, state)
-
-
-@router.callback_query(F.data == "ai:plus:mode:pre:back")
-async def cb_ai_plus_mode_pre_back(callback: CallbackQuery, state: FSMContext) -> None:
-    await cb_ai_plus(callback, state)
-
-
-@router.callback_query(F.data == "ai:google:mode:my:back")
-async def cb_ai_google_mode_my_back(callback: CallbackQuery, state: FSMContext) -> None:
-    await cb_ai_google(callback, state)
-
-
-@router.callback_query(F.data == "ai:google:mode:pre:back")
-async def cb_ai_google_mode_pre_back(callback: CallbackQuery, state: FSMContext) -> None:
-    await cb_ai_google(callback, state)
-
-
-@router.callback_query(F.data == "ai:team:mode:my")
-async def cb_ai_team_mode_my(callback: CallbackQuery, state: FSMContext) -> None:
-    variant = _variant_data("team", "my")
-    if not variant["available"]:
+@callbacks.route(f"ai:{_PLAN}:mode:{_MODE}:buy")
+async def cb_ai_mode_buy(callback: CallbackQuery, state: FSMContext, plan: str, mode: str) -> None:
+    if mode == "pre":
+        ensure_user(callback.from_user.id, callback.from_user.username, callback.from_user.first_name or "")
+    variant = _variant_data(plan, mode)
+    if not variant["available"] or (mode == "my" and plan not in _MY_ACCOUNT_STATES):
         await _alert_unavailable(callback, variant)
         return
     amount = int(variant["amount"])
-    description = _ai_plan_description("team")
-    price_line = _price_line(amount)
+    if amount <= 0:
+        await callback.message.answer("قیمت این سرویس هنوز تنظیم نشده است.", reply_markup=reply_main())
+        await callback.answer()
+        return
+    if mode == "my":
+        await state.update_data(pending_service="AI", pending_code=plan)
+        await callback.message.answer("ایمیل متصل به ChatGPT خود را وارد کنید:")
+        await state.set_state(_MY_ACCOUNT_STATES[plan])
+        await callback.answer()
+        return
+
+    user = get_user(callback.from_user.id)
+    order_id = create_order(
+        user=user,
+        title=_order_title("AI", plan),
+        amount_total=amount,
+        currency=CURRENCY,
+        service_category="AI",
+        service_code=plan,
+        account_mode="PREBUILT",
+        customer_email=None,
+        notes="",
+        product_code=variant["code"],
+    )
     await callback.message.answer(
-        f"{description}\n\nحالت انتخابی: <b>{_mode_label('my')}</b>\n{price_line}",
-        reply_markup=ik_ai_confirm_purchase("team", "my"),
+        f"✅ سفارش #{order_id} ایجاد شد و به «🧺 سبد خرید» اضافه شد.\n"
+        f"برای ادامه، روش پرداخت را انتخاب کنید:",
+        reply_markup=ik_cart_actions(order_id, enable_plan=True),
     )
     await callback.answer()
 
 
+@callbacks.route(f"ai:{_PLAN}:mode:{_MODE}:unavailable")
+async def cb_ai_mode_unavailable(callback: CallbackQuery, state: FSMContext, plan: str, mode: str) -> None:
+    await _alert_unavailable(callback, _variant_data(plan, mode))
+
+
 @router.message(ShopStates.ai_team_wait_email)
 async def on_ai_team_email(message: Message, state: FSMContext) -> None:
     email = (message.text or "").strip()
@@ -220,87 +216,6 @@ async def on_ai_team_email(message: Message, state: FSMContext) -> None:
     await state.clear()
 
 
-@router.callback_query(F.data == "ai:team:mode:pre")
-async def cb_ai_team_mode_pre(callback: CallbackQuery, state: FSMContext) -> None:
-    variant = _variant_data("team", "pre")
-    if not variant["available"]:
-        await _alert_unavailable(callback, variant)
-        return
-    amount = int(variant["amount"])
-    description = _ai_plan_description("team")
-    price_line = _price_line(amount)
-    await callback.message.answer(
-        f"{description}\n\nحالت انتخابی: <b>{_mode_label('pre')}</b>\n{price_line}",
-        reply_markup=ik_ai_confirm_purchase("team", "pre"),
-    )
-    await callback.answer()
-
-
-@router.callback_query(F.data == "ai:team:mode:my:buy")
-async def cb_ai_team_mode_my_buy(callback: CallbackQuery, state: FSMContext) -> None:
-    variant = _variant_data("team", "my")
-    if not variant["available"]:
-        await _alert_unavailable(callback, variant)
-        return
-    if int(variant["amount"]) <= 0:
-        await callback.message.answer("قیمت این سرویس هنوز تنظیم نشده است.", reply_markup=reply_main())
-        await callback.answer()
-        return
-    await state.update_data(pending_service="AI", pending_code="team")
-    await callback.message.answer("ایمیل متصل به ChatGPT خود را وارد کنید:")
-    await state.set_state(ShopStates.ai_team_wait_email)
-    await callback.answer()
-
-
-@router.callback_query(F.data == "ai:team:mode:pre:buy")
-async def cb_ai_team_mode_pre_buy(callback: CallbackQuery, state: FSMContext) -> None:
-    ensure_user(callback.from_user.id, callback.from_user.username, callback.from_user.first_name or "")
-    variant = _variant_data("team", "pre")
-    if not variant["available"]:
-        await _alert_unavailable(callback, variant)
-        return
-    amount = int(variant["amount"])
-    if amount <= 0:
-        await callback.message.answer("قیمت این سرویس هنوز تنظیم نشده است.", reply_markup=reply_main())
-        await callback.answer()
-        return
-    user = get_user(callback.from_user.id)
-    order_id = create_order(
-        user=user,
-        title="اکانت ChatGPT Team",
-        amount_total=amount,
-        currency=CURRENCY,
-        service_category="AI",
-        service_code="team",
-        account_mode="PREBUILT",
-        customer_email=None,
-        notes="",
-        product_code=variant["code"],
-    )
-    await callback.message.answer(
-        f"✅ سفارش #{order_id} ایجاد شد و به «🧺 سبد خرید» اضافه شد.\n"
-        f"برای ادامه، روش پرداخت را انتخاب کنید:",
-        reply_markup=ik_cart_actions(order_id, enable_plan=True),
-    )
-    await callback.answer()
-
-
-@router.callback_query(F.data == "ai:plus:mode:my")
-async def cb_ai_plus_mode_my(callback: CallbackQuery, state: FSMContext) -> None:
-    variant = _variant_data("plus", "my")
-    if not variant["available"]:
-        await _alert_unavailable(callback, variant)
-        return
-    amount = int(variant["amount"])
-    description = _ai_plan_description("plus")
-    price_line = _price_line(amount)
-    await callback.message.answer(
-        f"{description}\n\nحالت انتخابی: <b>{_mode_label('my')}</b>\n{price_line}",
-        reply_markup=ik_ai_confirm_purchase("plus", "my"),
-    )
-    await callback.answer()
-
-
 @router.message(ShopStates.ai_plus_wait_email)
 async def on_ai_plus_email(message: Message, state: FSMContext) -> None:
     email = (message.text or "").strip()
@@ -354,126 +269,3 @@ async def on_ai_plus_password(message: Message, state: FSMContext) -> None:
         reply_markup=ik_cart_actions(order_id, enable_plan=True),
     )
     await state.clear()
-
-
-@router.callback_query(F.data == "ai:plus:mode:pre")
-async def cb_ai_plus_mode_pre(callback: CallbackQuery, state: FSMContext) -> None:
-    variant = _variant_data("plus", "pre")
-    if not variant["available"]:
-        await _alert_unavailable(callback, variant)
-        return
-    amount = int(variant["amount"])
-    description = _ai_plan_description("plus")
-    price_line = _price_line(amount)
-    await callback.message.answer(
-        f"{description}\n\nحالت انتخابی: <b>{_mode_label('pre')}</b>\n{price_line}",
-        reply_markup=ik_ai_confirm_purchase("plus", "pre"),
-    )
-    await callback.answer()
-
-
-@router.callback_query(F.data == "ai:plus:mode:my:buy")
-async def cb_ai_plus_mode_my_buy(callback: CallbackQuery, state: FSMContext) -> None:
-    variant = _variant_data("plus", "my")
-    if not variant["available"]:
-        await _alert_unavailable(callback, variant)
-        return
-    if int(variant["amount"]) <= 0:
-        await callback.message.answer("قیمت این سرویس هنوز تنظیم نشده است.", reply_markup=reply_main())
-        await callback.answer()
-        return
-    await state.update_data(pending_service="AI", pending_code="plus")
-    await callback.message.answer("ایمیل متصل به ChatGPT خود را وارد کنید:")
-    await state.set_state(ShopStates.ai_plus_wait_email)
-    await callback.answer()
-
-
-@router.callback_query(F.data == "ai:plus:mode:pre:buy")
-async def cb_ai_plus_mode_pre_buy(callback: CallbackQuery, state: FSMContext) -> None:
-    ensure_user(callback.from_user.id, callback.from_user.username, callback.from_user.first_name or "")
-    variant = _variant_data("plus", "pre")
-    if not variant["available"]:
-        await _alert_unavailable(callback, variant)
-        return
-    amount = int(variant["amount"])
-    if amount <= 0:
-        await callback.message.answer("قیمت این سرویس هنوز تنظیم نشده است.", reply_markup=reply_main())
-        await callback.answer()
-        return
-    user = get_user(callback.from_user.id)
-    order_id = create_order(
-        user=user,
-        title="اکانت ChatGPT Plus",
-        amount_total=amount,
-        currency=CURRENCY,
-        service_category="AI",
-        service_code="plus",
-        account_mode="PREBUILT",
-        customer_email=None,
-        notes="",
-        product_code=variant["code"],
-    )
-    await callback.message.answer(
-        f"✅ سفارش #{order_id} ایجاد شد و به «🧺 سبد خرید» اضافه شد.\n"
-        f"برای ادامه، روش پرداخت را انتخاب کنید:",
-        reply_markup=ik_cart_actions(order_id, enable_plan=True),
-    )
-    await callback.answer()
-
-
-@router.callback_query(F.data == "ai:google:mode:pre")
-async def cb_ai_google_mode_pre(callback: CallbackQuery, state: FSMContext) -> None:
-    variant = _variant_data("google", "pre")
-    if not variant["available"]:
-        await _alert_unavailable(callback, variant)
-        return
-    amount = int(variant["amount"])
-    description = _ai_plan_description("google")
-    price_line = _price_line(amount)
-    await callback.message.answer(
-        f"{description}\n\nحالت انتخابی: <b>{_mode_label('pre')}</b>\n{price_line}",
-        reply_markup=ik_ai_confirm_purchase("google", "pre"),
-    )
-    await callback.answer()
-
-
-@router.callback_query(F.data == "ai:google:mode:pre:buy")
-async def cb_ai_google_mode_pre_buy(callback: CallbackQuery, state: FSMContext) -> None:
-    ensure_user(callback.from_user.id, callback.from_user.username, callback.from_user.first_name or "")
-    variant = _variant_data("google", "pre")
-    if not variant["available"]:
-        await _alert_unavailable(callback, variant)
-        return
-    amount = int(variant["amount"])
-    if amount <= 0:
-        await callback.message.answer("قیمت این سرویس هنوز تنظیم نشده است.", reply_markup=reply_main())
-        await callback.answer()
-        return
-    user = get_user(callback.from_user.id)
-    order_id = create_order(
-        user=user,
-        title="اکانت Google AI Pro",
-        amount_total=amount,
-        currency=CURRENCY,
-        service_category="AI",
-        service_code="google",
-        account_mode="PREBUILT",
-        customer_email=None,
-        notes="",
-        product_code=variant["code"],
-    )
-    await callback.message.answer(
-        f"✅ سفارش #{order_id} ایجاد شد و به «🧺 سبد خرید» اضافه شد.\n"
-        f"برای ادامه، روش پرداخت را انتخاب کنید:",
-        reply_markup=ik_cart_actions(order_id, enable_plan=True),
-    )
-    await callback.answer()
-
-
-@router.callback_query(F.data.regexp(r"^ai:(team|plus|google):mode:(my|pre):unavailable$"))
-async def cb_ai_mode_unavailable(callback: CallbackQuery, state: FSMContext) -> None:
-    parts = callback.data.split(":")
-    plan_code = parts[1]
-    mode = parts[3]
-    variant = _variant_data(plan_code, mode)
-    await _alert_unavailable(callback, variant)
@@ -1,10 +1,9 @@
-from aiogram import F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 
-from . import router
+from . import callbacks, router
 from .helpers import _order_title
-from ..catalog import TG_PREMIUM_VARIANTS, get_variant
+from ..catalog import TG_PREMIUM_VARIANTS, catalog_cached, get_variant
 from ..config import ADMIN_IDS, CURRENCY, TG_READY_PREBUILT
 from ..db import create_order, create_service_message, ensure_user, get_user
 from ..keyboards import (
@@ -36,6 +35,28 @@ def _variant_unavailable_text() -> str:
     return "این گزینه در حال حاضر ناموجود است."
 
 
+@catalog_cached
+def _premium_menu_text() -> str:
+    lines = []
+    for period, label in [("3m", "3 ماهه"), ("6m", "6 ماهه"), ("12m", "12 ماهه")]:
+        variant = _premium_variant(period)
+        price_text = _format_variant_price(variant)
+        lines.append(f"• {label}: {price_text}")
+    text ="تلگرام پرمیوم (بدون لاگین)\n" + "\n""بدون لاگین به معنای این هست که نیاز به ورود به حساب شما نیست\n"+ "\n""\
+    یکی را انتخاب کنید: \n" + "\n".join(lines)
+    return text
+
+
+@catalog_cached
+def _ready_pre_caption() -> str:
+    item = TG_READY_PREBUILT
+    price_display = _format_variant_price(get_variant("tg_ready_pre"))
+    return (
+        f"<b>{item['title']}</b>\n\n{item['desc']}\n\n"
+        f"💰 قیمت: <b>{price_display}</b>"
+    )
+
+
 async def _alert_variant_unavailable(callback: CallbackQuery) -> None:
     text = _variant_unavailable_text()
     await callback.answer(text, show_alert=True)
@@ -46,33 +67,20 @@ async def _message_variant_unavailable(message: Message) -> None:
     await message.answer(_variant_unavailable_text(), reply_markup=reply_main())
 
 
-@router.callback_query(F.data == "shop:tg")
+@callbacks.route("shop:tg", "tg:back")
 async def cb_shop_tg(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.message.edit_text("📣 خدمات تلگرام:", reply_markup=ik_tg_main())
     await callback.answer()
 
 
-@router.callback_query(F.data == "tg:back")
-async def cb_tg_back(callback: CallbackQuery, state: FSMContext) -> None:
-    await cb_shop_tg(callback, state)
-
-
-@router.callback_query(F.data == "tg:premium")
+@callbacks.route("tg:premium")
 async def cb_tg_premium(callback: CallbackQuery, state: FSMContext) -> None:
-    lines = []
-    for period, label in [("3m", "3 ماهه"), ("6m", "6 ماهه"), ("12m", "12 ماهه")]:
-        variant = _premium_variant(period)
-        price_text = _format_variant_price(variant)
-        lines.append(f"• {label}: {price_text}")
-    text ="تلگرام پرمیوم (بدون لاگین)\n" + "\n""بدون لاگین به معنای این هست که نیاز به ورود به حساب شما نیست\n"+ "\n""\
-    یکی را انتخاب کنید: \n" + "\n".join(lines)
-    await callback.message.edit_text(text, reply_markup=ik_tg_premium_durations())
+    await callback.message.edit_text(_premium_menu_text(), reply_markup=ik_tg_premium_durations())
     await callback.answer()
 
 
-@router.callback_query(F.data.in_({"tg:premium:3m", "tg:premium:6m", "tg:premium:12m"}))
-async def cb_tg_premium_choose(callback: CallbackQuery, state: FSMContext) -> None:
-    period = callback.data.split(":")[2]
+@callbacks.route("tg:premium:{period:3m|6m|12m}")
+async def cb_tg_premium_choose(callback: CallbackQuery, state: FSMContext, period: str) -> None:
     variant = _premium_variant(period)
     if not variant["available"]:
         await _alert_variant_unavailable(callback)
@@ -133,35 +141,29 @@ async def on_tg_premium_id(message: Message, state: FSMContext) -> None:
     await state.clear()
 
 
-@router.callback_query(F.data == "tg:stars")
+@callbacks.route("tg:stars")
 async def cb_tg_stars(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.message.edit_text("🎯 Stars — Coming soon", reply_markup=ik_tg_main())
     await callback.answer()
 
 
-@router.callback_query(F.data == "tg:ready")
+@callbacks.route("tg:ready")
 async def cb_tg_ready(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.message.edit_text("اکانت آماده تلگرام:", reply_markup=ik_tg_ready_options())
     await callback.answer()
 
 
-@router.callback_query(F.data == "tg:ready:pre")
+@callbacks.route("tg:ready:pre")
 async def cb_tg_ready_pre(callback: CallbackQuery, state: FSMContext) -> None:
-    item = TG_READY_PREBUILT
     variant = get_variant("tg_ready_pre")
     if not variant["available"]:
         await _alert_variant_unavailable(callback)
         return
-    price_display = _format_variant_price(variant)
-    caption = (
-        f"<b>{item['title']}</b>\n\n{item['desc']}\n\n"
-        f"💰 قیمت: <b>{price_display}</b>"
-    )
-    await callback.message.edit_text(caption, reply_markup=ik_ready_pre_actions())
+    await callback.message.edit_text(_ready_pre_caption(), reply_markup=ik_ready_pre_actions())
     await callback.answer()
 
 
-@router.callback_query(F.data == "tg:ready:country")
+@callbacks.route("tg:ready:country")
 async def cb_tg_ready_country(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.message.answer("لطفاً کشور/جزئیات مورد نظر خود را به‌صورت متن ارسال کنید:")
     await state.set_state(ShopStates.ready_country_wait_text)
@@ -192,7 +194,7 @@ async def on_ready_country_text(message: Message, state: FSMContext) -> None:
     await state.clear()
 
 
-@router.callback_query(F.data == "tg:ready:pre:buy")
+@callbacks.route("tg:ready:pre:buy")
 async def cb_tg_ready_pre_buy(callback: CallbackQuery, state: FSMContext) -> None:
     ensure_user(callback.from_user.id, callback.from_user.username, callback.from_user.first_name or "")
     variant = get_variant("tg_ready_pre")
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import contextvars
+import logging
+import re
+import sqlite3
+import sys
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from .config import SLOW_QUERY_LOG, SLOW_QUERY_MS
+
+slow_log = logging.getLogger("app.db.slow")
+if SLOW_QUERY_LOG:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG, encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_log.addHandler(_handler)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# frames skipped when attributing a statement to the app.db function that issued it
+_PLUMBING = {"_execute", "db_execute"}
+
+
+def _param_shape(params: Any) -> str:
+    """Types of the bound parameters, never their values."""
+
+    if isinstance(params, dict):
+        return "{" + ",".join(sorted(params)) + "}"
+    try:
+        count = len(params)
+    except TypeError:
+        return "?"
+    if count > 8:
+        return f"({count} params)"
+    return "(" + ",".join("None" if p is None else type(p).__name__ for p in params) + ")"
+
+
+def _caller() -> str:
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code.co_name in _PLUMBING:
+        frame = frame.f_back
+    return frame.f_code.co_name if frame is not None else "?"
+
+
+@dataclass
+class QueryRecord:
+    sql: str
+    params: str
+    function: str
+    duration: float = 0.0
+    rows: int = 0
+
+    @property
+    def is_control(self) -> bool:
+        return self.sql.lstrip()[:6].upper() in {"PRAGMA", "BEGIN", "COMMIT"} or self.sql.lstrip()[:8].upper() == "ROLLBACK"
+
+    def describe(self) -> str:
+        sql = _WHITESPACE_RE.sub(" ", self.sql).strip()
+        return f"{self.duration * 1000:.1f}ms rows={self.rows} {self.function} {sql} {self.params}"
+
+
+@dataclass
+class QueryLog:
+    """Statements run while this log is current (see ``track_queries``)."""
+
+    records: list[QueryRecord] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def queries(self) -> list[QueryRecord]:
+        return [r for r in self.records if not r.is_control]
+
+    @property
+    def count(self) -> int:
+        return sum(1 for r in self.records if not r.is_control)
+
+    @property
+    def duration(self) -> float:
+        return sum(r.duration for r in self.records)
+
+    def summary(self) -> str:
+        return "\n".join(r.describe() for r in self.queries)
+
+
+_current: contextvars.ContextVar[QueryLog | None] = contextvars.ContextVar("query_log", default=None)
+
+
+def current_query_log() -> QueryLog | None:
+    return _current.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryLog]:
+    """Collect every statement run in this context (an update, a request, a test)."""
+
+    log = QueryLog()
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryLog]:
+    """Fail when the wrapped block runs more than ``limit`` queries, e.g. to catch N+1 loops::
+
+        with assert_max_queries(3):
+            await cb_cart_view(callback, state, order_id=5)
+    """
+
+    with track_queries() as log:
+        yield log
+    if log.count > limit:
+        raise AssertionError(f"{log.count} queries, expected at most {limit}:\n{log.summary()}")
+
+
+def _finish(record: QueryRecord) -> None:
+    if record.duration * 1000 >= SLOW_QUERY_MS and not record.is_control:
+        slow_log.warning("slow query %s", record.describe())
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Times each statement, including fetching its rows, and reports it on completion."""
+
+    _record: QueryRecord | None = None
+
+    def _complete(self) -> None:
+        record = self._record
+        if record is not None:
+            self._record = None
+            _finish(record)
+
+    def execute(self, sql: str, parameters: Any = (), /) -> "InstrumentedCursor":
+        self._complete()
+        record = QueryRecord(sql, _param_shape(parameters), _caller())
+        log = _current.get()
+        if log is not None:
+            log.records.append(record)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record.duration += time.perf_counter() - start
+            if self.description is None and self.rowcount > 0:
+                record.rows = self.rowcount
+            self._record = record
+
+    def executemany(self, sql: str, seq_of_parameters: Any, /) -> "InstrumentedCursor":
+        self._complete()
+        record = QueryRecord(sql, "(many)", _caller())
+        log = _current.get()
+        if log is not None:
+            log.records.append(record)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record.duration += time.perf_counter() - start
+            record.rows = max(self.rowcount, 0)
+            self._record = record
+
+    def fetchone(self) -> Any:
+        start = time.perf_counter()
+        row = super().fetchone()
+        record = self._record
+        if record is not None:
+            record.duration += time.perf_counter() - start
+            record.rows += row is not None
+        return row
+
+    def fetchmany(self, size: int | None = None) -> list[Any]:
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        record = self._record
+        if record is not None:
+            record.duration += time.perf_counter() - start
+            record.rows += len(rows)
+        return rows
+
+    def fetchall(self) -> list[Any]:
+        start = time.perf_counter()
+        rows = super().fetchall()
+        record = self._record
+        if record is not None:
+            record.duration += time.perf_counter() - start
+            record.rows += len(rows)
+            self._complete()
+        return rows
+
+    def close(self) -> None:
+        self._complete()
+        super().close()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """``sqlite3.connect(factory=...)`` whose cursors are ``InstrumentedCursor``."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # weak: pooled connections live for the whole process and hand out a cursor per query
+        self._cursors: weakref.WeakSet[InstrumentedCursor] = weakref.WeakSet()
+
+    def cursor(self, factory: Any = None) -> Any:
+        cur = super().cursor(factory or InstrumentedCursor)
+        if isinstance(cur, InstrumentedCursor):
+            self._cursors.add(cur)
+        return cur
+
+    def close(self) -> None:
+        for cur in list(self._cursors):
+            cur._complete()
+        self._cursors.clear()
+        super().close()
+
+
+__all__ = [
+    "InstrumentedConnection",
+    "InstrumentedCursor",
+    "QueryLog",
+    "QueryRecord",
+    "assert_max_queries",
+    "current_query_log",
+    "track_queries",
+]
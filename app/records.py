@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from operator import itemgetter
+from typing import Any, Iterator
+
+
+class Record(tuple):
+    """Read-only row built straight from a cursor tuple, without an intermediate dict.
+
+    Reads like the dicts ``db_execute`` returns: ``row["col"]``,
+    ``row.get("col")``, ``dict(row)`` and, for templates, ``row.col``.
+    Subclasses come from ``record_type`` and carry only their projection's
+    columns.
+    """
+
+    __slots__ = ()
+    _fields: tuple[str, ...] = ()
+    _index: dict[str, int] = {}
+
+    @classmethod
+    def from_row(cls, cursor: Any, row: tuple) -> "Record":
+        # sqlite3 row_factory signature
+        return tuple.__new__(cls, row)
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, str):
+            try:
+                key = self._index[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self) -> tuple[str, ...]:
+        return self._fields
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        return zip(self._fields, self)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def _asdict(self) -> dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={value!r}" for name, value in zip(self._fields, self))
+        return f"{type(self).__name__}({values})"
+
+
+def record_type(name: str, fields: tuple[str, ...]) -> type[Record]:
+    """A ``Record`` subclass over ``fields``, in ``SELECT`` order."""
+
+    namespace: dict[str, Any] = {
+        "__slots__": (),
+        "_fields": tuple(fields),
+        "_index": {field: i for i, field in enumerate(fields)},
+    }
+    for i, field in enumerate(fields):
+        namespace[field] = property(itemgetter(i))
+    return type(name, (Record,), namespace)
+
+
+__all__ = ["Record", "record_type"]
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any
+
+from .config import LOOP_BLOCK_THRESHOLD_MS, LOOP_MONITOR_INTERVAL_MS
+from .metrics import EVENT_LOOP_LAG_SECONDS, EVENT_LOOP_STALLS_TOTAL
+
+log = logging.getLogger(__name__)
+
+LAG_WINDOW = 600
+STALL_HISTORY = 20
+STACK_LIMIT = 25
+# dispatch plumbing skipped when naming the code that blocked the loop
+_PLUMBING_MODULES = {"app.middlewares", "app.callbacks", "app.watchdog", "app.metrics", "app.querylog", "app.capture"}
+
+
+@dataclass
+class Stall:
+    detected_at: float
+    where: str
+    stack: str
+    duration: float | None = None
+    wall_time: float = field(default_factory=time.time)
+
+
+def _describe(frame: FrameType | None) -> tuple[str, str]:
+    """``(where, stack)`` for the frame the loop thread is stuck in."""
+
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    where = None
+    entry = None
+    for candidate in reversed(frames):
+        module = candidate.f_globals.get("__name__", "")
+        name = candidate.f_code.co_name
+        if module.startswith("app.") and module not in _PLUMBING_MODULES and not name.startswith("_"):
+            where = f"{module}.{name}"
+            break
+        caller = candidate.f_back
+        if entry is None and caller is not None and caller.f_globals.get("__name__") == "asyncio.events":
+            # first frame of the callback the loop is running
+            entry = f"{module}.{name}"
+    if where is None:
+        where = entry or "?"
+    stack = "".join(traceback.format_stack(frames[0], limit=STACK_LIMIT)) if frames else ""
+    return where, stack
+
+
+class LoopMonitor:
+    """Samples event-loop lag and catches callbacks that block the loop.
+
+    A task wakes every ``interval`` seconds and records how late it woke up.
+    A watchdog thread watches that heartbeat; when it stalls past
+    ``threshold`` the thread grabs the loop thread's current stack, names the
+    app function on it and logs both while the loop is still blocked.
+    """
+
+    def __init__(self, interval: float, threshold: float) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: deque[float] = deque(maxlen=LAG_WINDOW)
+        self.stalls: deque[Stall] = deque(maxlen=STALL_HISTORY)
+        self.stall_count = 0
+        self.max_lag = 0.0
+        self.started_at: float | None = None
+        self._heartbeat = time.monotonic()
+        self._reported_heartbeat: float | None = None
+        self._pending: Stall | None = None
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.started_at = time.time()
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample(), name="loop-monitor")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - start - self.interval, 0.0)
+            self._heartbeat = time.monotonic()
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+            if lag >= self.threshold:
+                stall, self._pending = self._pending, None
+                if stall is None:
+                    # the watchdog thread polls at interval / 2 and can miss short stalls
+                    stall = Stall(time.monotonic(), "?", "")
+                    self._record(stall)
+                    log.warning("Event loop blocked for %.0f ms (no stack captured)", lag * 1000)
+                else:
+                    log.info("Event loop stall in %s lasted %.0f ms", stall.where, lag * 1000)
+                stall.duration = lag
+
+    def _record(self, stall: Stall) -> None:
+        self.stalls.append(stall)
+        self.stall_count += 1
+        EVENT_LOOP_STALLS_TOTAL.inc(stall.where)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.threshold or self._reported_heartbeat == heartbeat:
+                continue
+            self._reported_heartbeat = heartbeat
+            where, stack = _describe(sys._current_frames().get(self._loop_thread))
+            stall = Stall(time.monotonic(), where, stack)
+            self._pending = stall
+            self._record(stall)
+            log.warning("Event loop blocked for %.0f ms so far in %s:\n%s", stalled * 1000, where, stack)
+
+    def stats(self) -> dict[str, Any]:
+        lags = sorted(self.lags)
+
+        def pick(q: float) -> float:
+            return round(lags[min(len(lags) - 1, int(len(lags) * q))] * 1000, 2) if lags else 0.0
+
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "window_samples": len(lags),
+            "lag_p50_ms": pick(0.50),
+            "lag_p99_ms": pick(0.99),
+            "lag_max_window_ms": round(lags[-1] * 1000, 2) if lags else 0.0,
+            "lag_max_ms": round(self.max_lag * 1000, 2),
+            "stalls": self.stall_count,
+            "recent_stalls": [
+                {
+                    "at": stall.wall_time,
+                    "where": stall.where,
+                    "duration_ms": round(stall.duration * 1000, 1) if stall.duration is not None else None,
+                    "stack": stall.stack,
+                }
+                for stall in reversed(self.stalls)
+            ],
+        }
+
+
+monitor = LoopMonitor(LOOP_MONITOR_INTERVAL_MS / 1000, LOOP_BLOCK_THRESHOLD_MS / 1000)
+
+
+__all__ = ["LoopMonitor", "Stall", "monitor"]
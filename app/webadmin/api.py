@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+import secrets
+from typing import Any, Callable
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse
+
+from ..config import ADMIN_API_TOKEN
+from ..db import API_FILTERS, API_RESOURCES, get_api_rows, list_api_rows
+from .pagecache import cached_page
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json fallback
+    orjson = None
+
+API_PREFIX = "/api/v1"
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+MAX_BATCH = 200
+# change_counters groups each resource's rows belong to, for ETags
+API_GROUPS = {
+    "orders": ("orders", "order_details", "users"),
+    "users": ("users",),
+    "wallet_tx": ("wallet",),
+    "discounts": ("discounts",),
+    "coupons": ("coupons",),
+    "messages": ("messages",),
+}
+_LIST_PARAMS = {"fields", "cursor", "limit"}
+_TRUE = {"1", "true", "yes"}
+_FALSE = {"0", "false", "no"}
+
+
+class APIResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _api_auth(request: Request) -> str:
+    auth = request.headers.get("authorization", "")
+    if ADMIN_API_TOKEN and secrets.compare_digest(auth, f"Bearer {ADMIN_API_TOKEN}"):
+        return "token"
+    user = request.session.get("auth_user")
+    if not user:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="ورود لازم است")
+    return user
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _fields(value: str) -> list[str] | None:
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    return fields or None
+
+
+def encode_cursor(key: int) -> str:
+    return base64.urlsafe_b64encode(str(key).encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise _bad_request("cursor نامعتبر است") from None
+
+
+def _parse_filter(name: str, raw: str, kind: type) -> Any:
+    if kind is bool:
+        value = raw.strip().lower()
+        if value in _TRUE:
+            return True
+        if value in _FALSE:
+            return False
+        raise _bad_request(f"مقدار {name} نامعتبر است")
+    if kind is int:
+        try:
+            return int(raw)
+        except ValueError:
+            raise _bad_request(f"مقدار {name} نامعتبر است") from None
+    return raw
+
+
+def _list_endpoint(resource: str) -> Callable:
+    _, key = API_RESOURCES[resource]
+    allowed = API_FILTERS[resource]
+
+    async def endpoint(
+        request: Request,
+        user: str = Depends(_api_auth),
+        fields: str = Query(""),
+        cursor: str = Query(""),
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    ):
+        filters = {}
+        for name, raw in request.query_params.items():
+            if name in _LIST_PARAMS:
+                continue
+            if name not in allowed:
+                raise _bad_request(f"فیلتر {name} پشتیبانی نمی‌شود")
+            filters[name] = _parse_filter(name, raw, allowed[name])
+        try:
+            # one extra row tells whether there is a next page
+            rows = list_api_rows(
+                resource,
+                fields=_fields(fields),
+                filters=filters,
+                before=decode_cursor(cursor) if cursor else None,
+                limit=limit + 1,
+            )
+        except ValueError as exc:
+            raise _bad_request(str(exc)) from None
+        next_cursor = encode_cursor(rows[limit - 1][key]) if len(rows) > limit else None
+        return APIResponse({"data": rows[:limit], "next_cursor": next_cursor})
+
+    endpoint.__name__ = f"api_{resource}_list"
+    return endpoint
+
+
+def _batch_endpoint(resource: str) -> Callable:
+    _, key = API_RESOURCES[resource]
+
+    async def endpoint(
+        request: Request,
+        user: str = Depends(_api_auth),
+        ids: str = Query(...),
+        fields: str = Query(""),
+    ):
+        try:
+            wanted = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+        except ValueError:
+            raise _bad_request("ids نامعتبر است") from None
+        if not wanted or len(wanted) > MAX_BATCH:
+            raise _bad_request(f"بین ۱ تا {MAX_BATCH} شناسه مجاز است")
+        try:
+            rows = get_api_rows(resource, wanted, fields=_fields(fields))
+        except ValueError as exc:
+            raise _bad_request(str(exc)) from None
+        found = {row[key] for row in rows}
+        return APIResponse({"data": rows, "missing": [i for i in wanted if i not in found]})
+
+    endpoint.__name__ = f"api_{resource}_batch"
+    return endpoint
+
+
+def _detail_endpoint(resource: str) -> Callable:
+    async def endpoint(
+        request: Request,
+        item_id: int,
+        user: str = Depends(_api_auth),
+        fields: str = Query(""),
+    ):
+        try:
+            rows = get_api_rows(resource, [item_id], fields=_fields(fields))
+        except ValueError as exc:
+            raise _bad_request(str(exc)) from None
+        if not rows:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="یافت نشد")
+        return APIResponse(rows[0])
+
+    endpoint.__name__ = f"api_{resource}_detail"
+    return endpoint
+
+
+def build_api_router() -> APIRouter:
+    """Read-only JSON views of the admin tables under ``/api/v1``.
+
+    Every resource has ``GET /<resource>`` (filters, ``fields=``, ``cursor``
+    and ``limit``), ``GET /<resource>/batch?ids=`` and ``GET /<resource>/<id>``.
+    ``fields`` narrows the SELECT itself. Responses carry an ETag from the
+    resource's change counter and are served from the page cache until the
+    table changes.
+    """
+
+    router = APIRouter(prefix=API_PREFIX, default_response_class=APIResponse)
+    for resource in API_RESOURCES:
+        groups = API_GROUPS[resource]
+        router.add_api_route(f"/{resource}", cached_page(*groups)(_list_endpoint(resource)), methods=["GET"])
+        # registered before /{item_id} so "batch" is not taken for an id
+        router.add_api_route(f"/{resource}/batch", cached_page(*groups)(_batch_endpoint(resource)), methods=["GET"])
+        router.add_api_route(f"/{resource}/{{item_id}}", cached_page(*groups)(_detail_endpoint(resource)), methods=["GET"])
+    return router
+
+
+__all__ = ["API_PREFIX", "APIResponse", "build_api_router", "decode_cursor", "encode_cursor"]
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs
+
+from jinja2 import pass_context
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# anything else (images, pdf receipts, zip) is already compressed
+COMPRESSIBLE_TYPES = (
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/csv",
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "application/x-ndjson",
+    "image/svg+xml",
+)
+
+
+class HashedStaticFiles(StaticFiles):
+    """``StaticFiles`` whose URLs carry a content hash (``?v=``) and are cached forever.
+
+    Requests with the current hash get ``Cache-Control: immutable``; anything
+    else (old hash, no hash) must revalidate, so a deploy is picked up at once.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._hashes: dict[str, tuple[float, str]] = {}
+
+    def _digest(self, full_path: str, mtime: float) -> str:
+        cached = self._hashes.get(full_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        digest = hashlib.sha256(Path(full_path).read_bytes()).hexdigest()[:12]
+        self._hashes[full_path] = (mtime, digest)
+        return digest
+
+    def version(self, path: str) -> str:
+        full_path, stat_result = self.lookup_path(path.lstrip("/"))
+        if stat_result is None:
+            return ""
+        return self._digest(full_path, stat_result.st_mtime)
+
+    def file_response(self, full_path: Any, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        requested = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("v", [""])[0]
+        if requested and requested == self._digest(str(full_path), stat_result.st_mtime):
+            response.headers["Cache-Control"] = IMMUTABLE
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+def static_url_global(static: HashedStaticFiles):
+    """Jinja global: ``{{ static_url('styles.css') }}`` → ``/static/styles.css?v=<hash>``."""
+
+    @pass_context
+    def static_url(context: Any, path: str) -> str:
+        url = str(context["request"].url_for("static", path="/" + path.lstrip("/")))
+        version = static.version(path)
+        return f"{url}?v={version}" if version else url
+
+    return static_url
+
+
+class _SelectiveMixin:
+    content_type_is_excluded: bool
+
+    async def send_with_compression(self, message: Message) -> None:
+        await super().send_with_compression(message)  # type: ignore[misc]
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            self.content_type_is_excluded = not content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _GZipResponder(_SelectiveMixin, GZipResponder):
+    pass
+
+
+class _BrotliResponder(_SelectiveMixin, IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 5) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        out = self.compressor.process(body)
+        return out + (self.compressor.flush() if more_body else self.compressor.finish())
+
+
+class CompressionMiddleware:
+    """gzip, or brotli when installed and accepted, for text responses.
+
+    Streaming responses (exports) are compressed chunk by chunk; event streams
+    and binary files pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 5) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        if brotli is not None and "br" in accept:
+            responder: ASGIApp = _BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif "gzip" in accept:
+            responder = _GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = self.app
+        await responder(scope, receive, send)
+
+
+__all__ = ["CompressionMiddleware", "HashedStaticFiles", "static_url_global"]
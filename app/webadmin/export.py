@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Any, Iterable, Iterator
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+# never leave the server through an export
+EXCLUDED_COLUMNS = {"customer_secret_encrypted"}
+
+
+def _clean(row: dict[str, Any]) -> dict[str, Any]:
+    return {k: v for k, v in row.items() if k not in EXCLUDED_COLUMNS}
+
+
+def iter_csv(chunks: Iterable[list[dict[str, Any]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer: csv.DictWriter | None = None
+    # BOM so Excel opens Persian text correctly
+    yield "\ufeff".encode("utf-8")
+    for rows in chunks:
+        for row in rows:
+            row = _clean(row)
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(row), extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow(row)
+        data = buffer.getvalue()
+        if data:
+            yield data.encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def iter_jsonl(chunks: Iterable[list[dict[str, Any]]]) -> Iterator[bytes]:
+    for rows in chunks:
+        lines = [json.dumps(_clean(row), ensure_ascii=False, default=str) for row in rows]
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def encode_export(chunks: Iterable[list[dict[str, Any]]], fmt: str) -> Iterator[bytes]:
+    if fmt == "csv":
+        return iter_csv(chunks)
+    return iter_jsonl(chunks)
+
+
+__all__ = ["EXPORT_FORMATS", "encode_export", "iter_csv", "iter_jsonl"]
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+
+
+# getFile links stay valid for about an hour; refresh a bit earlier.
+FILE_PATH_TTL = 50 * 60
+# getFile answers kept at most; the least recently used go first
+FILE_PATH_CACHE_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class CachedFile:
+    path: Path
+    media_type: str
+    filename: str
+    etag: str
+
+
+class TelegramFileCache:
+    """Download Telegram files once and keep them in a size-bounded disk cache."""
+
+    def __init__(self, token: str, *, api_base: str, cache_dir: str | Path, max_bytes: int) -> None:
+        self.token = token
+        self.api_base = api_base.rstrip("/")
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max(int(max_bytes), 0)
+        self._client: httpx.AsyncClient | None = None
+        self._paths: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def start(self) -> None:
+        self._client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("TelegramFileCache.start() has not been called")
+        return self._client
+
+    def _key(self, file_id: str) -> str:
+        return hashlib.sha256(file_id.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> CachedFile | None:
+        data_path = self.cache_dir / f"{key}.bin"
+        meta_path = self.cache_dir / f"{key}.json"
+        try:
+            meta = json.loads(meta_path.read_text("utf-8"))
+            size = data_path.stat().st_size
+        except (FileNotFoundError, ValueError):
+            return None
+        # the meta file's mtime doubles as the LRU timestamp; the data file stays untouched
+        os.utime(meta_path)
+        return CachedFile(
+            path=data_path,
+            media_type=meta.get("media_type") or "application/octet-stream",
+            filename=meta.get("filename") or key,
+            etag=f'"{key[:32]}-{size}"',
+        )
+
+    async def _file_path(self, file_id: str) -> str:
+        cached = self._paths.get(file_id)
+        now = time.monotonic()
+        if cached and cached[1] > now:
+            self._paths.move_to_end(file_id)
+            return cached[0]
+        meta = await self.client.get(
+            f"{self.api_base}/bot{self.token}/getFile",
+            params={"file_id": file_id},
+            timeout=10.0,
+        )
+        if meta.status_code != 200:
+            raise FileNotFoundError("file not found on telegram")
+        file_path = (meta.json().get("result") or {}).get("file_path")
+        if not file_path:
+            raise FileNotFoundError("telegram returned no file path")
+        self._paths[file_id] = (file_path, now + FILE_PATH_TTL)
+        self._paths.move_to_end(file_id)
+        if len(self._paths) > FILE_PATH_CACHE_SIZE:
+            self._paths.popitem(last=False)
+        return file_path
+
+    async def get(self, file_id: str) -> CachedFile:
+        key = self._key(file_id)
+        hit = self._lookup(key)
+        if hit is not None:
+            return hit
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            hit = self._lookup(key)
+            if hit is not None:
+                return hit
+            try:
+                return await self._download(file_id, key)
+            finally:
+                self._locks.pop(key, None)
+
+    async def _download(self, file_id: str, key: str) -> CachedFile:
+        file_path = await self._file_path(file_id)
+        url = f"{self.api_base}/file/bot{self.token}/{file_path}"
+        # other workers may be fetching the same file; each writes its own temp file
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{key}.", suffix=".part")
+        tmp_path = Path(tmp_name)
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                async with self.client.stream("GET", url) as response:
+                    if response.status_code != 200:
+                        # the cached path may have expired early
+                        self._paths.pop(file_id, None)
+                        raise FileNotFoundError("download failed")
+                    media_type = response.headers.get("content-type", "application/octet-stream")
+                    async for chunk in response.aiter_bytes():
+                        fh.write(chunk)
+                        size += len(chunk)
+            data_path = self.cache_dir / f"{key}.bin"
+            os.replace(tmp_path, data_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        meta = {"media_type": media_type, "filename": Path(file_path).name, "size": size}
+        (self.cache_dir / f"{key}.json").write_text(json.dumps(meta), "utf-8")
+        self._evict(keep=key)
+        return CachedFile(
+            path=data_path,
+            media_type=media_type,
+            filename=meta["filename"],
+            etag=f'"{key[:32]}-{size}"',
+        )
+
+    def _evict(self, keep: str) -> None:
+        # sized from the directory: every worker writes to the same cache
+        entries = []
+        total = 0
+        for data_path in self.cache_dir.glob("*.bin"):
+            key = data_path.stem
+            try:
+                size = data_path.stat().st_size
+                mtime = (self.cache_dir / f"{key}.json").stat().st_mtime
+            except FileNotFoundError:
+                continue
+            total += size
+            if key != keep:
+                entries.append((mtime, key, size))
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, key, size in entries:
+            if total <= self.max_bytes:
+                break
+            (self.cache_dir / f"{key}.bin").unlink(missing_ok=True)
+            (self.cache_dir / f"{key}.json").unlink(missing_ok=True)
+            total -= size
+
+__all__ = ["CachedFile", "TelegramFileCache"]
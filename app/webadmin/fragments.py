@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from jinja2.parser import Parser
+from markupsafe import Markup
+
+FRAGMENT_CACHE_SIZE = 512
+
+
+class FragmentCache:
+    """Bounded LRU of rendered template fragments."""
+
+    def __init__(self, max_entries: int = FRAGMENT_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, Markup] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key: Hashable, render: Callable[[], Markup]) -> Markup:
+        entries = self._entries
+        value = entries.get(key)
+        if value is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = entries[key] = render()
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache "name", key... %}...{% endcache %}`` renders the body once per key.
+
+    Everything the body depends on must be part of the key: the selected
+    option of a dropdown, or a data version such as ``catalog_version`` for
+    fragments built from rarely-changing data. The template name is added
+    automatically.
+    """
+
+    tags = {"cache"}
+
+    def parse(self, parser: Parser) -> nodes.Node:
+        lineno = next(parser.stream).lineno
+        key = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_render", [nodes.Tuple(key, "load")]), [], [], body).set_lineno(lineno)
+
+    def _render(self, key: tuple[Any, ...], caller: Callable[[], str]) -> Markup:
+        return fragment_cache.get_or_render(key, lambda: Markup(caller()))
+
+
+__all__ = ["FRAGMENT_CACHE_SIZE", "FragmentCache", "FragmentCacheExtension", "fragment_cache"]
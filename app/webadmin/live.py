@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Callable
+
+from ..db import latest_event_id, list_events_after, prune_events
+
+log = logging.getLogger(__name__)
+
+BATCH_LIMIT = 500
+HEARTBEAT_SECONDS = 15.0
+PRUNE_EVERY_SECONDS = 300.0
+SUBSCRIBER_BACKLOG = 64
+# sentinel telling a client it fell too far behind and should reload the page
+RELOAD = "reload"
+
+_STATUS_COUNTERS = {
+    "AWAITING_PAYMENT": "awaiting_payment",
+    "PENDING_CONFIRM": "pending_confirm",
+    "APPROVED": "in_queue",
+    "IN_PROGRESS": "in_queue",
+    "READY_TO_DELIVER": "in_queue",
+    "DELIVERED": "delivered",
+    "COMPLETED": "delivered",
+}
+_REVENUE_STATUSES = {"APPROVED", "IN_PROGRESS", "READY_TO_DELIVER", "DELIVERED", "COMPLETED"}
+
+
+def _amount(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def dashboard_deltas(event: dict[str, Any]) -> dict[str, int]:
+    """How one feed event moves the dashboard cards (see ``get_dashboard_snapshot``)."""
+
+    kind = event["kind"]
+    deltas: dict[str, int] = {}
+
+    def add(name: str | None, value: int) -> None:
+        if name and value:
+            deltas[name] = deltas.get(name, 0) + value
+
+    if kind == "order.created":
+        add("orders_total", 1)
+        add(_STATUS_COUNTERS.get(event["status"]), 1)
+    elif kind == "order.status":
+        add(_STATUS_COUNTERS.get(event["old_status"]), -1)
+        add(_STATUS_COUNTERS.get(event["status"]), 1)
+        was, now = event["old_status"] in _REVENUE_STATUSES, event["status"] in _REVENUE_STATUSES
+        if was != now:
+            add("revenue_total", _amount(event["amount_total"]) * (1 if now else -1))
+    elif kind == "message.created":
+        add("messages_total", 1)
+    elif kind == "user.created":
+        add("users_total", 1)
+    elif kind == "wallet.balance":
+        add("wallet_balance", _amount(event["amount"]))
+    return deltas
+
+
+def _sse(event_id: int | None, data: str, event: str | None = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+class EventFeed:
+    """Tails the ``events`` table once per interval and fans new rows out to every open stream.
+
+    The tail task runs only while at least one admin tab is connected, so the
+    cost is one indexed query per interval however many tabs are open.
+    """
+
+    def __init__(self, serialize: Callable[[dict[str, Any]], dict[str, Any]], interval: float, keep: int) -> None:
+        self.serialize = serialize
+        self.interval = interval
+        self.keep = keep
+        self.last_id = 0
+        self._subscribers: set[asyncio.Queue[list[tuple[int, str]] | str]] = set()
+        self._task: asyncio.Task | None = None
+        self._pruned_at = 0.0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def _encode(self, rows: list[dict[str, Any]]) -> list[tuple[int, str]]:
+        return [(row["id"], _sse(row["id"], json.dumps(self.serialize(row), ensure_ascii=False))) for row in rows]
+
+    def _publish(self, messages: list[tuple[int, str]]) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(messages)
+            except asyncio.QueueFull:
+                # a stalled tab; drop its backlog and make it reload once it catches up
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RELOAD)
+                self._subscribers.discard(queue)
+
+    def _maybe_prune(self) -> None:
+        now = time.monotonic()
+        if now - self._pruned_at >= PRUNE_EVERY_SECONDS:
+            self._pruned_at = now
+            removed = prune_events(self.keep)
+            if removed:
+                log.debug("pruned %s feed events", removed)
+
+    async def _run(self) -> None:
+        while self._subscribers:
+            try:
+                self._maybe_prune()
+                rows = list_events_after(self.last_id, BATCH_LIMIT)
+                if rows:
+                    self.last_id = rows[-1]["id"]
+                    self._publish(self._encode(rows))
+            except Exception:
+                log.exception("event feed tail failed")
+            await asyncio.sleep(self.interval)
+        self._task = None
+
+    def _subscribe(self) -> asyncio.Queue[list[tuple[int, str]] | str]:
+        if self._task is None:
+            self.last_id = latest_event_id()
+            self._task = asyncio.create_task(self._run(), name="admin-event-feed")
+        queue: asyncio.Queue[list[tuple[int, str]] | str] = asyncio.Queue(SUBSCRIBER_BACKLOG)
+        self._subscribers.add(queue)
+        return queue
+
+    async def stream(self, since: int | None) -> AsyncIterator[str]:
+        """SSE body for one tab. ``since`` (the page's event id or ``Last-Event-ID``) replays what it missed."""
+
+        queue = self._subscribe()
+        # everything after this cursor arrives through the queue
+        cursor = self.last_id
+        seen = cursor if since is None else since
+        try:
+            yield f"retry: {int(self.interval * 1000) * 3}\n\n"
+            if seen < cursor:
+                missed = [row for row in list_events_after(seen, BATCH_LIMIT) if row["id"] <= cursor]
+                if len(missed) >= BATCH_LIMIT:
+                    yield _sse(None, "{}", RELOAD)
+                    return
+                for _, message in self._encode(missed):
+                    yield message
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if item == RELOAD:
+                    yield _sse(None, "{}", RELOAD)
+                    return
+                for event_id, message in item:
+                    if event_id > seen:
+                        yield message
+        finally:
+            self._subscribers.discard(queue)
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        self._subscribers.clear()
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+__all__ = ["EventFeed", "dashboard_deltas"]
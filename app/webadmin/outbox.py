@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+
+from ..db import claim_outbox, complete_outbox, fail_outbox
+from ..metrics import OUTBOX_DELIVERIES_TOTAL
+
+log = logging.getLogger(__name__)
+
+# a claimed message not reported back within this long is sent again
+LEASE_SECONDS = 120
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 900
+# the user blocked the bot, deleted the chat, or the message itself is invalid: retrying cannot help
+PERMANENT_ERRORS = (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound)
+
+
+def encode_markup(markup: InlineKeyboardMarkup | None) -> str | None:
+    return markup.model_dump_json(exclude_none=True) if markup is not None else None
+
+
+class OutboxWorker:
+    """Sends queued ``outbox`` messages with retries, so admin actions never wait on Telegram.
+
+    Claiming is a ``BEGIN IMMEDIATE`` transaction, so several admin workers
+    can drain the same table without sending a message twice (short of a
+    crash between sending and recording it).
+    """
+
+    def __init__(self, bot: Bot, *, poll_interval: float, max_attempts: int, concurrency: int) -> None:
+        self.bot = bot
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="admin-outbox")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _run(self) -> None:
+        while True:
+            # cleared before claiming, so a message queued meanwhile still wakes the wait below
+            self._wake.clear()
+            try:
+                batch = claim_outbox(self.concurrency, LEASE_SECONDS)
+            except Exception:
+                log.exception("outbox claim failed")
+                batch = []
+            if batch:
+                results = await asyncio.gather(*(self._deliver(row) for row in batch), return_exceptions=True)
+                for row, result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        # left SENDING; the lease brings it back
+                        log.error("outbox message %s: %r", row["id"], result)
+                continue
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+
+    async def _deliver(self, row: dict[str, Any]) -> None:
+        kind = row["kind"]
+        markup = InlineKeyboardMarkup.model_validate_json(row["reply_markup"]) if row["reply_markup"] else None
+        try:
+            await self.bot.send_message(row["user_id"], row["text"], reply_markup=markup)
+        except TelegramRetryAfter as exc:
+            if row["attempts"] >= self.max_attempts:
+                OUTBOX_DELIVERIES_TOTAL.inc(kind, "failed")
+                fail_outbox(row["id"], str(exc))
+            else:
+                self._retry(row, str(exc), exc.retry_after)
+        except PERMANENT_ERRORS as exc:
+            OUTBOX_DELIVERIES_TOTAL.inc(kind, "failed")
+            fail_outbox(row["id"], str(exc))
+        except Exception as exc:
+            if row["attempts"] >= self.max_attempts:
+                OUTBOX_DELIVERIES_TOTAL.inc(kind, "failed")
+                fail_outbox(row["id"], str(exc) or type(exc).__name__)
+            else:
+                delay = min(BACKOFF_BASE_SECONDS * 2 ** (row["attempts"] - 1), BACKOFF_MAX_SECONDS)
+                self._retry(row, str(exc) or type(exc).__name__, delay)
+        else:
+            OUTBOX_DELIVERIES_TOTAL.inc(kind, "sent")
+            complete_outbox(row["id"])
+
+    def _retry(self, row: dict[str, Any], error: str, delay: float) -> None:
+        OUTBOX_DELIVERIES_TOTAL.inc(row["kind"], "retry")
+        fail_outbox(row["id"], error, datetime.now() + timedelta(seconds=delay))
+
+
+__all__ = ["OutboxWorker", "encode_markup"]
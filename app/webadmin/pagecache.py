@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request
+from starlette.responses import Response
+
+from ..config import ADMIN_DEBUG_FOOTER
+from ..db import change_versions
+from ..metrics import ADMIN_PAGE_CACHE_TOTAL
+
+PAGE_CACHE_SIZE = 256
+_APP_DIR = Path(__file__).resolve().parents[1]
+_RELEASE_SUFFIXES = {".py", ".html", ".css", ".js"}
+
+
+def _release_salt() -> str:
+    """Hash of the code, templates and static files; same in every uvicorn worker."""
+
+    digest = hashlib.blake2b(digest_size=4)
+    for path in sorted(_APP_DIR.rglob("*")):
+        if path.suffix in _RELEASE_SUFFIXES and "__pycache__" not in path.parts:
+            stat = path.stat()
+            digest.update(f"{path.relative_to(_APP_DIR)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# a deploy or template edit must not match ETags handed out by the old code, but
+# the workers of one release must agree, or a 304 depends on which one answers
+_RELEASE = _release_salt()
+
+_pages: OrderedDict[str, tuple[bytes, str | None]] = OrderedDict()
+
+
+def _etag_for(request: Request, name: str, groups: tuple[str, ...], ttl: float | None) -> tuple[str, float]:
+    versions, changed_at = change_versions()
+    parts = [
+        _RELEASE,
+        name,
+        request.url.path,
+        str(sorted(request.query_params.multi_items())),
+        request.session.get("auth_user", ""),
+        request.session.get("theme", "light"),
+        *(f"{group}={versions.get(group, 0)}" for group in groups),
+    ]
+    if ttl:
+        # pages with "last N days" figures go stale with time alone
+        parts.append(str(int(time.time() // ttl)))
+    digest = hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=12).hexdigest()
+    last_modified = max((changed_at.get(group, 0.0) for group in groups), default=0.0)
+    return f'W/"{digest}"', last_modified
+
+
+def cached_page(*groups: str, ttl: float | None = None) -> Callable:
+    """Serve a GET page from cache while the ``change_counters`` groups it reads are unchanged.
+
+    The ETag is built from the route, query, session theme and user, and the
+    group versions, so it is known before anything is queried or rendered. A
+    matching ``If-None-Match`` gets a bare 304, and a known ETag gets the
+    stored HTML. Only a real change re-runs the endpoint. Requests with
+    pending flash messages are never cached, because rendering consumes them.
+    """
+
+    def decorate(endpoint: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        name = endpoint.__name__
+
+        @functools.wraps(endpoint)
+        async def wrapper(**kwargs: Any) -> Any:
+            request: Request = kwargs["request"]
+            if request.session.get("messages") or ADMIN_DEBUG_FOOTER:
+                ADMIN_PAGE_CACHE_TOTAL.inc(name, "bypass")
+                return await endpoint(**kwargs)
+            etag, last_modified = _etag_for(request, name, groups, ttl)
+            headers = {
+                "ETag": etag,
+                "Cache-Control": "private, no-cache",
+                "Last-Modified": formatdate(last_modified, usegmt=True),
+            }
+            if etag in request.headers.get("if-none-match", ""):
+                ADMIN_PAGE_CACHE_TOTAL.inc(name, "304")
+                return Response(status_code=304, headers=headers)
+            cached = _pages.get(etag)
+            if cached is not None:
+                _pages.move_to_end(etag)
+                ADMIN_PAGE_CACHE_TOTAL.inc(name, "hit")
+                body, media_type = cached
+                return Response(body, media_type=media_type, headers=headers)
+            ADMIN_PAGE_CACHE_TOTAL.inc(name, "miss")
+            response = await endpoint(**kwargs)
+            if response.status_code == 200 and isinstance(getattr(response, "body", None), bytes):
+                _pages[etag] = (response.body, response.media_type)
+                if len(_pages) > PAGE_CACHE_SIZE:
+                    _pages.popitem(last=False)
+                response.headers.update(headers)
+            return response
+
+        return wrapper
+
+    return decorate
+
+
+def clear_page_cache() -> None:
+    _pages.clear()
+
+
+__all__ = ["PAGE_CACHE_SIZE", "cached_page", "clear_page_cache"]
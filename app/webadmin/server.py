@@ -1,40 +1,78 @@
 from __future__ import annotations
 
+import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator
 from urllib.parse import quote
 
 import httpx
 import secrets
 import sqlite3
 import string
-from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
 from fastapi import Depends, FastAPI, Form, HTTPException, Query, Request, status
-from fastapi.responses import RedirectResponse, StreamingResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from starlette.middleware.sessions import SessionMiddleware
 
-from ..catalog import list_admin_rows, list_discount_products, set_variant_settings
-from ..config import ADMIN_WEB_PASS, ADMIN_WEB_SECRET, ADMIN_WEB_USER, BOT_TOKEN, CURRENCY
+from .. import blobstore
+from ..metrics import ADMIN_HTTP_QUERIES, ADMIN_HTTP_SECONDS, CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from ..querylog import current_query_log, track_queries
+from ..profiler import ProfilerBusy, current_profile, list_profiles, parse_target, profile_path, start_profile, stop_profile
+from ..watchdog import monitor as loop_monitor
+from ..catalog import catalog_version, list_admin_rows, list_discount_products, set_variant_settings
+from ..config import (
+    ADMIN_COMPRESS_MIN_BYTES,
+    ADMIN_DB_POOL_SIZE,
+    ADMIN_FILE_CACHE_DIR,
+    ADMIN_DEBUG_FOOTER,
+    ADMIN_FILE_CACHE_MAX_MB,
+    ADMIN_LIVE_INTERVAL_MS,
+    ADMIN_LIVE_KEEP_EVENTS,
+    ADMIN_METRICS_TOKEN,
+    ADMIN_OUTBOX_MAX_ATTEMPTS,
+    ADMIN_OUTBOX_POLL_MS,
+    ADMIN_TEMPLATE_CACHE_DIR,
+    ADMIN_WEB_PASS,
+    ADMIN_WEB_SECRET,
+    ADMIN_WEB_USER,
+    ADMIN_WEB_WORKERS,
+    BOT_TOKEN,
+    CURRENCY,
+    TELEGRAM_API_BASE,
+    create_bot,
+)
 from ..db import (
     ORDER_STATUS_LABELS,
+    OUTBOX_STATUS_LABELS,
     PAYMENT_TYPE_LABELS,
     change_wallet,
+    close_pool,
     count_orders,
     count_users,
+    enqueue_outbox,
+    enqueue_outbox_many,
     get_dashboard_snapshot,
     get_order,
     get_user,
     get_user_stats,
     get_wallet_summary,
     init_db,
+    iter_orders_export,
+    iter_users_export,
+    iter_wallet_tx_export,
+    latest_event_id,
     list_orders,
+    list_outbox,
     list_recent_orders,
     list_recent_users,
     list_recent_wallet_tx,
     list_users,
+    open_pool,
     list_wallet_tx_for_order,
     list_wallet_tx_for_user,
     list_service_messages,
@@ -44,10 +82,8 @@ from ..db import (
     add_service_message_reply,
     set_service_message_status,
     set_order_payment_type,
-    set_order_status,
-    set_order_deadline,
-    set_order_wallet_reserved,
-    set_order_wallet_used,
+    transition_order,
+    transition_orders,
     update_order_notes,
     set_user_blocked,
     add_order_manager_message,
@@ -61,6 +97,8 @@ from ..db import (
     list_discount_codes,
     list_discount_redemptions,
     list_coupon_redemptions,
+    list_blob_thumbs,
+    retry_outbox,
     set_coupon_active,
     set_discount_active,
     list_order_manager_messages,
@@ -70,10 +108,19 @@ from ..db import (
     update_discount_code,
 )
 from ..keyboards import ik_cart_actions
+from .api import build_api_router
+from .assets import CompressionMiddleware, HashedStaticFiles, static_url_global
+from .export import EXPORT_FORMATS, encode_export
+from .fragments import FragmentCacheExtension
+from .live import EventFeed, dashboard_deltas
+from .outbox import OutboxWorker, encode_markup
+from .pagecache import cached_page
+from .files import TelegramFileCache
 
 BASE_DIR = Path(__file__).resolve().parent
 TEMPLATES_DIR = BASE_DIR / "templates"
 STATIC_DIR = BASE_DIR / "static"
+static_files = HashedStaticFiles(directory=STATIC_DIR)
 
 ORDER_STATUS_CHOICES = list(ORDER_STATUS_LABELS.items())
 PAYMENT_TYPE_CHOICES = [("", "—")] + list(PAYMENT_TYPE_LABELS.items())
@@ -84,9 +131,12 @@ SERVICE_MESSAGE_LABELS = {
     "TG_READY_COUNTRY": "اکانت تلگرام (کشور دلخواه)",
 }
 
-
-bot = Bot(BOT_TOKEN, parse_mode="HTML")
-TELEGRAM_API_BASE = "https://api.telegram.org"
+BULK_ORDER_ACTIONS = {
+    "approve": "IN_PROGRESS",
+    "reject": "REJECTED",
+    "complete": "COMPLETED",
+}
+NOTIFY_CONCURRENCY = 10
 
 
 def _format_amount(value: Any) -> str:
@@ -108,11 +158,52 @@ def _format_datetime(value: Any) -> str:
         return str(value)
 
 
+def _live_payload(event: dict[str, Any]) -> dict[str, Any]:
+    payload: dict[str, Any] = {
+        "kind": event["kind"],
+        "ref_id": event["ref_id"],
+        "status": event["status"],
+        "deltas": dashboard_deltas(event),
+    }
+    if event["kind"].startswith("order."):
+        payload["status_label"] = ORDER_STATUS_LABELS.get(event["status"], event["status"])
+        payload["order"] = {
+            "id": event["ref_id"],
+            "customer": event["username"] or event["first_name"] or "—",
+            "first_name": event["first_name"] or "—",
+            "username": event["username"] or "—",
+            "product": event["plan_title"] or event["service_code"] or "—",
+            "email": event["customer_email"] or "بدون ایمیل",
+            "amount": _format_amount(event["amount_total"] or event["price"]),
+            "created_at": _format_datetime(event["order_created_at"]),
+            "updated_at": _format_datetime(event["order_updated_at"] or event["order_created_at"]),
+        }
+    return payload
+
+
+
+def _page_window(page: int, pages: int, radius: int = 3) -> list[int | None]:
+    """Page links around ``page`` plus the first and last; ``None`` marks a gap."""
+
+    shown = sorted({1, pages, *range(max(page - radius, 1), min(page + radius, pages) + 1)})
+    window: list[int | None] = []
+    for p in shown:
+        if window and p - window[-1] > 1:
+            window.append(None)
+        window.append(p)
+    return window
+
+
 def _generate_coupon_code(length: int = 8) -> str:
     alphabet = string.ascii_uppercase + string.digits
     return "".join(secrets.choice(alphabet) for _ in range(max(4, length)))
 
 
+def _local_path(value: str) -> bool:
+    # browsers treat "//host" and "/\host" as links to another site
+    return value.startswith("/") and value[1:2] not in ("/", "\\")
+
+
 def _flash(request: Request, text: str, category: str = "success") -> None:
     messages = request.session.get("messages") or []
     messages.append({"text": text, "category": category})
@@ -129,59 +220,91 @@ def _render(request: Request, template_name: str, context: dict[str, Any] | None
         "payment_type_labels": PAYMENT_TYPE_LABELS,
         "theme": request.session.get("theme", "light"),
         "service_message_labels": SERVICE_MESSAGE_LABELS,
+        "outbox_status_labels": OUTBOX_STATUS_LABELS,
+        "query_log": current_query_log() if ADMIN_DEBUG_FOOTER else None,
     }
     if context:
         ctx.update(context)
     return templates.TemplateResponse(template_name, ctx)
 
 
-async def _notify_user(user_id: int, text: str) -> None:
-    try:
-        await bot.send_message(user_id, text)
-    except Exception:
-        pass
-
-
-async def _telegram_file_response(file_id: str) -> StreamingResponse:
+def _queue_message(
+    request: Request,
+    kind: str,
+    user_id: int,
+    text: str,
+    *,
+    order_id: int | None = None,
+    reply_markup: InlineKeyboardMarkup | None = None,
+) -> None:
+    # sent by the outbox worker after the redirect; status shows on the order / user page
+    enqueue_outbox(kind, user_id, text, order_id=order_id, reply_markup=encode_markup(reply_markup))
+    request.app.state.outbox.wake()
+
+
+def _queue_messages(request: Request, kind: str, messages: list[tuple[int, int | None, str]]) -> None:
+    if enqueue_outbox_many(kind, messages):
+        request.app.state.outbox.wake()
+
+
+def _order_status_message(order: dict[str, Any], new_status: str, *, refund_total: int = 0) -> str:
+    order_id = order.get("id")
+    order_title = order.get("plan_title") or order.get("service_code") or f"سفارش #{order_id}"
+    if new_status == "REJECTED":
+        return (
+            f"❌ سفارش «{order_title}» (#{order_id}) رد شد و مبلغ {refund_total} تومان به کیف پول شما واریز شد.\n"
+            "لطفاً در صورت نیاز با پشتیبانی تماس بگیرید."
+        )
+    if new_status == "IN_PROGRESS":
+        return f"✅ پرداخت سفارش «{order_title}» (#{order_id}) تایید شد و در حال انجام است."
+    if new_status == "COMPLETED":
+        manager_note_text = (order.get("manager_note") or "").strip()
+        message = f"🎉 سفارش «{order_title}» (#{order_id}) تکمیل شد."
+        if manager_note_text:
+            message += f"\n\nپیام مدیر:\n{manager_note_text}"
+        return message
+    label = ORDER_STATUS_LABELS.get(new_status, new_status)
+    return f"📦 وضعیت سفارش «{order_title}» (#{order_id}) به «{label}» تغییر کرد."
+
+
+def _plan_approved_message(order: dict[str, Any]) -> str:
+    product_title = order.get("plan_title") or order.get("service_code") or f"سفارش #{order.get('id')}"
+    return (
+        f"✅ طرح خرید اول سفارش شما تایید شد و در حال انجام می‌باشد.\n"
+        f"سفارش #{order.get('id')} - {product_title}"
+    )
+
+
+async def _telegram_file_response(request: Request, file_id: str) -> Response:
     if not file_id:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="فایل یافت نشد")
+    blob = blobstore.lookup(file_id)
+    if blob is not None:
+        return _local_file_response(request, blob.path, blob.media_type, blob.filename, f'"{blob.sha256[:32]}"')
     try:
-        async with httpx.AsyncClient() as client:
-            meta = await client.get(
-                f"{TELEGRAM_API_BASE}/bot{BOT_TOKEN}/getFile",
-                params={"file_id": file_id},
-                timeout=10.0,
-            )
-            if meta.status_code != 200:
-                raise HTTPException(status.HTTP_404_NOT_FOUND, detail="فایل در تلگرام یافت نشد")
-            data = meta.json().get("result") or {}
-            file_path = data.get("file_path")
-            if not file_path:
-                raise HTTPException(status.HTTP_404_NOT_FOUND, detail="مسیر فایل یافت نشد")
-            file_url = f"{TELEGRAM_API_BASE}/file/bot{BOT_TOKEN}/{file_path}"
-            stream = await client.get(file_url, timeout=30.0, stream=True)
-            if stream.status_code != 200:
-                raise HTTPException(status.HTTP_404_NOT_FOUND, detail="دانلود فایل ممکن نشد")
-
-            filename = Path(file_path).name
-
-            async def iterator():
-                async with stream:
-                    async for chunk in stream.aiter_bytes():
-                        yield chunk
-
-            return StreamingResponse(
-                iterator(),
-                media_type=stream.headers.get("content-type", "application/octet-stream"),
-                headers={"Content-Disposition": f"inline; filename={filename}"},
-            )
-    except HTTPException:
-        raise
+        cached = await request.app.state.file_cache.get(file_id)
+    except FileNotFoundError as exc:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="فایل در تلگرام یافت نشد") from exc
     except httpx.HTTPError as exc:
         raise HTTPException(status.HTTP_502_BAD_GATEWAY, detail="خطا در ارتباط با تلگرام") from exc
     except Exception as exc:  # pragma: no cover - safety net
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail="دانلود فایل با خطا مواجه شد") from exc
 
+    return _local_file_response(request, cached.path, cached.media_type, cached.filename, cached.etag)
+
+
+def _local_file_response(request: Request, path: Path, media_type: str, filename: str, etag: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=filename,
+        content_disposition_type="inline",
+        headers=headers,
+    )
+
 
 def _login_required(request: Request) -> str:
     user = request.session.get("auth_user")
@@ -197,18 +320,71 @@ def _login_required(request: Request) -> str:
     raise HTTPException(status.HTTP_303_SEE_OTHER, headers={"Location": location})
 
 
-def create_admin_app() -> FastAPI:
-    app = FastAPI(title="Premium Bot Admin", docs_url=None, redoc_url=None)
-    app.add_middleware(SessionMiddleware, secret_key=ADMIN_WEB_SECRET, same_site="lax")
-    app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:  # pragma: no cover - io side effect
+    # everything with a socket or a file handle is created here, once per worker process,
+    # so the app can be preforked (uvicorn --workers, gunicorn)
+    init_db()
+    open_pool(ADMIN_DB_POOL_SIZE)
+    bot = create_bot()
+    file_cache = TelegramFileCache(
+        BOT_TOKEN,
+        api_base=TELEGRAM_API_BASE,
+        cache_dir=ADMIN_FILE_CACHE_DIR,
+        max_bytes=ADMIN_FILE_CACHE_MAX_MB * 1024 * 1024,
+    )
+    outbox = OutboxWorker(
+        bot,
+        poll_interval=ADMIN_OUTBOX_POLL_MS / 1000,
+        max_attempts=ADMIN_OUTBOX_MAX_ATTEMPTS,
+        concurrency=NOTIFY_CONCURRENCY,
+    )
+    live_feed = EventFeed(_live_payload, ADMIN_LIVE_INTERVAL_MS / 1000, ADMIN_LIVE_KEEP_EVENTS)
+    app.state.file_cache = file_cache
+    app.state.outbox = outbox
+    app.state.live_feed = live_feed
+    await file_cache.start()
+    loop_monitor.start()
+    outbox.start()
+    try:
+        yield
+    finally:
+        await loop_monitor.stop()
+        await live_feed.stop()
+        await outbox.stop()
+        await bot.session.close()
+        await file_cache.close()
+        close_pool()
 
-    @app.on_event("startup")
-    async def _startup() -> None:  # pragma: no cover - io side effect
-        init_db()
 
-    @app.on_event("shutdown")
-    async def _shutdown() -> None:  # pragma: no cover - io side effect
-        await bot.session.close()
+def create_admin_app() -> FastAPI:
+    app = FastAPI(title="Premium Bot Admin", docs_url=None, redoc_url=None, lifespan=_lifespan)
+    app.add_middleware(SessionMiddleware, secret_key=ADMIN_WEB_SECRET, same_site="lax")
+    app.add_middleware(CompressionMiddleware, minimum_size=ADMIN_COMPRESS_MIN_BYTES)
+    app.mount("/static", static_files, name="static")
+    app.include_router(build_api_router())
+
+    @app.middleware("http")
+    async def _request_metrics(request: Request, call_next):
+        start = time.perf_counter()
+        status_code = 500
+        with track_queries() as log:
+            try:
+                response = await call_next(request)
+                status_code = response.status_code
+                response.headers["X-Query-Count"] = str(log.count)
+                return response
+            finally:
+                # label by route template, not the concrete path, to keep cardinality bounded
+                route = request.scope.get("route")
+                path = getattr(route, "path", None)
+                if path is None:
+                    path = "/static" if request.url.path.startswith("/static/") else "unmatched"
+                ADMIN_HTTP_SECONDS.observe(time.perf_counter() - start, request.method, path, str(status_code))
+                ADMIN_HTTP_QUERIES.observe(log.count, path)
+                profile = current_profile()
+                if profile is not None and route is not None:
+                    profile.exit(None, getattr(route.endpoint, "__name__", "?"), None)
 
     @app.get("/", include_in_schema=False)
     async def index(request: Request):
@@ -258,7 +434,27 @@ def create_admin_app() -> FastAPI:
         target = referer or request.url_for("dashboard")
         return RedirectResponse(target, status.HTTP_303_SEE_OTHER)
 
+    def _metrics_auth(request: Request) -> None:
+        auth = request.headers.get("authorization", "")
+        token_ok = bool(ADMIN_METRICS_TOKEN) and secrets.compare_digest(auth, f"Bearer {ADMIN_METRICS_TOKEN}")
+        if not token_ok and not request.session.get("auth_user"):
+            raise HTTPException(status.HTTP_401_UNAUTHORIZED)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics(request: Request):
+        _metrics_auth(request)
+        if ADMIN_WEB_WORKERS > 1:
+            # counters are per process and a scrape reaches one worker; keep their series apart
+            return Response(REGISTRY.render(worker=str(os.getpid())), media_type=METRICS_CONTENT_TYPE)
+        return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+    @app.get("/stats/loop", include_in_schema=False)
+    async def loop_stats(request: Request):
+        _metrics_auth(request)
+        return JSONResponse(loop_monitor.stats())
+
     @app.get("/dashboard", name="dashboard")
+    @cached_page("orders", "users", "wallet", "messages", ttl=60)
     async def dashboard(request: Request, user: str = Depends(_login_required)):
         snapshot = get_dashboard_snapshot()
         snapshot["messages_total"] = count_service_messages()
@@ -274,13 +470,31 @@ def create_admin_app() -> FastAPI:
                 "recent_orders": recent_orders,
                 "recent_users": recent_users,
                 "recent_wallet": recent_wallet,
+                "live_since": latest_event_id(),
                 "format_amount": _format_amount,
                 "format_datetime": _format_datetime,
                 "nav": "dashboard",
             },
         )
 
+    @app.get("/events", name="live_events")
+    async def live_events(
+        request: Request,
+        since: int | None = Query(None, ge=0),
+        user: str = Depends(_login_required),
+    ):
+        # EventSource resends the last id it saw when it reconnects
+        last_event_id = request.headers.get("last-event-id", "")
+        if last_event_id.isdigit():
+            since = int(last_event_id)
+        return StreamingResponse(
+            request.app.state.live_feed.stream(since),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     @app.get("/orders")
+    @cached_page("orders", "users", "blobs")
     async def orders_page(
         request: Request,
         user: str = Depends(_login_required),
@@ -294,17 +508,20 @@ def create_admin_app() -> FastAPI:
         page = min(page, pages)
         offset = (page - 1) * per_page
         items = list_orders(status=status_filter, search=q or None, limit=per_page, offset=offset)
+        receipt_thumbs = list_blob_thumbs(o.get("receipt_file_id") for o in items)
         return _render(
             request,
             "orders.html",
             {
                 "title": "مدیریت سفارش‌ها",
                 "orders": items,
+                "receipt_thumbs": receipt_thumbs,
                 "total": total,
                 "page": page,
                 "pages": pages,
                 "status_filter": status_filter,
                 "query": q,
+                "live_since": latest_event_id(),
                 "format_amount": _format_amount,
                 "format_datetime": _format_datetime,
                 "nav": "orders",
@@ -312,6 +529,7 @@ def create_admin_app() -> FastAPI:
         )
 
     @app.get("/messages", name="messages")
+    @cached_page("messages", "users")
     async def messages_page(
         request: Request,
         user: str = Depends(_login_required),
@@ -342,6 +560,8 @@ def create_admin_app() -> FastAPI:
 
     @app.get("/products", name="products_page")
     async def products_page(request: Request, user: str = Depends(_login_required)):
+        # version first: a reload between the two must not cache old rows under the new key
+        version = catalog_version()
         rows = list_admin_rows()
         return _render(
             request,
@@ -349,6 +569,7 @@ def create_admin_app() -> FastAPI:
             {
                 "title": "مدیریت محصولات",
                 "products": rows,
+                "catalog_version": version,
                 "currency": CURRENCY,
                 "nav": "products",
             },
@@ -368,6 +589,7 @@ def create_admin_app() -> FastAPI:
         return RedirectResponse(request.url_for("products_page"), status.HTTP_303_SEE_OTHER)
 
     @app.get("/orders/{order_id}")
+    @cached_page("orders", "order_details", "users", "wallet", "outbox")
     async def order_detail(request: Request, order_id: int, user: str = Depends(_login_required)):
         order = get_order(order_id)
         if not order:
@@ -391,6 +613,7 @@ def create_admin_app() -> FastAPI:
                 "wallet_history": wallet_history,
                 "related_orders": related_orders,
                 "manager_messages": manager_messages,
+                "deliveries": list_outbox(order_id=order_id),
                 "order_title": order_title,
                 "format_amount": _format_amount,
                 "format_datetime": _format_datetime,
@@ -399,20 +622,31 @@ def create_admin_app() -> FastAPI:
         )
 
     @app.get("/orders/{order_id}/receipt")
-    async def order_receipt(order_id: int, user: str = Depends(_login_required)):
+    async def order_receipt(request: Request, order_id: int, user: str = Depends(_login_required)):
         order = get_order(order_id)
         if not order or not order.get("receipt_file_id"):
             raise HTTPException(status.HTTP_404_NOT_FOUND, detail="رسید برای این سفارش وجود ندارد")
-        return await _telegram_file_response(order["receipt_file_id"])
+        return await _telegram_file_response(request, order["receipt_file_id"])
+
+    @app.get("/orders/{order_id}/receipt/thumb")
+    async def order_receipt_thumb(request: Request, order_id: int, user: str = Depends(_login_required)):
+        order = get_order(order_id)
+        blob = blobstore.lookup(order.get("receipt_file_id")) if order else None
+        if blob is None or blob.thumb_path is None or not blob.thumb_path.exists():
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="پیش‌نمایش رسید وجود ندارد")
+        return _local_file_response(
+            request, blob.thumb_path, "image/jpeg", f"{order_id}-thumb.jpg", f'"t-{blob.sha256[:32]}"'
+        )
 
     @app.get("/messages/{message_id}/attachment")
-    async def message_attachment(message_id: int, user: str = Depends(_login_required)):
+    async def message_attachment(request: Request, message_id: int, user: str = Depends(_login_required)):
         message = get_service_message(message_id)
         if not message or not message.get("attachment_file_id"):
             raise HTTPException(status.HTTP_404_NOT_FOUND, detail="پیوست یافت نشد")
-        return await _telegram_file_response(message["attachment_file_id"])
+        return await _telegram_file_response(request, message["attachment_file_id"])
 
     @app.get("/messages/{message_id}")
+    @cached_page("messages", "users")
     async def message_detail(
         request: Request,
         message_id: int,
@@ -456,11 +690,13 @@ def create_admin_app() -> FastAPI:
         user_id = message.get("user_id")
         if user_id:
             category_label = SERVICE_MESSAGE_LABELS.get(message.get("category"), message.get("category"))
-            await _notify_user(
+            _queue_message(
+                request,
+                "message_reply",
                 user_id,
                 f"📨 پاسخ مدیریت درباره درخواست «{category_label}»:\n\n{text}",
             )
-        _flash(request, "پاسخ برای مشتری ارسال شد.")
+        _flash(request, "پاسخ ثبت شد و در صف ارسال به مشتری قرار گرفت.")
         return RedirectResponse(request.url_for("message_detail", message_id=message_id), status.HTTP_303_SEE_OTHER)
 
     @app.post("/messages/{message_id}/status")
@@ -479,6 +715,43 @@ def create_admin_app() -> FastAPI:
         _flash(request, f"وضعیت پیام به «{label}» تغییر کرد.")
         return RedirectResponse(request.url_for("message_detail", message_id=message_id), status.HTTP_303_SEE_OTHER)
 
+    @app.post("/orders/bulk")
+    async def orders_bulk(
+        request: Request,
+        user: str = Depends(_login_required),
+        bulk_action: str = Form(...),
+        order_ids: list[int] = Form([]),
+        next: str = Form(""),
+    ):
+        target = next if _local_path(next) else str(request.url_for("orders_page"))
+        new_status = BULK_ORDER_ACTIONS.get((bulk_action or "").strip().lower())
+        if new_status is None:
+            _flash(request, "درخواست نامعتبر بود.", "error")
+            return RedirectResponse(target, status.HTTP_303_SEE_OTHER)
+        if not order_ids:
+            _flash(request, "هیچ سفارشی انتخاب نشده است.", "info")
+            return RedirectResponse(target, status.HTTP_303_SEE_OTHER)
+
+        changed = transition_orders(order_ids, new_status)
+        messages: list[tuple[int, int | None, str]] = []
+        for payload in changed:
+            if not payload["user_id"]:
+                continue
+            if new_status == "IN_PROGRESS" and payload["from_status"] == "PENDING_PLAN":
+                text = _plan_approved_message(payload["order"])
+            else:
+                text = _order_status_message(payload["order"], new_status, refund_total=payload["refund_total"])
+            messages.append((payload["user_id"], payload["order"]["id"], text))
+        _queue_messages(request, "order_status", messages)
+
+        skipped = len(set(order_ids)) - len(changed)
+        label = ORDER_STATUS_LABELS.get(new_status, new_status)
+        text = f"{len(changed)} سفارش به وضعیت «{label}» منتقل شد."
+        if skipped:
+            text += f" {skipped} سفارش بدون تغییر ماند."
+        _flash(request, text, "success" if changed else "info")
+        return RedirectResponse(target, status.HTTP_303_SEE_OTHER)
+
     @app.post("/orders/{order_id}/update")
     async def update_order(
         request: Request,
@@ -511,89 +784,34 @@ def create_admin_app() -> FastAPI:
             new_status = status_value
             if new_status in {"APPROVED", "PLAN_CONFIRMED"}:
                 new_status = "IN_PROGRESS"
-            if new_status not in ORDER_STATUS_LABELS:
-                raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="وضعیت نامعتبر است")
 
-            status_changed = original_status != new_status
-            if status_changed:
-                set_order_status(order_id, new_status)
+            if original_status == new_status:
+                _flash(request, "تغییری در وضعیت سفارش ایجاد نشد.", "info")
+                return RedirectResponse(request.url_for("order_detail", order_id=order_id), status.HTTP_303_SEE_OTHER)
 
-            if status_changed and new_status in {"IN_PROGRESS", "READY_TO_DELIVER", "DELIVERED", "COMPLETED"}:
-                reserved_amount = int(order.get("wallet_reserved_amount") or 0)
-                if reserved_amount > 0:
-                    used_amount = int(order.get("wallet_used_amount") or 0)
-                    set_order_wallet_reserved(order_id, 0)
-                    set_order_wallet_used(order_id, used_amount + reserved_amount)
+            payload = transition_order(
+                order_id,
+                new_status,
+                allowed_from={"PENDING_PLAN"} if plan_approval else None,
+            )
+            if payload is None:
+                current_label = ORDER_STATUS_LABELS.get(original_status, original_status)
+                target_label = ORDER_STATUS_LABELS.get(new_status, new_status)
+                _flash(request, f"انتقال از «{current_label}» به «{target_label}» مجاز نیست.", "error")
+                return RedirectResponse(request.url_for("order_detail", order_id=order_id), status.HTTP_303_SEE_OTHER)
 
-            updated = get_order(order_id)
-            if status_changed and updated and user_id:
+            if user_id:
                 if plan_approval:
-                    product_title = updated.get("plan_title") or updated.get("service_code") or order_title
-                    await _notify_user(
-                        user_id,
-                        (
-                            f"✅ طرح خرید اول سفارش شما تایید شد و در حال انجام می‌باشد.\n"
-                            f"سفارش #{order_id} - {product_title}"
-                        ),
+                    _queue_message(
+                        request, "plan_approved", user_id, _plan_approved_message(payload["order"]), order_id=order_id
                     )
-                elif new_status == "REJECTED":
-                    reserved_amount = int(updated.get("wallet_reserved_amount") or 0)
-                    used_amount = int(updated.get("wallet_used_amount") or 0)
-                    total_amount = int(updated.get("amount_total") or 0)
-                    card_part = max(total_amount - reserved_amount - used_amount, 0)
-                    refund_total = 0
-                    if reserved_amount > 0:
-                        change_wallet(
-                            user_id,
-                            reserved_amount,
-                            "REFUND",
-                            note=f"Order #{order_id} rejected",
-                            order_id=order_id,
-                        )
-                        set_order_wallet_reserved(order_id, 0)
-                        refund_total += reserved_amount
-                    if used_amount > 0:
-                        change_wallet(
-                            user_id,
-                            used_amount,
-                            "REFUND",
-                            note=f"Order #{order_id} rejected",
-                            order_id=order_id,
-                        )
-                        set_order_wallet_used(order_id, 0)
-                        refund_total += used_amount
-                    if card_part > 0:
-                        change_wallet(
-                            user_id,
-                            card_part,
-                            "CREDIT",
-                            note=f"Order #{order_id} card refund",
-                            order_id=order_id,
-                        )
-                        refund_total += card_part
-                    await _notify_user(
-                        user_id,
-                        (
-                            f"❌ سفارش «{order_title}» (#{order_id}) رد شد و مبلغ {refund_total} تومان به کیف پول شما واریز شد.\n"
-                            "لطفاً در صورت نیاز با پشتیبانی تماس بگیرید."
-                        ),
-                    )
-                elif new_status == "IN_PROGRESS":
-                    await _notify_user(
-                        user_id,
-                        f"✅ پرداخت سفارش «{order_title}» (#{order_id}) تایید شد و در حال انجام است.",
-                    )
-                elif new_status == "COMPLETED":
-                    manager_note_text = (updated.get("manager_note") or "").strip()
-                    message = f"🎉 سفارش «{order_title}» (#{order_id}) تکمیل شد."
-                    if manager_note_text:
-                        message += f"\n\nپیام مدیر:\n{manager_note_text}"
-                    await _notify_user(user_id, message)
                 else:
-                    label = ORDER_STATUS_LABELS.get(new_status, new_status)
-                    await _notify_user(
+                    _queue_message(
+                        request,
+                        "order_status",
                         user_id,
-                        f"📦 وضعیت سفارش «{order_title}» (#{order_id}) به «{label}» تغییر کرد.",
+                        _order_status_message(payload["order"], new_status, refund_total=payload["refund_total"]),
+                        order_id=order_id,
                     )
 
             _flash(request, "وضعیت سفارش به‌روزرسانی شد.")
@@ -607,31 +825,33 @@ def create_admin_app() -> FastAPI:
                 _flash(request, "تغییری در نوع پرداخت ایجاد نشد.", "info")
 
         elif action == "plan_confirm":
-            if order.get("status") != "PENDING_PLAN":
+            payload = transition_order(order_id, "IN_PROGRESS", allowed_from={"PENDING_PLAN"})
+            if payload is None:
                 _flash(request, "امکان تایید طرح وجود ندارد (وضعیت نامعتبر است).", "error")
             else:
-                set_order_status(order_id, "IN_PROGRESS")
-                updated = get_order(order_id)
                 if user_id:
-                    product_title = updated.get("plan_title") or updated.get("service_code") or order_title
-                    await _notify_user(
-                        user_id,
-                        (
-                            f"✅ طرح خرید اول سفارش شما تایید شد و در حال انجام می‌باشد.\n"
-                            f"سفارش #{order_id} - {product_title}"
-                        ),
+                    _queue_message(
+                        request, "plan_approved", user_id, _plan_approved_message(payload["order"]), order_id=order_id
                     )
                 _flash(request, "طرح خرید اول تایید و سفارش در حال انجام شد.")
 
         elif action == "first_plan_request":
-            if order.get("payment_type") != "FIRST_PLAN" or order.get("status") != "DELIVERED":
+            payload = None
+            if order.get("payment_type") == "FIRST_PLAN":
+                payload = transition_order(
+                    order_id,
+                    "AWAITING_PAYMENT",
+                    allowed_from={"DELIVERED"},
+                    updates={
+                        "payment_type": "FIRST_PLAN_BILLING",
+                        "await_deadline": datetime.now() + timedelta(minutes=30),
+                    },
+                )
+            if payload is None:
                 _flash(request, "ارسال درخواست پرداخت در این وضعیت امکان‌پذیر نیست.", "error")
             else:
-                set_order_status(order_id, "AWAITING_PAYMENT")
-                set_order_payment_type(order_id, "FIRST_PLAN_BILLING")
-                set_order_deadline(order_id, datetime.now() + timedelta(minutes=30))
-                updated = get_order(order_id)
-                _flash(request, "درخواست پرداخت برای مشتری ارسال شد.")
+                updated = payload["order"]
+                _flash(request, "درخواست پرداخت در صف ارسال به مشتری قرار گرفت.")
                 if updated and user_id:
                     amount_total = int(updated.get("amount_total") or 0)
                     subtotal = int(updated.get("amount_subtotal") or amount_total)
@@ -648,14 +868,14 @@ def create_admin_app() -> FastAPI:
                     else:
                         lines.append(f"مبلغ قابل پرداخت: {_format_amount(amount_total)} {CURRENCY}")
                     lines.append("روش پرداخت را انتخاب کنید:")
-                    try:
-                        await bot.send_message(
-                            user_id,
-                            "\n".join(lines),
-                            reply_markup=ik_cart_actions(order_id, enable_plan=False),
-                        )
-                    except Exception:
-                        pass
+                    _queue_message(
+                        request,
+                        "payment_request",
+                        user_id,
+                        "\n".join(lines),
+                        order_id=order_id,
+                        reply_markup=ik_cart_actions(order_id, enable_plan=False),
+                    )
 
         elif action == "manager_note":
             text = (manager_note or "").strip()
@@ -665,11 +885,14 @@ def create_admin_app() -> FastAPI:
                 update_order_notes(order_id, text)
                 add_order_manager_message(order_id, user_id, text)
                 if user_id:
-                    await _notify_user(
+                    _queue_message(
+                        request,
+                        "order_note",
                         user_id,
                         f"📬 پیام جدید درباره سفارش «{order_title}» (#{order_id}):\n\n{text}",
+                        order_id=order_id,
                     )
-                _flash(request, "پیام مدیر برای مشتری ارسال شد.")
+                _flash(request, "پیام مدیر ثبت شد و در صف ارسال به مشتری قرار گرفت.")
 
         elif action == "financial":
             try:
@@ -685,6 +908,7 @@ def create_admin_app() -> FastAPI:
         return RedirectResponse(request.url_for("order_detail", order_id=order_id), status.HTTP_303_SEE_OTHER)
 
     @app.get("/users")
+    @cached_page("users", "orders")
     async def users_page(
         request: Request,
         user: str = Depends(_login_required),
@@ -714,6 +938,7 @@ def create_admin_app() -> FastAPI:
         )
 
     @app.get("/users/{user_id}")
+    @cached_page("users", "orders", "wallet", "outbox")
     async def user_detail(request: Request, user_id: int, user: str = Depends(_login_required)):
         profile = get_user(user_id)
         if not profile:
@@ -747,6 +972,7 @@ def create_admin_app() -> FastAPI:
                 "orders": orders,
                 "wallet_history": wallet_history,
                 "manager_messages": manager_messages,
+                "deliveries": list_outbox(user_id=user_id),
                 "format_datetime": _format_datetime,
                 "format_amount": _format_amount,
                 "nav": "users",
@@ -786,7 +1012,9 @@ def create_admin_app() -> FastAPI:
             new_profile = get_user(user_id)
             balance = int(new_profile.get("wallet_balance") if new_profile else 0)
             sign = "+" if delta > 0 else "-"
-            await _notify_user(
+            _queue_message(
+                request,
+                "wallet",
                 user_id,
                 (
                     f"📢 موجودی کیف پول شما {sign}{abs(delta)} تومان تغییر کرد.\n"
@@ -811,8 +1039,8 @@ def create_admin_app() -> FastAPI:
             return RedirectResponse(request.url_for("user_detail", user_id=user_id), status.HTTP_303_SEE_OTHER)
 
         add_user_manager_message(user_id, text)
-        await _notify_user(user_id, f"📬 پیام مدیر\n\n{text}")
-        _flash(request, "پیام برای کاربر ارسال شد.")
+        _queue_message(request, "user_message", user_id, f"📬 پیام مدیر\n\n{text}")
+        _flash(request, "پیام ثبت شد و در صف ارسال به کاربر قرار گرفت.")
         return RedirectResponse(request.url_for("user_detail", user_id=user_id), status.HTTP_303_SEE_OTHER)
 
     @app.post("/users/{user_id}/block")
@@ -828,16 +1056,32 @@ def create_admin_app() -> FastAPI:
         if action == "block":
             set_user_blocked(user_id, True)
             _flash(request, "کاربر مسدود شد.")
-            await _notify_user(user_id, "⛔️ دسترسی شما به خدمات ربات توسط مدیریت مسدود شد.")
+            _queue_message(request, "block", user_id, "⛔️ دسترسی شما به خدمات ربات توسط مدیریت مسدود شد.")
         elif action == "unblock":
             set_user_blocked(user_id, False)
             _flash(request, "کاربر از حالت مسدود خارج شد.")
-            await _notify_user(user_id, "✅ دسترسی شما به خدمات ربات دوباره فعال شد.")
+            _queue_message(request, "block", user_id, "✅ دسترسی شما به خدمات ربات دوباره فعال شد.")
         else:
             _flash(request, "درخواست نامعتبر بود.", "error")
         return RedirectResponse(request.url_for("user_detail", user_id=user_id), status.HTTP_303_SEE_OTHER)
 
+    @app.post("/outbox/{outbox_id}/retry", name="outbox_retry")
+    async def outbox_retry(
+        request: Request,
+        outbox_id: int,
+        user: str = Depends(_login_required),
+        next: str = Form(""),
+    ):
+        if retry_outbox(outbox_id) is None:
+            _flash(request, "این پیام در وضعیت ناموفق نیست.", "info")
+        else:
+            request.app.state.outbox.wake()
+            _flash(request, "پیام دوباره در صف ارسال قرار گرفت.")
+        target = next if _local_path(next) else str(request.url_for("dashboard"))
+        return RedirectResponse(target, status.HTTP_303_SEE_OTHER)
+
     @app.get("/wallet")
+    @cached_page("wallet", "users")
     async def wallet_page(request: Request, user: str = Depends(_login_required)):
         summary = get_wallet_summary()
         recent = list_recent_wallet_tx(limit=50)
@@ -854,12 +1098,39 @@ def create_admin_app() -> FastAPI:
             },
         )
 
+    @app.get("/export/{dataset}", name="export_data")
+    async def export_data(
+        request: Request,
+        dataset: str,
+        user: str = Depends(_login_required),
+        fmt: str = Query("csv", alias="format"),
+        status_filter: str = Query("all", alias="status"),
+        q: str = Query("", alias="q"),
+        user_id: int | None = Query(None),
+    ):
+        if fmt not in EXPORT_FORMATS:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="قالب خروجی نامعتبر است")
+        if dataset == "orders":
+            chunks = iter_orders_export(status=status_filter, search=q or None, user_id=user_id)
+        elif dataset == "wallet_tx":
+            chunks = iter_wallet_tx_export(user_id=user_id)
+        elif dataset == "users":
+            chunks = iter_users_export(search=q or None)
+        else:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="خروجی یافت نشد")
+        filename = f"{dataset}-{datetime.now():%Y%m%d-%H%M%S}.{fmt}"
+        return StreamingResponse(
+            encode_export(chunks, fmt),
+            media_type=EXPORT_FORMATS[fmt],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
     @app.get("/discounts", name="discounts_page")
     async def discounts_page(request: Request, user: str = Depends(_login_required)):
         products = list_discount_products()
         product_lookup = {item["product_key"]: item for item in products}
         discounts = list_discount_codes(limit=400)
-        now_dt = datetime.now()
+        now_ts = time.time()
         for entry in discounts:
             try:
                 entry["amount"] = int(entry.get("amount") or 0)
@@ -873,18 +1144,9 @@ def create_admin_app() -> FastAPI:
                 entry["used_count"] = int(entry.get("used_count") or 0)
             except (TypeError, ValueError):
                 entry["used_count"] = 0
-            expires_at = entry.get("expires_at")
-            expires_value = ""
-            is_expired = False
-            if expires_at:
-                try:
-                    exp_dt = datetime.fromisoformat(str(expires_at))
-                    is_expired = exp_dt < now_dt
-                    expires_value = exp_dt.strftime("%Y-%m-%d")
-                except ValueError:
-                    expires_value = str(expires_at)[:10]
-            entry["expires_value"] = expires_value
-            entry["is_expired"] = is_expired
+            expires_at_ts = entry.get("expires_at_ts")
+            entry["expires_value"] = str(entry.get("expires_at") or "")[:10]
+            entry["is_expired"] = expires_at_ts is not None and expires_at_ts < now_ts
             entry["remaining"] = max(entry["usage_limit"] - entry["used_count"], 0)
             entry["is_active"] = bool(entry.get("is_active"))
             product_info = product_lookup.get(entry.get("product_key"))
@@ -1026,7 +1288,7 @@ def create_admin_app() -> FastAPI:
     @app.get("/coupons")
     async def coupons_page(request: Request, user: str = Depends(_login_required)):
         coupons = list_coupons(limit=200)
-        now_dt = datetime.now()
+        now_ts = time.time()
         for item in coupons:
             try:
                 item["amount"] = int(item.get("amount") or 0)
@@ -1040,18 +1302,9 @@ def create_admin_app() -> FastAPI:
                 item["used_count"] = int(item.get("used_count") or 0)
             except (TypeError, ValueError):
                 item["used_count"] = 0
-            expires_at = item.get("expires_at")
-            expires_value = ""
-            is_expired = False
-            if expires_at:
-                try:
-                    exp_dt = datetime.fromisoformat(str(expires_at))
-                    is_expired = exp_dt < now_dt
-                    expires_value = exp_dt.strftime("%Y-%m-%d")
-                except ValueError:
-                    expires_value = str(expires_at)[:10]
-            item["expires_value"] = expires_value
-            item["is_expired"] = is_expired
+            expires_at_ts = item.get("expires_at_ts")
+            item["expires_value"] = str(item.get("expires_at") or "")[:10]
+            item["is_expired"] = expires_at_ts is not None and expires_at_ts < now_ts
             item["remaining"] = max(item["usage_limit"] - item["used_count"], 0)
             item["is_active"] = bool(item.get("is_active"))
             redemptions = list_coupon_redemptions(item.get("id")) if item.get("id") else []
@@ -1175,11 +1428,78 @@ def create_admin_app() -> FastAPI:
 
         return RedirectResponse(request.url_for("coupons_page"), status.HTTP_303_SEE_OTHER)
 
+    @app.get("/profiles", name="profiles_page")
+    async def profiles_page(request: Request, user: str = Depends(_login_required)):
+        return _render(
+            request,
+            "profiles.html",
+            {
+                "title": "پروفایل‌های اجرا",
+                "profiles": list_profiles(),
+                "running": current_profile(),
+                "multi_worker": ADMIN_WEB_WORKERS > 1,
+                "format_datetime": _format_datetime,
+                "nav": "profiles",
+            },
+        )
+
+    @app.post("/profiles/start", name="profile_start")
+    async def profile_start(
+        request: Request,
+        user: str = Depends(_login_required),
+        target: str = Form("all"),
+        seconds: int = Form(30),
+        updates: int = Form(0),
+    ):
+        if ADMIN_WEB_WORKERS > 1:
+            # a session samples one worker, and a later stop would likely reach another
+            _flash(request, "پروفایل پنل فقط با ADMIN_WEB_WORKERS=1 ممکن است.", "error")
+            return RedirectResponse(request.url_for("profiles_page"), status.HTTP_303_SEE_OTHER)
+        try:
+            options = parse_target(target or "all")
+        except ValueError:
+            _flash(request, "هدف معتبر نیست؛ نام تابع، user:<id> یا all.", "error")
+            return RedirectResponse(request.url_for("profiles_page"), status.HTTP_303_SEE_OTHER)
+        try:
+            session = start_profile("admin", seconds=max(seconds, 1), updates=updates or None, **options)
+        except ProfilerBusy:
+            _flash(request, "یک پروفایل در حال اجراست.", "error")
+        else:
+            _flash(request, f"پروفایل پنل مدیریت شروع شد: {session.describe()}")
+        return RedirectResponse(request.url_for("profiles_page"), status.HTTP_303_SEE_OTHER)
+
+    @app.post("/profiles/stop", name="profile_stop")
+    async def profile_stop(request: Request, user: str = Depends(_login_required)):
+        session = stop_profile()
+        if session is None:
+            _flash(request, "پروفایلی در حال اجرا نیست.", "info")
+        else:
+            await session.wait()
+            _flash(request, f"پروفایل متوقف شد: {session.path.name if session.path else '—'}")
+        return RedirectResponse(request.url_for("profiles_page"), status.HTTP_303_SEE_OTHER)
+
+    @app.get("/profiles/{name}", name="profile_download")
+    async def profile_download(name: str, user: str = Depends(_login_required)):
+        path = profile_path(name)
+        if path is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND)
+        return FileResponse(path, media_type="text/plain; charset=utf-8", filename=path.name)
+
 
     return app
 
 
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+Path(ADMIN_TEMPLATE_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+templates = Jinja2Templates(
+    env=Environment(
+        loader=FileSystemLoader(str(TEMPLATES_DIR)),
+        autoescape=True,
+        bytecode_cache=FileSystemBytecodeCache(ADMIN_TEMPLATE_CACHE_DIR),
+        extensions=[FragmentCacheExtension],
+    )
+)
+templates.env.globals["static_url"] = static_url_global(static_files)
+templates.env.globals["page_window"] = _page_window
 templates.env.filters["money"] = _format_amount
 templates.env.filters["dt"] = _format_datetime
 
@@ -0,0 +1,99 @@
+// Live admin updates: applies events from the /events stream to the dashboard cards and order lists.
+(function () {
+    "use strict";
+
+    var script = document.currentScript;
+    if (!script || !window.EventSource) {
+        return;
+    }
+    var orderUrl = script.dataset.orderUrl;
+
+    function formatMoney(value) {
+        return value.toLocaleString("en-US").replace(/,/g, "،");
+    }
+
+    function applyDeltas(deltas) {
+        Object.keys(deltas).forEach(function (name) {
+            document.querySelectorAll('[data-counter="' + name + '"]').forEach(function (el) {
+                var value = Number(el.dataset.value || 0) + deltas[name];
+                el.dataset.value = value;
+                el.textContent = el.dataset.format === "money" ? formatMoney(value) : value;
+            });
+        });
+    }
+
+    function setBadge(badge, status, label) {
+        badge.className = "badge " + status.toLowerCase();
+        badge.textContent = label;
+    }
+
+    function showNotice() {
+        var notice = document.querySelector(".live-notice");
+        if (notice) {
+            notice.hidden = false;
+        }
+    }
+
+    function addOrderRow(event) {
+        var body = document.querySelector("tbody[data-live-orders]");
+        var template = document.getElementById("live-order-row");
+        if (!body || !template || !event.order) {
+            return;
+        }
+        var filter = body.dataset.liveOrders;
+        if (filter !== "all" && filter !== event.status) {
+            return;
+        }
+        var row = template.content.firstElementChild.cloneNode(true);
+        row.dataset.orderId = event.order.id;
+        row.classList.add("live-new");
+        row.querySelectorAll("[data-field]").forEach(function (el) {
+            el.textContent = event.order[el.dataset.field];
+        });
+        row.querySelectorAll("[data-href]").forEach(function (el) {
+            el.href = orderUrl + event.order.id;
+        });
+        row.querySelectorAll("input[data-value]").forEach(function (el) {
+            el.value = event.order.id;
+        });
+        setBadge(row.querySelector(".badge"), event.status, event.status_label);
+        var empty = body.querySelector("td.empty");
+        if (empty) {
+            empty.parentNode.remove();
+        }
+        body.insertBefore(row, body.firstChild);
+        var limit = Number(body.dataset.limit || 0);
+        while (limit && body.rows.length > limit) {
+            body.deleteRow(-1);
+        }
+    }
+
+    function updateOrderRow(event) {
+        var row = document.querySelector('tr[data-order-id="' + event.ref_id + '"]');
+        if (row) {
+            setBadge(row.querySelector(".badge"), event.status, event.status_label);
+            row.classList.add("live-new");
+            return;
+        }
+        var body = document.querySelector("tbody[data-live-orders]");
+        if (body && body.dataset.liveOrders === event.status) {
+            // an older order moved into the filtered status; its place in the list is unknown here
+            showNotice();
+        }
+    }
+
+    var source = new EventSource(script.dataset.stream);
+    source.onmessage = function (message) {
+        var event = JSON.parse(message.data);
+        applyDeltas(event.deltas || {});
+        if (event.kind === "order.created") {
+            addOrderRow(event);
+        } else if (event.kind === "order.status") {
+            updateOrderRow(event);
+        }
+    };
+    source.addEventListener("reload", function () {
+        source.close();
+        window.location.reload();
+    });
+})();
@@ -0,0 +1,202 @@
+"""Page weight and render time of admin panel pages.
+
+Runs the admin app in-process (``TestClient``) against a scratch copy of a
+synthetic dataset (see ``benchmarks.dataset``). For every page it reports the
+request time, the share of it spent rendering templates, the queries it ran
+and the body size uncompressed, gzip and (when ``brotli`` is installed) br as
+sent by the app. Cached pages also report a page-cache hit and a 304
+revalidation (``If-None-Match``).
+
+    python -m benchmarks.bench_admin --scale 100k [--repeat 50] [--compare old.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+_WORKDIR = Path(tempfile.gettempdir()) / "bot-bench-admin"
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+# keep the bench away from the real Bot API and the real file cache
+os.environ.setdefault("TELEGRAM_API_BASE", "http://127.0.0.1:9")
+os.environ.setdefault("ADMIN_FILE_CACHE_DIR", str(_WORKDIR / "file_cache"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.config import ADMIN_WEB_PASS, ADMIN_WEB_USER  # noqa: E402
+from app.webadmin import server  # noqa: E402
+from app.webadmin.pagecache import clear_page_cache  # noqa: E402
+
+from .bench_db import _git_rev  # noqa: E402
+from .dataset import ensure_dataset, use_database  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+PAGES = [
+    "/dashboard",
+    "/orders",
+    "/orders?status=COMPLETED&page=3",
+    "/orders?q=user",
+    "/users",
+    "/products",
+    "/discounts",
+    "/coupons",
+    "/api/v1/orders?limit=20",
+    "/api/v1/orders?limit=20&fields=id,status,amount_total,created_at",
+    "/static/styles.css",
+]
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+class RenderTimer:
+    """Wraps ``templates.TemplateResponse`` (which renders eagerly) to time rendering."""
+
+    def __init__(self) -> None:
+        self.last = 0.0
+        self._original = server.templates.TemplateResponse
+
+    def __enter__(self) -> "RenderTimer":
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return self._original(*args, **kwargs)
+            finally:
+                self.last += time.perf_counter() - start
+
+        server.templates.TemplateResponse = timed
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        server.templates.TemplateResponse = self._original
+
+
+def _ms(value: float) -> float:
+    return round(value * 1000, 3)
+
+
+def _timed_median(client: TestClient, path: str, repeat: int, headers: dict[str, str]) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        client.get(path, headers=headers)
+        samples.append(time.perf_counter() - start)
+    return _ms(statistics.median(samples))
+
+
+def measure(client: TestClient, timer: RenderTimer, path: str, repeat: int) -> dict[str, Any]:
+    sizes: dict[str, int] = {}
+    for encoding in ENCODINGS:
+        # httpx decodes transparently; the wire size is the raw stream
+        with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+            response.raise_for_status()
+            raw = b"".join(response.iter_raw())
+            if response.headers.get("content-encoding", "identity") == encoding:
+                sizes[encoding] = len(raw)
+    total, render = [], []
+    queries = 0
+    for i in range(repeat + 1):
+        timer.last = 0.0
+        # time the full render, not the page cache
+        clear_page_cache()
+        start = time.perf_counter()
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        elapsed = time.perf_counter() - start
+        if i:  # first request is a warm-up
+            total.append(elapsed)
+            render.append(timer.last)
+            queries = int(response.headers.get("x-query-count", 0))
+    ordered = sorted(total)
+    cached: dict[str, float] = {}
+    etag = response.headers.get("etag")
+    if etag:
+        cached["hit_ms"] = _timed_median(client, path, repeat, {"Accept-Encoding": "gzip"})
+        cached["not_modified_ms"] = _timed_median(client, path, repeat, {"Accept-Encoding": "gzip", "If-None-Match": etag})
+    return {
+        "median_ms": _ms(statistics.median(total)),
+        "p95_ms": _ms(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]),
+        "render_median_ms": _ms(statistics.median(render)),
+        "queries": queries,
+        "bytes": sizes,
+        "cache_control": response.headers.get("cache-control"),
+        **cached,
+    }
+
+
+def compare(current: dict[str, Any], previous: dict[str, Any]) -> None:
+    old = previous.get("results", {})
+    print(f"\n{'page':<36}{'median ms':>22}{'render ms':>22}{'gzip bytes':>24}")
+    for page, result in current["results"].items():
+        before = old.get(page)
+        if not before:
+            continue
+        print(
+            f"{page:<36}"
+            f"{before['median_ms']:>10.2f} → {result['median_ms']:<9.2f}"
+            f"{before['render_median_ms']:>10.2f} → {result['render_median_ms']:<9.2f}"
+            f"{before['bytes'].get('gzip', before['bytes'].get('identity', 0)):>11} → "
+            f"{result['bytes'].get('gzip', result['bytes'].get('identity', 0)):<10}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1M or an order count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--data-dir", default=str(Path(tempfile.gettempdir()) / "bot-bench"))
+    parser.add_argument("--out", help="JSON results file (default: benchmarks/results/admin-<scale>-<time>.json)")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    parser.add_argument("--keep", action="store_true", help=f"keep the scratch database under {_WORKDIR}")
+    args = parser.parse_args()
+
+    dataset, meta = ensure_dataset(args.scale, args.seed, args.data_dir)
+    _WORKDIR.mkdir(parents=True, exist_ok=True)
+    work = _WORKDIR / "admin.db"
+    shutil.copyfile(dataset, work)
+    use_database(work)
+
+    results: dict[str, Any] = {}
+    with TestClient(server.create_admin_app()) as client, RenderTimer() as timer:
+        client.post("/login", data={"username": ADMIN_WEB_USER, "password": ADMIN_WEB_PASS})
+        for path in PAGES:
+            r = results[path] = measure(client, timer, path, args.repeat)
+            sizes = " ".join(f"{name}={size}" for name, size in r["bytes"].items())
+            cached = f"  hit {r['hit_ms']:.2f} / 304 {r['not_modified_ms']:.2f} ms" if "hit_ms" in r else ""
+            print(
+                f"{path:<36}{r['median_ms']:>9.2f} ms  (p95 {r['p95_ms']:.2f}, render {r['render_median_ms']:.2f}, "
+                f"{r['queries']} queries)  {sizes}{cached}"
+            )
+
+    report = {
+        "meta": {
+            "dataset": meta,
+            "repeat": args.repeat,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    out = Path(args.out) if args.out else RESULTS_DIR / f"admin-{args.scale}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nresults: {out}")
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+    if not args.keep:
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
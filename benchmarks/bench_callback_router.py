@@ -0,0 +1,151 @@
+"""Per-callback dispatch cost: ``CallbackTable`` vs. aiogram filter scanning.
+
+Registers ``--routes`` synthetic handlers both ways (half exact strings, half
+``prefix:{id:int}`` patterns) and measures
+
+* lookup only: ``CallbackTable.resolve`` vs. evaluating ``F.data`` filters in order
+* full ``Dispatcher.feed_update`` with no-op handlers
+
+    python -m benchmarks.bench_callback_router [--routes 120] [--calls 20000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import CallbackQuery, Update
+
+from app.callbacks import CallbackTable
+
+
+async def _noop(*args, **kwargs) -> None:
+    return None
+
+
+def _route_specs(count: int) -> list[tuple[str, str, str]]:
+    """(table pattern, legacy kind, legacy value) per route."""
+
+    specs = []
+    for i in range(count):
+        if i % 2:
+            specs.append((f"m{i}:item:{{item_id:int}}", "prefix", f"m{i}:item:"))
+        else:
+            specs.append((f"m{i}:open", "exact", f"m{i}:open"))
+    return specs
+
+
+def _sample_data(count: int) -> list[str]:
+    # first, middle and last routes of both kinds plus a miss
+    picks = {0, 1, count // 2, count // 2 + 1, count - 2, count - 1}
+    data = []
+    for i in sorted(picks):
+        data.append(f"m{i}:item:{i * 7}" if i % 2 else f"m{i}:open")
+    data.append("nope:nothing")
+    return data
+
+
+def _callback(data: str, update_id: int = 0) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": {"id": 1, "is_bot": False, "first_name": "bench"},
+                "chat_instance": "bench",
+                "data": data,
+                "message": {
+                    "message_id": 1,
+                    "date": int(datetime.now().timestamp()),
+                    "chat": {"id": 1, "type": "private"},
+                    "text": "bench",
+                },
+            },
+        }
+    )
+
+
+def _legacy_filters(specs: list[tuple[str, str, str]]):
+    filters = []
+    for _, kind, value in specs:
+        filters.append(F.data == value if kind == "exact" else F.data.startswith(value))
+    return filters
+
+
+def _bench_lookup(specs, samples, calls: int) -> tuple[float, float]:
+    table = CallbackTable()
+    for pattern, _, _ in specs:
+        table.add(pattern, _noop)
+    filters = _legacy_filters(specs)
+    events = [_callback(data).callback_query for data in samples]
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        for event in events:
+            table.resolve(event.data)
+    t_table = (time.perf_counter() - start) / (calls * len(events))
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        for event in events:
+            for flt in filters:
+                if flt.resolve(event):
+                    break
+    t_scan = (time.perf_counter() - start) / (calls * len(events))
+    return t_table, t_scan
+
+
+async def _bench_dispatch(specs, samples, calls: int) -> tuple[float, float]:
+    bot = Bot("0:bench")
+
+    legacy = Router()
+    for flt in _legacy_filters(specs):
+        legacy.callback_query(flt)(_noop)
+    dp_legacy = Dispatcher()
+    dp_legacy.include_router(legacy)
+
+    table = CallbackTable()
+    for pattern, _, _ in specs:
+        table.add(pattern, _noop)
+    routed = Router()
+    table.attach(routed)
+    dp_table = Dispatcher()
+    dp_table.include_router(routed)
+
+    updates = [_callback(data, i) for i, data in enumerate(samples)]
+    results = []
+    for dp in (dp_table, dp_legacy):
+        start = time.perf_counter()
+        for _ in range(calls):
+            for update in updates:
+                await dp.feed_update(bot, update)
+        results.append((time.perf_counter() - start) / (calls * len(updates)))
+    await bot.session.close()
+    return results[0], results[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", type=int, default=120)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    specs = _route_specs(args.routes)
+    samples = _sample_data(args.routes)
+
+    t_table, t_scan = _bench_lookup(specs, samples, args.calls)
+    d_table, d_scan = asyncio.run(_bench_dispatch(specs, samples, max(args.calls // 20, 1)))
+
+    print(f"{args.routes} routes, {len(samples)} callback shapes (first/middle/last/miss)")
+    header = f"{'':<24}{'table µs':>12}{'F-filter scan µs':>18}{'speedup':>10}"
+    print(header)
+    print("-" * len(header))
+    print(f"{'lookup':<24}{t_table * 1e6:>12.2f}{t_scan * 1e6:>18.2f}{t_scan / t_table:>9.1f}x")
+    print(f"{'Dispatcher.feed_update':<24}{d_table * 1e6:>12.2f}{d_scan * 1e6:>18.2f}{d_scan / d_table:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
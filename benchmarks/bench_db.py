@@ -0,0 +1,456 @@
+"""Benchmark suite for the public functions in ``app/db.py``.
+
+Runs every case against a scratch copy of a synthetic dataset (see
+``benchmarks.dataset``) and writes timings as JSON so runs can be compared.
+
+    python -m benchmarks.bench_db --scale 100k [--repeat 20] [--only order]
+    python -m benchmarks.bench_db --scale 100k --compare old.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import inspect
+import itertools
+import json
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.dataset import PRODUCTS, ensure_dataset, use_database
+
+from app import db  # noqa: E402  (dataset sets BOT_TOKEN first)
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# primitives every case goes through anyway
+NOT_BENCHMARKED = {
+    "db_execute",
+    "transaction",
+    "add_query_listener",
+    "remove_query_listener",
+    "open_pool",
+    "close_pool",
+    "unit_of_work",
+}
+
+Args = tuple[tuple[Any, ...], dict[str, Any]]
+
+
+@dataclass
+class Case:
+    name: str
+    fn: Callable[..., Any]
+    args: Callable[["Context"], Args] = lambda ctx: ((), {})
+    setup: Callable[["Context"], None] | None = None
+    repeat: int | None = None
+
+
+class Context:
+    """Id pools sampled from the working database, shared by all cases."""
+
+    def __init__(self, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.counter = itertools.count(1)
+
+        def column(sql: str) -> list[Any]:
+            return [next(iter(r.values())) for r in db.db_execute(sql, fetchall=True)]
+
+        self.user_ids = column("SELECT user_id FROM users ORDER BY user_id")
+        self.order_ids = column("SELECT id FROM orders ORDER BY id")
+        self.awaiting = column("SELECT id FROM orders WHERE status='AWAITING_PAYMENT' ORDER BY id DESC")
+        self.pending_confirm = column("SELECT id FROM orders WHERE status='PENDING_CONFIRM' ORDER BY id")
+        self.applied_discount_orders = column("SELECT order_id FROM discount_redemptions WHERE status='APPLIED' ORDER BY id")
+        self.coupon_ids = column("SELECT id FROM coupons ORDER BY id")
+        self.coupon_codes = column("SELECT code FROM coupons WHERE is_active=1 ORDER BY id")
+        self.discount_ids = column("SELECT id FROM discount_codes ORDER BY id")
+        self.discount_codes: dict[str, list[str]] = {}
+        for row in db.db_execute("SELECT product_key, code FROM discount_codes WHERE is_active=1 ORDER BY id", fetchall=True):
+            self.discount_codes.setdefault(row["product_key"], []).append(row["code"])
+        self.service_ids = column("SELECT id FROM service_messages ORDER BY id")
+        self.blob_ids = column("SELECT file_id FROM blobs ORDER BY file_id")
+        self.blob_hashes = column("SELECT sha256 FROM blobs ORDER BY file_id")
+        self.product_keys = [db.normalize_product_key(c, s, m) for c, s, m, _ in PRODUCTS]
+        self.statuses = list(db.ORDER_STATUS_LABELS)
+
+    def user(self) -> int:
+        return self.rng.choice(self.user_ids)
+
+    def order(self) -> int:
+        return self.rng.choice(self.order_ids)
+
+    def take(self, pool: list[Any]) -> Any:
+        """Remove and return an id for cases that consume their target."""
+
+        return pool.pop() if pool else self.order()
+
+    def unique(self, prefix: str) -> str:
+        return f"{prefix}{next(self.counter):06d}"
+
+
+def _a(*args: Any, **kwargs: Any) -> Args:
+    return args, kwargs
+
+
+def _discount_args(ctx: Context) -> Args:
+    order = db.get_order(ctx.take(ctx.awaiting))
+    key = db.normalize_product_key(order["service_category"], order["service_code"], order["account_mode"])
+    code = ctx.rng.choice(ctx.discount_codes.get(key) or ["NOPE"])
+    return _a(order["id"], order["user_id"], code)
+
+
+def _expire_setup(ctx: Context) -> None:
+    # push a batch of cart orders past their deadline for the next run
+    past = (datetime.now() - timedelta(minutes=1)).isoformat(timespec="seconds")
+    batch = [ctx.awaiting.pop() for _ in range(min(50, len(ctx.awaiting)))]
+    if batch:
+        marks = ",".join("?" for _ in batch)
+        db.db_execute(f"UPDATE orders SET await_deadline=? WHERE id IN ({marks})", (past, *batch))
+
+
+def _checkout_writes(order_id: int, user_id: int) -> None:
+    # the reads and setter calls of a payment handler, outside or inside a unit of work
+    order = db.get_order(order_id)
+    db.get_user(user_id)
+    db.set_order_wallet_used(order_id, 0)
+    db.set_order_payment_type(order_id, "MIXED")
+    db.set_order_customer_message(order_id, "پیام")
+    db.get_order(order["id"])
+
+
+def _checkout_unit(order_id: int, user_id: int) -> None:
+    with db.unit_of_work():
+        _checkout_writes(order_id, user_id)
+
+
+def _consume(iterator_fn: Callable[..., Any]) -> Callable[..., int]:
+    def run(*args: Any, **kwargs: Any) -> int:
+        return sum(len(chunk) for chunk in iterator_fn(*args, **kwargs))
+
+    run.__name__ = iterator_fn.__name__
+    return run
+
+
+def build_cases() -> list[Case]:
+    search = lambda ctx: ctx.rng.choice(["user1", "@example", "team", "12", "علی"])  # noqa: E731
+    return [
+        # users
+        Case("ensure_user", db.ensure_user, lambda c: _a(c.user(), "bench", "Bench")),
+        Case("get_user", db.get_user, lambda c: _a(c.user())),
+        Case("is_user_contact_verified", db.is_user_contact_verified, lambda c: _a(c.user())),
+        Case("set_user_contact_verified", db.set_user_contact_verified, lambda c: _a(c.user(), "+989120000000")),
+        Case("set_user_phone_verified", db.set_user_phone_verified, lambda c: _a(c.user(), "+989120000000")),
+        Case("set_user_blocked", db.set_user_blocked, lambda c: _a(c.user(), False)),
+        Case("is_user_blocked", db.is_user_blocked, lambda c: _a(c.user())),
+        Case("get_user_stats", db.get_user_stats, lambda c: _a(c.user())),
+        Case("list_users", db.list_users, lambda c: _a(limit=20, offset=c.rng.randrange(0, 2000, 20))),
+        Case("list_users[search]", db.list_users, lambda c: _a(search(c), limit=20)),
+        Case("count_users", db.count_users),
+        Case("count_users[search]", db.count_users, lambda c: _a(search(c))),
+        Case("list_recent_users", db.list_recent_users),
+        Case("add_user_manager_message", db.add_user_manager_message, lambda c: _a(c.user(), "سلام")),
+        Case("list_user_manager_messages", db.list_user_manager_messages, lambda c: _a(c.user())),
+        # wallet
+        Case("change_wallet", db.change_wallet, lambda c: _a(c.user(), 10_000, "CREDIT", "bench")),
+        Case("list_wallet_tx_for_user", db.list_wallet_tx_for_user, lambda c: _a(c.user())),
+        Case("list_wallet_tx_for_order", db.list_wallet_tx_for_order, lambda c: _a(c.order())),
+        Case("list_recent_wallet_tx", db.list_recent_wallet_tx),
+        Case("get_wallet_summary", db.get_wallet_summary),
+        # orders
+        Case(
+            "create_order",
+            db.create_order,
+            lambda c: _a(
+                db.get_user(c.user()), "bench", 450_000, "تومان", "AI", "team", "PREBUILT", product_code="team_prebuilt"
+            ),
+        ),
+        Case("get_order", db.get_order, lambda c: _a(c.order())),
+        Case("set_order_status", db.set_order_status, lambda c: _a(c.order(), "IN_PROGRESS")),
+        Case("set_order_deadline", db.set_order_deadline, lambda c: _a(c.order(), None)),
+        Case("set_order_receipt", db.set_order_receipt, lambda c: _a(c.order(), "AgACbench", "رسید")),
+        Case("set_order_payment_type", db.set_order_payment_type, lambda c: _a(c.order(), "CARD")),
+        Case("set_order_wallet_reserved", db.set_order_wallet_reserved, lambda c: _a(c.order(), 0)),
+        Case("set_order_wallet_used", db.set_order_wallet_used, lambda c: _a(c.order(), 0)),
+        Case("set_order_customer_message", db.set_order_customer_message, lambda c: _a(c.order(), "پیام")),
+        Case("set_order_manager_note", db.set_order_manager_note, lambda c: _a(c.order(), "note")),
+        Case("set_order_financials", db.set_order_financials, lambda c: _a(c.order(), 100_000)),
+        Case("set_order_customer_secret", db.set_order_customer_secret, lambda c: _a(c.order(), "secret")),
+        Case("checkout_writes", _checkout_writes, lambda c: _a(c.order(), c.user())),
+        Case("checkout_writes[unit_of_work]", _checkout_unit, lambda c: _a(c.order(), c.user())),
+        Case("update_order_notes", db.update_order_notes, lambda c: _a(c.order(), "notes")),
+        Case("add_order_manager_message", db.add_order_manager_message, lambda c: _a(c.order(), None, "پیام")),
+        Case("list_order_manager_messages", db.list_order_manager_messages, lambda c: _a(c.order())),
+        Case("user_has_delivered_order", db.user_has_delivered_order, lambda c: _a(c.user())),
+        Case("list_cart_orders", db.list_cart_orders, lambda c: _a(c.user())),
+        Case(
+            "list_orders_by_category",
+            db.list_orders_by_category,
+            lambda c: _a(c.user(), c.rng.choice(["inprog", "done", "all"])),
+        ),
+        Case(
+            "count_orders_by_category",
+            db.count_orders_by_category,
+            lambda c: _a(c.user(), c.rng.choice(["inprog", "done", "all"])),
+        ),
+        Case("list_orders", db.list_orders, lambda c: _a(limit=20, offset=c.rng.randrange(0, 5000, 20))),
+        Case("list_orders[status]", db.list_orders, lambda c: _a(status=c.rng.choice(c.statuses), limit=20)),
+        Case("list_orders[search]", db.list_orders, lambda c: _a(search=search(c), limit=20)),
+        Case("list_orders[user]", db.list_orders, lambda c: _a(user_id=c.user(), limit=20)),
+        Case("count_orders", db.count_orders),
+        Case("count_orders[status]", db.count_orders, lambda c: _a(status=c.rng.choice(c.statuses))),
+        Case("count_orders[search]", db.count_orders, lambda c: _a(search=search(c))),
+        Case("list_recent_orders", db.list_recent_orders),
+        Case("get_dashboard_snapshot", db.get_dashboard_snapshot),
+        Case("ensure_order_id_floor", db.ensure_order_id_floor),
+        Case("normalize_product_key", db.normalize_product_key, lambda c: _a("AI", "team", "my_account")),
+        # state machine / expiry
+        Case("can_transition", db.can_transition, lambda c: _a("PENDING_CONFIRM", "IN_PROGRESS")),
+        Case(
+            "transition_order",
+            db.transition_order,
+            lambda c: _a(c.take(c.awaiting), "CANCELED", allowed_from={"AWAITING_PAYMENT"}),
+        ),
+        Case(
+            "transition_orders[20]",
+            db.transition_orders,
+            lambda c: _a([c.take(c.pending_confirm) for _ in range(20)], "IN_PROGRESS"),
+        ),
+        Case("expire_orders_and_refund", db.expire_orders_and_refund, setup=_expire_setup),
+        # coupons
+        Case("create_coupon", db.create_coupon, lambda c: _a(c.unique("BENCH"), 50_000, 100)),
+        Case(
+            "update_coupon",
+            db.update_coupon,
+            lambda c: _a(
+                1, code="CPN00000", amount=50_000, usage_limit=1_000, expires_at=None, is_active=True
+            ),
+        ),
+        Case("set_coupon_active", db.set_coupon_active, lambda c: _a(c.rng.choice(c.coupon_ids), True)),
+        Case("list_coupons", db.list_coupons),
+        Case("get_coupon", db.get_coupon, lambda c: _a(c.rng.choice(c.coupon_ids))),
+        Case("get_coupon_by_code", db.get_coupon_by_code, lambda c: _a(c.rng.choice(c.coupon_codes))),
+        Case("list_coupon_redemptions", db.list_coupon_redemptions, lambda c: _a(c.rng.choice(c.coupon_ids))),
+        Case("redeem_coupon", db.redeem_coupon, lambda c: _a(c.user(), c.rng.choice(c.coupon_codes))),
+        # discounts
+        Case(
+            "create_discount_code",
+            db.create_discount_code,
+            lambda c: _a(c.rng.choice(c.product_keys), "bench", c.unique("BOFF"), 10_000, 100),
+        ),
+        Case(
+            "update_discount_code",
+            db.update_discount_code,
+            lambda c: _a(1, title="bench", code="OFF00001", amount=10_000, usage_limit=1_000),
+        ),
+        Case("set_discount_active", db.set_discount_active, lambda c: _a(c.rng.choice(c.discount_ids), True)),
+        Case("list_discount_codes", db.list_discount_codes),
+        Case(
+            "list_discount_codes[product]",
+            db.list_discount_codes,
+            lambda c: _a(product_key=c.rng.choice(c.product_keys)),
+        ),
+        Case("get_discount_code", db.get_discount_code, lambda c: _a(c.rng.choice(c.discount_ids))),
+        Case("get_discount_code_by_code", db.get_discount_code_by_code, lambda c: _a("OFF00003")),
+        Case(
+            "list_discount_redemptions",
+            db.list_discount_redemptions,
+            lambda c: _a(c.rng.choice(c.discount_ids), include_pending=True),
+        ),
+        Case("apply_discount_to_order", db.apply_discount_to_order, _discount_args),
+        Case("release_order_discount", db.release_order_discount, lambda c: _a(c.take(c.applied_discount_orders))),
+        Case("confirm_order_discount", db.confirm_order_discount, lambda c: _a(c.take(c.applied_discount_orders))),
+        # service messages
+        Case(
+            "create_service_message",
+            db.create_service_message,
+            lambda c: _a(c.user(), "bench", "Bench", "OTHER_SERVICE", "درخواست"),
+        ),
+        Case("list_service_messages", db.list_service_messages),
+        Case("list_service_messages[category]", db.list_service_messages, lambda c: _a(category="BUILD_BOT")),
+        Case("count_service_messages", db.count_service_messages),
+        Case("get_service_message", db.get_service_message, lambda c: _a(c.rng.choice(c.service_ids))),
+        Case(
+            "add_service_message_reply",
+            db.add_service_message_reply,
+            lambda c: _a(c.rng.choice(c.service_ids), None, "پاسخ"),
+        ),
+        Case(
+            "list_service_message_replies",
+            db.list_service_message_replies,
+            lambda c: _a(c.rng.choice(c.service_ids)),
+        ),
+        Case(
+            "set_service_message_status",
+            db.set_service_message_status,
+            lambda c: _a(c.rng.choice(c.service_ids), True),
+        ),
+        # exports (whole table, streamed)
+        Case("iter_orders_export", _consume(db.iter_orders_export), repeat=3),
+        Case("iter_wallet_tx_export", _consume(db.iter_wallet_tx_export), repeat=3),
+        Case("iter_users_export", _consume(db.iter_users_export), repeat=3),
+        # JSON API
+        Case("api_columns", db.api_columns, lambda c: _a("orders")),
+        Case("list_api_rows", db.list_api_rows, lambda c: _a("orders", limit=51)),
+        Case(
+            "list_api_rows[fields,filter]",
+            db.list_api_rows,
+            lambda c: _a("orders", fields=["status", "amount_total"], filters={"status": "COMPLETED"}, limit=51),
+        ),
+        Case("list_api_rows[cursor]", db.list_api_rows, lambda c: _a("orders", before=c.order(), limit=51)),
+        Case("get_api_rows", db.get_api_rows, lambda c: _a("orders", [c.order() for _ in range(50)])),
+        # blob index
+        Case("get_blob", db.get_blob, lambda c: _a(c.rng.choice(c.blob_ids))),
+        Case(
+            "save_blob",
+            db.save_blob,
+            lambda c: _a(c.unique("AgACnew"), "0" * 64, 1234, "image/jpeg", "r.jpg", True),
+        ),
+        Case("touch_blob", db.touch_blob, lambda c: _a(c.rng.choice(c.blob_ids))),
+        Case("list_blob_thumbs", db.list_blob_thumbs, lambda c: _a(c.rng.sample(c.blob_ids, 20))),
+        Case("list_blob_contents", db.list_blob_contents, repeat=5),
+        Case("delete_blob_content", db.delete_blob_content, lambda c: _a(c.take(c.blob_hashes))),
+        Case("init_db", db.init_db, repeat=5),
+        # after init_db, which creates change_counters, events and outbox on datasets generated before they existed
+        Case("change_versions", db.change_versions),
+        Case("latest_event_id", db.latest_event_id),
+        Case("list_events_after", db.list_events_after, lambda c: _a(0)),
+        Case("prune_events", db.prune_events, lambda c: _a(10_000), repeat=5),
+        Case("enqueue_outbox", db.enqueue_outbox, lambda c: _a("bench", c.user(), "hello")),
+        Case(
+            "enqueue_outbox_many",
+            db.enqueue_outbox_many,
+            lambda c: _a("bench", [(c.user(), None, "hello") for _ in range(20)]),
+        ),
+        Case("claim_outbox", db.claim_outbox, lambda c: _a(10, 120)),
+        Case("complete_outbox", db.complete_outbox, lambda c: _a(1)),
+        Case("fail_outbox", db.fail_outbox, lambda c: _a(2, "bench")),
+        Case("retry_outbox", db.retry_outbox, lambda c: _a(2)),
+        Case("list_outbox", db.list_outbox, lambda c: ((), {"user_id": c.user()})),
+    ]
+
+
+def _stats(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    ms = lambda v: round(v * 1000, 4)  # noqa: E731
+    return {
+        "n": len(samples),
+        "min_ms": ms(ordered[0]),
+        "median_ms": ms(statistics.median(ordered)),
+        "mean_ms": ms(statistics.fmean(ordered)),
+        "p95_ms": ms(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]),
+        "max_ms": ms(ordered[-1]),
+    }
+
+
+def run_case(case: Case, ctx: Context, repeat: int) -> dict[str, float]:
+    samples = []
+    for i in range(1 + (case.repeat or repeat)):
+        if case.setup:
+            case.setup(ctx)
+        args, kwargs = case.args(ctx)
+        start = time.perf_counter()
+        case.fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        if i:  # first call is a warm-up
+            samples.append(elapsed)
+    return _stats(samples)
+
+
+def uncovered(cases: list[Case]) -> list[str]:
+    covered = {case.name.split("[")[0] for case in cases}
+    public = {
+        name
+        for name, fn in inspect.getmembers(db, inspect.isfunction)
+        if fn.__module__ == db.__name__ and not name.startswith("_")
+    }
+    return sorted(public - covered - NOT_BENCHMARKED)
+
+
+def _git_rev() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def compare(current: dict[str, Any], previous: dict[str, Any]) -> None:
+    old = previous.get("results", {})
+    print(f"\n{'case':<36}{'old median ms':>15}{'new median ms':>15}{'change':>10}")
+    for name, result in current["results"].items():
+        if "median_ms" not in result or "median_ms" not in old.get(name, {}):
+            continue
+        before, after = old[name]["median_ms"], result["median_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{name:<36}{before:>15.3f}{after:>15.3f}{change:>+9.1f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1M or an order count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", help="run cases whose name contains this text")
+    parser.add_argument("--data-dir", default=str(Path(tempfile.gettempdir()) / "bot-bench"))
+    parser.add_argument("--out", help="JSON results file (default: benchmarks/results/db-<scale>-<time>.json)")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    args = parser.parse_args()
+
+    dataset, meta = ensure_dataset(args.scale, args.seed, args.data_dir)
+    work = dataset.with_name(dataset.stem + "-work.db")
+    shutil.copyfile(dataset, work)
+    use_database(work)
+
+    cases = build_cases()
+    if args.only:
+        cases = [case for case in cases if args.only in case.name]
+    ctx = Context(args.seed)
+
+    results: dict[str, Any] = {}
+    for case in cases:
+        try:
+            r = run_case(case, ctx, args.repeat)
+        except Exception as exc:  # keep going; a broken function is a result too
+            results[case.name] = {"error": repr(exc)}
+            print(f"{case.name:<36}  ERROR {exc!r}")
+            continue
+        results[case.name] = r
+        print(f"{case.name:<36}{r['median_ms']:>10.3f} ms  (p95 {r['p95_ms']:.3f}, n={r['n']})")
+
+    report = {
+        "meta": {
+            "dataset": meta,
+            "repeat": args.repeat,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": results,
+        "uncovered": uncovered(build_cases()),
+    }
+    out = Path(args.out) if args.out else RESULTS_DIR / f"db-{args.scale}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nresults: {out}")
+    if report["uncovered"]:
+        print("no case for:", ", ".join(report["uncovered"]))
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
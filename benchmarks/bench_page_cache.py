@@ -0,0 +1,213 @@
+"""Admin page-cache hit rates under a mixed stream of order edits.
+
+Runs the admin app in-process (``TestClient``) against a scratch copy of a
+synthetic dataset (see ``benchmarks.dataset``). Each round applies one order
+edit, picked from ``EDITS`` with their weights, and then requests every page
+in ``PAGES``, plus the receipt thumbnails the order lists link to, as a
+browser would. Reports the hit ratio and request time of each page, read from
+``ADMIN_PAGE_CACHE_TOTAL``. Bot updates from customers with unchanged
+profiles invalidate nothing, edits to an order's messages and notes only
+invalidate the pages that show them, and status and payment edits invalidate
+the order lists as well.
+
+    python -m benchmarks.bench_page_cache --scale 100k [--rounds 300] [--compare old.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+_WORKDIR = Path(tempfile.gettempdir()) / "bot-bench-page-cache"
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+# keep the bench away from the real Bot API and the real file cache
+os.environ.setdefault("TELEGRAM_API_BASE", "http://127.0.0.1:9")
+os.environ.setdefault("ADMIN_FILE_CACHE_DIR", str(_WORKDIR / "file_cache"))
+os.environ.setdefault("BLOB_STORE_DIR", str(_WORKDIR / "blobs"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from PIL import Image  # noqa: E402
+
+from app import blobstore, db  # noqa: E402
+from app.config import ADMIN_WEB_PASS, ADMIN_WEB_USER  # noqa: E402
+from app.metrics import ADMIN_PAGE_CACHE_TOTAL  # noqa: E402
+from app.webadmin import server  # noqa: E402
+from app.webadmin.pagecache import clear_page_cache  # noqa: E402
+
+from .bench_db import _git_rev  # noqa: E402
+from .dataset import ensure_dataset, use_database  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# label -> (path, endpoint whose ``ADMIN_PAGE_CACHE_TOTAL`` counters it moves)
+PAGES = {
+    "/dashboard": ("/dashboard", "dashboard"),
+    "/orders": ("/orders", "orders_page"),
+    "/orders?page=2": ("/orders?page=2", "orders_page"),
+    "/orders/{id}": ("/orders/{order_id}", "order_detail"),
+}
+
+def _bot_update(user_id: int) -> None:
+    # every bot handler starts with ensure_user, mostly for a customer whose profile hasn't changed
+    user = db.get_user(user_id)
+    db.ensure_user(user_id, user["username"], user["first_name"])
+
+
+# (name, weight, edit): customer traffic, then mostly messages and notes, as on a support shift
+EDITS: list[tuple[str, int, Callable[[int, int], Any]]] = [
+    ("bot_update", 4, lambda oid, uid: _bot_update(uid)),
+    ("customer_message", 4, lambda oid, uid: db.set_order_customer_message(oid, f"پیام مشتری {time.time_ns()}")),
+    ("manager_note", 3, lambda oid, uid: db.set_order_manager_note(oid, f"یادداشت {time.time_ns()}")),
+    ("manager_message", 2, lambda oid, uid: db.add_order_manager_message(oid, uid, f"پیام مدیر {time.time_ns()}")),
+    ("payment_type", 1, lambda oid, uid: db.set_order_payment_type(oid, "card")),
+]
+
+
+def _recent_orders(count: int) -> list[tuple[int, int]]:
+    rows = db.db_execute("SELECT id, user_id FROM orders ORDER BY id DESC LIMIT ?", (count,), fetchall=True)
+    return [(row["id"], row["user_id"]) for row in rows]
+
+
+_THUMB_SRC = re.compile(r'src="([^"]+/receipt/thumb)"')
+
+
+def _store_receipts(count: int) -> None:
+    """Give the ``count`` newest orders a receipt image in the blob store, last read a day ago."""
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (900, 1200), (236, 240, 245)).save(buffer, "JPEG", quality=85)
+    rows = db.db_execute(
+        "SELECT id, receipt_file_id FROM orders ORDER BY created_at_ts DESC LIMIT ?", (count,), fetchall=True
+    )
+    for row in rows:
+        file_id = row["receipt_file_id"] or f"AgACbench{row['id']:08d}"
+        if not row["receipt_file_id"]:
+            db.set_order_receipt(row["id"], file_id, None)
+        blobstore.store(file_id, buffer.getvalue(), "image/jpeg", "receipt.jpg")
+    db.db_execute("UPDATE blobs SET last_access = datetime('now', 'localtime', '-1 day')")
+
+
+def _hits(endpoint: str) -> float:
+    return ADMIN_PAGE_CACHE_TOTAL.value(endpoint, "hit")
+
+
+def _misses(endpoint: str) -> float:
+    return ADMIN_PAGE_CACHE_TOTAL.value(endpoint, "miss")
+
+
+def run(client: TestClient, rounds: int, orders: list[tuple[int, int]], seed: int) -> dict[str, Any]:
+    rng = random.Random(seed)
+    names = [name for name, _, _ in EDITS]
+    weights = [weight for _, weight, _ in EDITS]
+    edits = {name: edit for name, _, edit in EDITS}
+    edit_counts = dict.fromkeys(names, 0)
+    stats = {label: {"hits": 0, "misses": 0, "seconds": 0.0} for label in PAGES}
+    for _ in range(rounds):
+        name = rng.choices(names, weights)[0]
+        order_id, user_id = rng.choice(orders)
+        edits[name](order_id, user_id)
+        edit_counts[name] += 1
+        # the admin checks the lists and the order that just changed
+        for label, (path, endpoint) in PAGES.items():
+            hits, misses = _hits(endpoint), _misses(endpoint)
+            start = time.perf_counter()
+            response = client.get(path.format(order_id=order_id))
+            response.raise_for_status()
+            page = stats[label]
+            page["seconds"] += time.perf_counter() - start
+            page["hits"] += int(_hits(endpoint) - hits)
+            page["misses"] += int(_misses(endpoint) - misses)
+            for src in _THUMB_SRC.findall(response.text):
+                client.get(src).raise_for_status()
+    results = {}
+    for label, page in stats.items():
+        served = max(page["hits"] + page["misses"], 1)
+        results[label] = {
+            "hits": page["hits"],
+            "misses": page["misses"],
+            "hit_ratio": round(page["hits"] / served, 4),
+            "mean_ms": round(page["seconds"] * 1000 / rounds, 3),
+        }
+    return {"edits": edit_counts, "pages": results}
+
+
+def compare(current: dict[str, Any], previous: dict[str, Any]) -> None:
+    old = previous.get("results", {}).get("pages", {})
+    print(f"\n{'page':<20}{'hit ratio':>22}{'mean ms':>22}")
+    for label, result in current["results"]["pages"].items():
+        before = old.get(label)
+        if not before:
+            continue
+        print(
+            f"{label:<20}"
+            f"{before['hit_ratio']:>10.1%} → {result['hit_ratio']:<9.1%}"
+            f"{before['mean_ms']:>10.2f} → {result['mean_ms']:<9.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1M or an order count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=300)
+    parser.add_argument("--orders", type=int, default=20, help="edits pick from this many most recent orders")
+    parser.add_argument("--orders-shown", type=int, default=40, help="newest orders given receipt thumbnails")
+    parser.add_argument("--data-dir", default=str(Path(tempfile.gettempdir()) / "bot-bench"))
+    parser.add_argument("--out", help="JSON results file (default: benchmarks/results/page-cache-<scale>-<time>.json)")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    args = parser.parse_args()
+
+    dataset, meta = ensure_dataset(args.scale, args.seed, args.data_dir)
+    _WORKDIR.mkdir(parents=True, exist_ok=True)
+    work = _WORKDIR / "page-cache.db"
+    shutil.copyfile(dataset, work)
+    use_database(work)
+
+    try:
+        with TestClient(server.create_admin_app()) as client:
+            client.post("/login", data={"username": ADMIN_WEB_USER, "password": ADMIN_WEB_PASS})
+            _store_receipts(args.orders_shown)
+            clear_page_cache()
+            results = run(client, args.rounds, _recent_orders(args.orders), args.seed)
+    finally:
+        db.close_pool()
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+    print("edits: " + ", ".join(f"{name}={count}" for name, count in results["edits"].items()))
+    for label, r in results["pages"].items():
+        print(f"{label:<20}{r['hit_ratio']:>8.1%} hits  ({r['hits']} hit / {r['misses']} miss)  {r['mean_ms']:>8.2f} ms")
+
+    report = {
+        "meta": {
+            "dataset": meta,
+            "rounds": args.rounds,
+            "orders": args.orders,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    out = Path(args.out) if args.out else RESULTS_DIR / f"page-cache-{args.scale}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nresults: {out}")
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Memory and time per 1k order rows: ``SELECT *`` dicts vs. projected records.
+
+For each order-list projection in ``app.db`` (``OrderSummary``, ``OrderLine``,
+``CartOrder``) fetches ``--rows`` orders from a scratch copy of a synthetic
+dataset (see ``benchmarks.dataset``) three ways: every column as dicts (what
+the lists returned before), the projection's columns as dicts, and the
+projection as records. Reports time per 1k rows and the bytes the fetched
+rows keep alive per 1k rows.
+
+    python -m benchmarks.bench_records --scale 100k [--rows 1000] [--repeat 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+_WORKDIR = Path(tempfile.gettempdir()) / "bot-bench-records"
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+
+from app import db  # noqa: E402
+
+from .dataset import ensure_dataset, use_database  # noqa: E402
+
+PROJECTIONS = (db.OrderSummary, db.OrderLine, db.CartOrder)
+
+
+def _fetchers(record: type, rows: int) -> list[tuple[str, Callable[[], Any]]]:
+    columns = ", ".join(record._fields)
+    return [
+        ("SELECT * dicts", lambda: db.db_execute("SELECT * FROM orders ORDER BY id DESC LIMIT ?", (rows,), fetchall=True)),
+        ("projected dicts", lambda: db.db_execute(f"SELECT {columns} FROM orders ORDER BY id DESC LIMIT ?", (rows,), fetchall=True)),
+        ("records", lambda: db.db_execute(
+            f"SELECT {columns} FROM orders ORDER BY id DESC LIMIT ?", (rows,), fetchall=True, row_type=record
+        )),
+    ]
+
+
+def _time(fetch: Callable[[], Any], repeat: int) -> float:
+    fetch()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fetch()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def _retained_bytes(fetch: Callable[[], Any]) -> int:
+    fetch()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = fetch()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return after - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1M or an order count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--data-dir", default=str(Path(tempfile.gettempdir()) / "bot-bench"))
+    args = parser.parse_args()
+
+    dataset, _ = ensure_dataset(args.scale, args.seed, args.data_dir)
+    _WORKDIR.mkdir(parents=True, exist_ok=True)
+    work = _WORKDIR / "records.db"
+    shutil.copyfile(dataset, work)
+    use_database(work)
+    per_1k = 1000 / args.rows
+
+    header = f"{'projection':<14}{'fetch':<17}{'cols':>5}{'ms/1k':>9}{'KiB/1k':>10}{'time':>8}{'memory':>8}"
+    try:
+        print(header)
+        print("-" * len(header))
+        for record in PROJECTIONS:
+            base_t = base_kib = None
+            for label, fetch in _fetchers(record, args.rows):
+                cols = len(fetch()[0])
+                t = _time(fetch, args.repeat) * per_1k
+                kib = _retained_bytes(fetch) * per_1k / 1024
+                base_t, base_kib = base_t or t, base_kib or kib
+                print(
+                    f"{record.__name__:<14}{label:<17}{cols:>5}{t * 1000:>9.2f}{kib:>10.0f}"
+                    f"{t / base_t:>8.0%}{kib / base_kib:>8.0%}"
+                )
+    finally:
+        db.close_pool()
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Micro-benchmark for the keyboard / menu-text render cache.
+
+Compares the cached builders with their uncached originals (``__wrapped__``)
+for time per call and bytes allocated per call.
+
+    python -m benchmarks.bench_render_cache [--calls 20000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+import tracemalloc
+from typing import Any, Callable
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+
+from app.keyboards import ik_ai_confirm_purchase, ik_shop_main, reply_main  # noqa: E402
+from app.public.shop_ai import _mode_detail_text, _mode_menu  # noqa: E402
+from app.public.shop_tg import _premium_menu_text  # noqa: E402
+
+CASES: list[tuple[str, Callable[..., Any], tuple[Any, ...]]] = [
+    ("reply_main", reply_main, ()),
+    ("ik_shop_main", ik_shop_main, ()),
+    ("ik_ai_confirm_purchase", ik_ai_confirm_purchase, ("team", "my")),
+    ("tg premium menu text", _premium_menu_text, ()),
+    ("ai mode menu", _mode_menu, ("team",)),
+    ("ai mode detail text", _mode_detail_text, ("plus", "pre")),
+]
+
+
+def _time_per_call(fn: Callable[..., Any], args: tuple[Any, ...], calls: int) -> float:
+    fn(*args)
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(*args)
+    return (time.perf_counter() - start) / calls
+
+
+def _bytes_per_call(fn: Callable[..., Any], args: tuple[Any, ...], calls: int) -> float:
+    fn(*args)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = [fn(*args) for _ in range(calls)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return (after - before) / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    header = f"{'builder':<26}{'uncached µs':>14}{'cached µs':>12}{'speedup':>10}{'uncached B':>13}{'cached B':>11}"
+    print(header)
+    print("-" * len(header))
+    for name, fn, fn_args in CASES:
+        raw = fn.__wrapped__
+        t_raw = _time_per_call(raw, fn_args, args.calls)
+        t_hit = _time_per_call(fn, fn_args, args.calls)
+        mem_calls = min(args.calls, 2000)
+        b_raw = _bytes_per_call(raw, fn_args, mem_calls)
+        b_hit = _bytes_per_call(fn, fn_args, mem_calls)
+        print(
+            f"{name:<26}{t_raw * 1e6:>14.2f}{t_hit * 1e6:>12.2f}{t_raw / t_hit:>9.1f}x"
+            f"{b_raw:>13.0f}{b_hit:>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+"""Seedable synthetic dataset for benchmarking ``app/db.py``.
+
+Fills a scratch SQLite file (schema from ``init_db``) with users, orders in
+every ``ORDER_STATUS_LABELS`` state, wallet_tx, coupons and redemptions,
+discount codes and redemptions, service messages and blob index rows.
+``--scale`` is the number of orders; the other tables are sized from it.
+
+    python -m benchmarks.dataset --scale 100k --seed 1 --out /tmp/bench-100k.db
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Iterator
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+
+from app import db  # noqa: E402
+
+# bump when the generated data changes shape, so cached files are rebuilt
+DATASET_VERSION = 3
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+
+CHUNK = 5_000
+
+# (service_category, service_code, account_mode, price)
+PRODUCTS = [
+    ("AI", "team", "MY_ACCOUNT", 450_000),
+    ("AI", "team", "PREBUILT", 520_000),
+    ("AI", "plus", "MY_ACCOUNT", 980_000),
+    ("AI", "plus", "PREBUILT", 1_100_000),
+    ("AI", "google", "PREBUILT", 390_000),
+    ("TG", "premium_3m", "", 1_250_000),
+    ("TG", "premium_6m", "", 1_990_000),
+    ("TG", "premium_12m", "", 3_450_000),
+    ("TG", "ready_pre", "PREBUILT", 180_000),
+]
+
+# rough production mix: most orders finish, a tail is stuck in every other state
+STATUS_WEIGHTS = {
+    "AWAITING_PAYMENT": 6,
+    "PENDING_CONFIRM": 4,
+    "PENDING_PLAN": 1,
+    "PLAN_CONFIRMED": 1,
+    "APPROVED": 2,
+    "IN_PROGRESS": 4,
+    "READY_TO_DELIVER": 2,
+    "DELIVERED": 10,
+    "COMPLETED": 50,
+    "EXPIRED": 10,
+    "REJECTED": 4,
+    "CANCELED": 6,
+}
+
+SERVICE_CATEGORIES = ["BUILD_BOT", "OTHER_SERVICE", "TG_READY_COUNTRY"]
+
+FIRST_NAMES = ["علی", "مریم", "رضا", "زهرا", "حسین", "فاطمه", "امیر", "سارا", "مهدی", "نگار", "Sam", "Alex"]
+
+PAYMENT_TYPES = ["CARD", "WALLET", "MIXED", "FIRST_PLAN"]
+
+USER_ID_BASE = 100_000_000
+HISTORY_DAYS = 365
+
+
+def scale_size(scale: str | int) -> int:
+    if isinstance(scale, int):
+        return scale
+    if scale in SCALES:
+        return SCALES[scale]
+    return int(scale)
+
+
+def use_database(path: str | Path) -> None:
+    """Point ``app.db`` at ``path`` for the rest of the process."""
+
+    db.DB_PATH = str(path)
+
+
+def _iso(dt: datetime) -> str:
+    return dt.isoformat(timespec="seconds")
+
+
+def _chunks(rows: Iterator[tuple[Any, ...]], size: int = CHUNK) -> Iterator[list[tuple[Any, ...]]]:
+    batch: list[tuple[Any, ...]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Generator:
+    def __init__(self, orders: int, seed: int, now: datetime) -> None:
+        self.rng = random.Random(seed)
+        self.now = now
+        self.order_count = orders
+        self.user_count = max(orders // 5, 100)
+        self.coupon_count = max(orders // 500, 20)
+        self.discount_per_product = max(orders // 5_000, 5)
+        self.service_count = max(orders // 20, 50)
+        self.blob_count = max(orders // 50, 20)
+        self.first_order_id = max(int(db.ORDER_ID_MIN_VALUE or 0), 1)
+        self.discounts: list[tuple[int, str]] = []  # (id, product_key)
+        self.details: list[tuple[Any, ...]] = []  # order_details rows, filled by orders()
+        self.counts: dict[str, int] = {}
+
+    def _past(self, days: int = HISTORY_DAYS) -> datetime:
+        return self.now - timedelta(seconds=self.rng.randint(0, days * 86_400))
+
+    def users(self) -> Iterator[tuple[Any, ...]]:
+        rng = self.rng
+        for i in range(self.user_count):
+            created = self._past()
+            ref_by = USER_ID_BASE + rng.randrange(i) if i and rng.random() < 0.2 else None
+            verified = rng.random() < 0.7
+            yield (
+                USER_ID_BASE + i,
+                f"user{i}" if rng.random() < 0.8 else None,
+                rng.choice(FIRST_NAMES),
+                rng.randrange(0, 3_000_000, 10_000),
+                ref_by,
+                0,
+                rng.randrange(0, 500_000, 5_000) if rng.random() < 0.1 else 0,
+                _iso(created),
+                _iso(created),
+                f"+98912{rng.randrange(10**7):07d}" if verified else None,
+                1 if verified else 0,
+                _iso(created) if verified else None,
+                1 if rng.random() < 0.01 else 0,
+            )
+
+    def orders(self) -> Iterator[tuple[Any, ...]]:
+        rng = self.rng
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        for n in range(self.order_count):
+            oid = self.first_order_id + n
+            user_id = USER_ID_BASE + rng.randrange(self.user_count)
+            category, code, mode, price = rng.choice(PRODUCTS)
+            status = rng.choices(statuses, weights)[0]
+            created = self._past()
+            updated = min(created + timedelta(minutes=rng.randint(1, 4_000)), self.now)
+            payment_type = None if status == "AWAITING_PAYMENT" else rng.choice(PAYMENT_TYPES)
+            discount = rng.choice([0, 0, 0, 20_000, 50_000])
+            total = price - discount
+            wallet_used = 0
+            if payment_type == "WALLET":
+                wallet_used = total
+            elif payment_type == "MIXED":
+                wallet_used = rng.randrange(10_000, total, 10_000)
+            reserved = rng.choice([0, 0, 50_000]) if status == "AWAITING_PAYMENT" else 0
+            if status == "AWAITING_PAYMENT" and rng.random() < 0.33:
+                # still in someone's cart; the rest are waiting for the expiry loop
+                created = self.now - timedelta(seconds=rng.randint(0, 14 * 60))
+                updated = created
+            else:
+                created = min(created, self.now - timedelta(minutes=16))
+                updated = max(updated, created)
+            await_deadline = _iso(created + timedelta(minutes=15))
+            has_receipt = payment_type in {"CARD", "MIXED"} and status not in {"CANCELED", "EXPIRED"}
+            receipt_file_id = f"AgAC{oid:x}{rng.randrange(16**8):08x}" if has_receipt else None
+            receipt_text = "رسید پرداخت" if has_receipt and rng.random() < 0.3 else None
+            customer_message = "لطفا سریع" if rng.random() < 0.05 else None
+            if receipt_text or customer_message:
+                self.details.append((oid, receipt_text, customer_message, _iso(updated)))
+            yield (
+                oid,
+                user_id,
+                code,
+                f"{category} {code}",
+                str(price),
+                receipt_file_id,
+                status,
+                _iso(created),
+                _iso(updated),
+                category,
+                code,
+                mode,
+                f"user{user_id}@example.com" if mode == "MY_ACCOUNT" else "",
+                total,
+                "تومان",
+                payment_type,
+                wallet_used,
+                reserved,
+                await_deadline,
+                price,
+                discount,
+                f"desired_id=user{user_id}" if category == "TG" else "",
+                rng.randrange(0, price // 2, 1_000) if status in {"DELIVERED", "COMPLETED"} else 0,
+                f"{code}_{(mode or 'default').lower()}",
+                price,
+            )
+
+    def order_details(self) -> Iterator[tuple[Any, ...]]:
+        yield from self.details
+
+    def wallet_tx(self) -> Iterator[tuple[Any, ...]]:
+        rng = self.rng
+        types = ["CREDIT", "DEBIT", "RESERVE", "REFUND"]
+        for _ in range(self.order_count * 3 // 2):
+            tx_type = rng.choices(types, [5, 4, 2, 1])[0]
+            order_id = None if tx_type == "CREDIT" else self.first_order_id + rng.randrange(self.order_count)
+            yield (
+                USER_ID_BASE + rng.randrange(self.user_count),
+                order_id,
+                rng.randrange(10_000, 2_000_000, 10_000),
+                tx_type,
+                "bench",
+                _iso(self._past()),
+            )
+
+    def coupons(self) -> Iterator[tuple[Any, ...]]:
+        rng = self.rng
+        for i in range(self.coupon_count):
+            created = self._past()
+            expires = created + timedelta(days=rng.randint(-30, 120)) if rng.random() < 0.6 else None
+            yield (
+                i + 1,
+                f"CPN{i:05d}",
+                rng.randrange(10_000, 200_000, 10_000),
+                rng.randint(10, 5_000),
+                0,
+                1 if rng.random() < 0.85 else 0,
+                _iso(expires) if expires else None,
+                _iso(created),
+                _iso(created),
+            )
+
+    def coupon_redemptions(self) -> Iterator[tuple[Any, ...]]:
+        rng = self.rng
+        seen: set[tuple[int, int]] = set()
+        for _ in range(self.order_count // 20):
+            key = (rng.randint(1, self.coupon_count), USER_ID_BASE + rng.randrange(self.user_count))
+            if key in seen:
+                continue
+            seen.add(key)
+            yield key + (rng.randrange(10_000, 200_000, 10_000), _iso(self._past()))
+
+    def discount_codes(self) -> Iterator[tuple[Any, ...]]:
+        rng = self.rng
+        discount_id = 0
+        for category, code, mode, price in PRODUCTS:
+            product_key = db.normalize_product_key(category, code, mode)
+            for _ in range(self.discount_per_product):
+                discount_id += 1
+                created = self._past()
+                expires = created + timedelta(days=rng.randint(-30, 180)) if rng.random() < 0.5 else None
+                self.discounts.append((discount_id, product_key))
+                yield (
+                    discount_id,
+                    product_key,
+                    f"تخفیف {code}",
+                    f"OFF{discount_id:05d}",
+                    rng.choice([10_000, 20_000, 50_000, price // 10]),
+                    rng.randint(10, 10_000),
+                    0,
+                    1 if rng.random() < 0.9 else 0,
+                    _iso(expires) if expires else None,
+                    _iso(created),
+                    _iso(created),
+                )
+
+    def discount_redemptions(self) -> Iterator[tuple[Any, ...]]:
+        rng = self.rng
+        used: set[int] = set()
+        for _ in range(self.order_count // 10):
+            order_id = self.first_order_id + rng.randrange(self.order_count)
+            if order_id in used:
+                continue
+            used.add(order_id)
+            discount_id, _ = rng.choice(self.discounts)
+            applied = self._past()
+            confirmed = rng.random() < 0.7
+            yield (
+                discount_id,
+                order_id,
+                USER_ID_BASE + rng.randrange(self.user_count),
+                rng.choice([10_000, 20_000, 50_000]),
+                "CONFIRMED" if confirmed else "APPLIED",
+                _iso(applied),
+                _iso(applied + timedelta(minutes=5)) if confirmed else None,
+            )
+
+    def service_messages(self) -> Iterator[tuple[Any, ...]]:
+        rng = self.rng
+        for _ in range(self.service_count):
+            user = rng.randrange(self.user_count)
+            created = self._past()
+            yield (
+                USER_ID_BASE + user,
+                f"user{user}",
+                rng.choice(FIRST_NAMES),
+                rng.choice(SERVICE_CATEGORIES),
+                "یک ربات فروشگاهی با پنل مدیریت می‌خواهم. " * rng.randint(1, 6),
+                f"BQAC{rng.randrange(16**10):010x}" if rng.random() < 0.2 else "",
+                _iso(created),
+                _iso(created),
+                1 if rng.random() < 0.6 else 0,
+            )
+
+    def blobs(self) -> Iterator[tuple[Any, ...]]:
+        rng = self.rng
+        for i in range(self.blob_count):
+            seen = _iso(self._past(30))
+            yield (
+                f"AgACblob{i:08d}",
+                f"{rng.getrandbits(256):064x}",
+                rng.randint(20_000, 900_000),
+                "image/jpeg",
+                f"receipt_{i}.jpg",
+                1,
+                seen,
+                seen,
+            )
+
+
+_INSERTS = {
+    "users": (
+        "INSERT INTO users(user_id, username, first_name, wallet_balance, ref_by, ref_count, earnings_total,"
+        " created_at, updated_at, contact_phone, contact_verified, contact_shared_at, is_blocked)"
+        " VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?)"
+    ),
+    "orders": (
+        "INSERT INTO orders(id, user_id, plan_id, plan_title, price,"
+        " receipt_file_id, status, created_at, updated_at, service_category, service_code,"
+        " account_mode, customer_email, amount_total, currency, payment_type, wallet_used_amount,"
+        " wallet_reserved_amount, await_deadline, amount_subtotal, discount_amount, notes,"
+        " internal_cost, product_code, amount_original)"
+        " VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
+    ),
+    "order_details": (
+        "INSERT INTO order_details(order_id, receipt_text, customer_message, updated_at) VALUES(?,?,?,?)"
+    ),
+    "wallet_tx": "INSERT INTO wallet_tx(user_id, order_id, amount, type, note, created_at) VALUES(?,?,?,?,?,?)",
+    "coupons": (
+        "INSERT INTO coupons(id, code, amount, usage_limit, used_count, is_active, expires_at, created_at, updated_at)"
+        " VALUES(?,?,?,?,?,?,?,?,?)"
+    ),
+    "coupon_redemptions": "INSERT INTO coupon_redemptions(coupon_id, user_id, amount, redeemed_at) VALUES(?,?,?,?)",
+    "discount_codes": (
+        "INSERT INTO discount_codes(id, product_key, title, code, amount, usage_limit, used_count, is_active,"
+        " expires_at, created_at, updated_at) VALUES(?,?,?,?,?,?,?,?,?,?,?)"
+    ),
+    "discount_redemptions": (
+        "INSERT INTO discount_redemptions(discount_id, order_id, user_id, amount, status, applied_at, confirmed_at)"
+        " VALUES(?,?,?,?,?,?,?)"
+    ),
+    "service_messages": (
+        "INSERT INTO service_messages(user_id, username, first_name, category, message_text, attachment_file_id,"
+        " created_at, updated_at, is_resolved) VALUES(?,?,?,?,?,?,?,?,?)"
+    ),
+    "blobs": (
+        "INSERT INTO blobs(file_id, sha256, size, media_type, filename, has_thumb, created_at, last_access)"
+        " VALUES(?,?,?,?,?,?,?,?)"
+    ),
+}
+
+
+def generate(path: str | Path, scale: str | int = "10k", seed: int = 1) -> dict[str, Any]:
+    """Create ``path`` from scratch and return a summary (also saved next to it)."""
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for stale in (path, Path(f"{path}-journal"), _meta_path(path)):
+        if stale.exists():
+            stale.unlink()
+
+    started = time.perf_counter()
+    use_database(path)
+    db.init_db()
+
+    gen = _Generator(scale_size(scale), seed, datetime.now().replace(microsecond=0))
+    with closing(sqlite3.connect(path)) as con:
+        con.execute("PRAGMA synchronous=OFF")
+        for table, sql in _INSERTS.items():
+            total = 0
+            for batch in _chunks(getattr(gen, table)()):
+                con.executemany(sql, batch)
+                total += len(batch)
+            gen.counts[table] = total
+        con.execute(
+            "UPDATE coupons SET used_count=(SELECT COUNT(*) FROM coupon_redemptions r WHERE r.coupon_id=coupons.id)"
+        )
+        con.execute(
+            "UPDATE discount_codes SET used_count=(SELECT COUNT(*) FROM discount_redemptions r"
+            " WHERE r.discount_id=discount_codes.id AND r.status='CONFIRMED')"
+        )
+        con.execute(
+            "INSERT OR REPLACE INTO sqlite_sequence(name, seq) VALUES('orders', ?)",
+            (gen.first_order_id + gen.order_count - 1,),
+        )
+        con.commit()
+        con.execute("ANALYZE")
+
+    meta = {
+        "version": DATASET_VERSION,
+        "scale": str(scale),
+        "orders": gen.order_count,
+        "seed": seed,
+        "generated_at": _iso(gen.now),
+        "generate_seconds": round(time.perf_counter() - started, 2),
+        "counts": gen.counts,
+        "size_bytes": path.stat().st_size,
+    }
+    _meta_path(path).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return meta
+
+
+def _meta_path(path: Path) -> Path:
+    return path.with_name(path.name + ".meta.json")
+
+
+def load_meta(path: str | Path) -> dict[str, Any] | None:
+    meta_file = _meta_path(Path(path))
+    if not Path(path).exists() or not meta_file.exists():
+        return None
+    return json.loads(meta_file.read_text(encoding="utf-8"))
+
+
+def ensure_dataset(scale: str | int, seed: int, directory: str | Path) -> tuple[Path, dict[str, Any]]:
+    """Reuse ``directory/bench-<scale>-s<seed>.db`` when it matches, else generate it."""
+
+    path = Path(directory) / f"bench-{scale}-s{seed}.db"
+    meta = load_meta(path)
+    if not meta or meta.get("version") != DATASET_VERSION:
+        meta = generate(path, scale, seed)
+    return path, meta
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1M or an order count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", required=True, help="SQLite file to (re)create")
+    args = parser.parse_args()
+    meta = generate(args.out, args.scale, args.seed)
+    print(json.dumps(meta, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
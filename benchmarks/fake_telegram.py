@@ -0,0 +1,371 @@
+"""Local fake of the Telegram Bot API for load tests.
+
+Serves ``/bot<token>/<method>`` and ``/file/bot<token>/<path>`` like
+api.telegram.org, so both the aiogram ``Bot`` (``create_bot(api_base=...)``
+or ``TELEGRAM_API_BASE``) and the admin panel's httpx file cache can be
+pointed at it. Updates are queued with ``push_update`` (or
+``POST /_fake/updates``) and handed out through ``getUpdates`` long polling.
+
+* ``latency`` / ``jitter``: seconds added to every method except getUpdates
+* ``rate_limit``: share of send*/edit*/copy* calls answered with 429 + ``retry_after``
+* ``record``: JSONL file receiving one line per API call
+
+Standalone, with the bot started against it::
+
+    python -m benchmarks.fake_telegram --port 8081 --latency-ms 40 --rate-limit 0.02
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 python bot.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from aiohttp import web
+
+BOT_USER = {"id": 1_000_000, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+RATE_LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+# methods whose reply the customers in load_bot.py wait for
+VISIBLE_METHODS = {"sendMessage", "sendPhoto", "sendDocument", "editMessageText", "editMessageCaption", "editMessageReplyMarkup"}
+
+# 1x1 PNG served for every file download, so thumbnailing works on the result
+PIXEL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+
+@dataclass
+class Outgoing:
+    method: str
+    chat_id: int
+    text: str
+    reply_markup: dict[str, Any] | None
+    at: float = field(default_factory=time.perf_counter)
+
+    def callback_data(self) -> list[str]:
+        rows = (self.reply_markup or {}).get("inline_keyboard") or []
+        return [button["callback_data"] for row in rows for button in row if button.get("callback_data")]
+
+
+def _decode(value: Any) -> Any:
+    if not isinstance(value, str) or value[:1] not in ("{", "["):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _int(value: Any, default: int = 0) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class FakeTelegram:
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit: float = 0.0,
+        retry_after: int = 1,
+        record: str | Path | None = None,
+        seed: int = 1,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.record_path = Path(record) if record else None
+        self._random = random.Random(seed)
+        self._updates: list[dict[str, Any]] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._query_ids = itertools.count(1)
+        self._new_update = asyncio.Event()
+        self._watchers: dict[int, asyncio.Queue[Outgoing]] = {}
+        self._callback_chats: dict[str, int] = {}
+        self.calls: Counter[str] = Counter()
+        self.rate_limited: Counter[str] = Counter()
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        self._record_file = None
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    # ---- lifecycle ----
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=20 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self._handle_method)
+        app.router.add_get("/file/bot{token}/{path:.+}", self._handle_file)
+        app.router.add_post("/_fake/updates", self._handle_push)
+        app.router.add_get("/_fake/traffic", self._handle_traffic)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        if self.record_path is not None:
+            self.record_path.parent.mkdir(parents=True, exist_ok=True)
+            self._record_file = self.record_path.open("a", encoding="utf-8")
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._record_file is not None:
+            self._record_file.close()
+            self._record_file = None
+
+    # ---- update injection ----
+
+    def watch(self, chat_id: int) -> asyncio.Queue[Outgoing]:
+        """Queue receiving every visible bot reply addressed to ``chat_id``."""
+
+        return self._watchers.setdefault(chat_id, asyncio.Queue())
+
+    def push_update(self, payload: dict[str, Any]) -> int:
+        update_id = next(self._update_ids)
+        callback = payload.get("callback_query")
+        if callback:
+            self._callback_chats[callback["id"]] = callback["from"]["id"]
+        self._updates.append({"update_id": update_id, **payload})
+        self._new_update.set()
+        return update_id
+
+    def _sender(self, user_id: int) -> dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "username": f"user{user_id}"}
+
+    def push_text(self, user_id: int, text: str) -> int:
+        message = self._message(user_id, text=text)
+        message["from"] = self._sender(user_id)
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return self.push_update({"message": message})
+
+    def push_photo(self, user_id: int, caption: str = "") -> int:
+        message = self._message(user_id)
+        message["from"] = self._sender(user_id)
+        message["photo"] = [self._photo_size()]
+        if caption:
+            message["caption"] = caption
+        return self.push_update({"message": message})
+
+    def push_callback(self, user_id: int, data: str, message_id: int = 1) -> int:
+        query_id = f"cq{next(self._query_ids)}"
+        return self.push_update(
+            {
+                "callback_query": {
+                    "id": query_id,
+                    "from": self._sender(user_id),
+                    "chat_instance": str(user_id),
+                    "data": data,
+                    "message": {**self._message(user_id, text="…"), "message_id": message_id, "from": BOT_USER},
+                }
+            }
+        )
+
+    # ---- Bot API ----
+
+    def _message(self, chat_id: int, **extra: Any) -> dict[str, Any]:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "channel"},
+            **extra,
+        }
+
+    def _photo_size(self) -> dict[str, Any]:
+        n = next(self._file_ids)
+        return {"file_id": f"fake-file-{n}", "file_unique_id": f"u{n}", "width": 1, "height": 1, "file_size": len(PIXEL_PNG)}
+
+    async def _params(self, request: web.Request) -> dict[str, Any]:
+        params: dict[str, Any] = dict(request.query)
+        if request.method == "POST":
+            if request.content_type == "application/json":
+                params.update(await request.json())
+            else:
+                for key, value in (await request.post()).items():
+                    params[key] = value if isinstance(value, str) else "<upload>"
+        return {key: _decode(value) for key, value in params.items()}
+
+    async def _get_updates(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        offset = _int(params.get("offset"))
+        if offset:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout=min(_int(params.get("timeout")), 30))
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[: _int(params.get("limit"), 100) or 100]
+
+    def _result(self, method: str, params: dict[str, Any]) -> Any:
+        chat_id = _int(params.get("chat_id"))
+        if method == "getMe":
+            return BOT_USER
+        if method in {"sendMessage", "editMessageText"}:
+            return {**self._message(chat_id, text=params.get("text", "")), "from": BOT_USER}
+        if method in {"sendPhoto", "editMessageCaption"}:
+            return {**self._message(chat_id, photo=[self._photo_size()]), "from": BOT_USER}
+        if method == "sendDocument":
+            n = next(self._file_ids)
+            return {**self._message(chat_id, document={"file_id": f"fake-file-{n}", "file_unique_id": f"u{n}"}), "from": BOT_USER}
+        if method == "editMessageReplyMarkup":
+            return {**self._message(chat_id, text="…"), "from": BOT_USER}
+        if method == "copyMessage":
+            return {"message_id": next(self._message_ids)}
+        if method == "getChatMember":
+            return {"status": "member", "user": self._sender(_int(params.get("user_id")))}
+        if method == "getChat":
+            return {"id": chat_id, "type": "private" if chat_id > 0 else "channel"}
+        if method == "getFile":
+            file_id = str(params.get("file_id") or "")
+            return {"file_id": file_id, "file_unique_id": file_id, "file_size": len(PIXEL_PNG), "file_path": f"photos/{file_id}.png"}
+        return True
+
+    def _notify(self, method: str, params: dict[str, Any]) -> None:
+        if method == "answerCallbackQuery":
+            # only alerts are something a customer has to react to
+            if not params.get("show_alert"):
+                return
+            chat_id = self._callback_chats.get(str(params.get("callback_query_id")), 0)
+        elif method in VISIBLE_METHODS:
+            chat_id = _int(params.get("chat_id"))
+        else:
+            return
+        queue = self._watchers.get(chat_id)
+        if queue is not None:
+            markup = params.get("reply_markup")
+            queue.put_nowait(
+                Outgoing(
+                    method,
+                    chat_id,
+                    str(params.get("text") or params.get("caption") or ""),
+                    markup if isinstance(markup, dict) else None,
+                )
+            )
+
+    def _record(self, method: str, status: int, started: float, params: dict[str, Any]) -> None:
+        elapsed = time.perf_counter() - started
+        self.calls[method] += 1
+        self.durations[method].append(elapsed)
+        if self._record_file is not None:
+            line = {"ts": round(time.time(), 6), "method": method, "status": status, "ms": round(elapsed * 1000, 3), "params": params}
+            self._record_file.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+
+    async def _handle_method(self, request: web.Request) -> web.Response:
+        started = time.perf_counter()
+        method = request.match_info["method"]
+        params = await self._params(request)
+        if method == "getUpdates":
+            result = await self._get_updates(params)
+            self._record(method, 200, started, {"offset": params.get("offset"), "count": len(result)})
+            return web.json_response({"ok": True, "result": result})
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+        if self.rate_limit and method.startswith(RATE_LIMITED_PREFIXES) and self._random.random() < self.rate_limit:
+            self.rate_limited[method] += 1
+            self._record(method, 429, started, params)
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                },
+                status=429,
+            )
+        result = self._result(method, params)
+        self._notify(method, params)
+        self._record(method, 200, started, params)
+        return web.json_response({"ok": True, "result": result})
+
+    async def _handle_file(self, request: web.Request) -> web.Response:
+        started = time.perf_counter()
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+        self._record("<file>", 200, started, {"path": request.match_info["path"]})
+        return web.Response(body=PIXEL_PNG, content_type="image/png")
+
+    async def _handle_push(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        items = payload if isinstance(payload, list) else [payload]
+        return web.json_response({"ok": True, "result": [self.push_update(item) for item in items]})
+
+    async def _handle_traffic(self, request: web.Request) -> web.Response:
+        return web.json_response(self.traffic())
+
+    def traffic(self) -> dict[str, Any]:
+        methods = {}
+        for method, count in sorted(self.calls.items()):
+            samples = sorted(self.durations[method])
+            methods[method] = {
+                "calls": count,
+                "rate_limited": self.rate_limited.get(method, 0),
+                "median_ms": round(samples[len(samples) // 2] * 1000, 3),
+                "max_ms": round(samples[-1] * 1000, 3),
+            }
+        return {
+            "calls": sum(self.calls.values()),
+            "rate_limited": sum(self.rate_limited.values()),
+            "pending_updates": len(self._updates),
+            "methods": methods,
+        }
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    fake = FakeTelegram(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        record=args.record,
+    )
+    url = await fake.start(args.host, args.port)
+    print(f"fake Bot API on {url} (TELEGRAM_API_BASE={url})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await fake.close()
+        print(json.dumps(fake.traffic(), indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of send/edit calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--record", help="append every API call to this JSONL file")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
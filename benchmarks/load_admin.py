@@ -0,0 +1,229 @@
+"""Read throughput of the admin panel under 1..N uvicorn worker processes.
+
+Serves ``app.webadmin.server:create_admin_app`` with ``uvicorn --workers N``
+against a scratch copy of a synthetic dataset (see ``benchmarks.dataset``)
+and hammers it from ``--clients`` processes, each keeping ``--concurrency``
+logged-in requests in flight, over a mix of list and detail pages. Reports
+requests/sec, latency percentiles and the speed-up over one worker. Reads
+only scale with real cores: keep ``--workers`` plus ``--clients`` within
+``os.cpu_count()``.
+
+    python -m benchmarks.load_admin --scale 100k --workers 1,2,4 --clients 4 --duration 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+_WORKDIR = Path(tempfile.gettempdir()) / "bot-load-admin"
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+# keep the workers away from the real Bot API and the real file cache
+os.environ.setdefault("TELEGRAM_API_BASE", "http://127.0.0.1:9")
+os.environ.setdefault("ADMIN_FILE_CACHE_DIR", str(_WORKDIR / "file_cache"))
+
+import httpx  # noqa: E402
+
+from app.config import ADMIN_WEB_PASS, ADMIN_WEB_USER  # noqa: E402
+
+from .bench_db import _git_rev  # noqa: E402
+from .dataset import ensure_dataset  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _targets(db_path: Path, seed: int, count: int = 2000) -> list[str]:
+    """A fixed, mostly cache-missing mix of pages: list pages, order and user details."""
+
+    con = sqlite3.connect(db_path)
+    try:
+        orders = [row[0] for row in con.execute("SELECT id FROM orders ORDER BY random() LIMIT ?", (count,))]
+        users = [row[0] for row in con.execute("SELECT user_id FROM users ORDER BY random() LIMIT ?", (count,))]
+        order_pages = max(con.execute("SELECT COUNT(*) FROM orders").fetchone()[0] // 20, 1)
+        user_pages = max(con.execute("SELECT COUNT(*) FROM users").fetchone()[0] // 20, 1)
+    finally:
+        con.close()
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        pick = rng.random()
+        if pick < 0.35:
+            paths.append(f"/orders/{rng.choice(orders)}")
+        elif pick < 0.6:
+            paths.append(f"/orders?page={rng.randint(1, min(order_pages, 500))}")
+        elif pick < 0.85:
+            paths.append(f"/users/{rng.choice(users)}")
+        else:
+            paths.append(f"/users?page={rng.randint(1, min(user_pages, 500))}")
+    return paths
+
+
+def _serve(workers: int, port: int, db_path: Path) -> subprocess.Popen:
+    env = dict(os.environ, DB_PATH=str(db_path))
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.webadmin.server:create_admin_app", "--factory",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+            "--log-level", "warning", "--no-access-log",
+        ],
+        env=env,
+    )
+
+
+def _wait_ready(base: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base}/login", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"admin app did not come up at {base}")
+
+
+async def _client(base: str, paths: list[str], concurrency: int, warmup: float, duration: float, seed: int) -> dict[str, Any]:
+    rng = random.Random(seed)
+    latencies: list[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30.0) as client:
+        await client.post("/login", data={"username": ADMIN_WEB_USER, "password": ADMIN_WEB_PASS})
+        start = time.perf_counter()
+        measure_from = start + warmup
+        stop_at = measure_from + duration
+
+        async def worker() -> None:
+            nonlocal errors
+            while True:
+                began = time.perf_counter()
+                if began >= stop_at:
+                    return
+                try:
+                    response = await client.get(rng.choice(paths), headers={"Accept-Encoding": "gzip"})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if began >= measure_from:
+                    if ok:
+                        latencies.append(time.perf_counter() - began)
+                    else:
+                        errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"latencies": latencies, "errors": errors}
+
+
+def _client_process(args: tuple[str, list[str], int, float, float, int]) -> dict[str, Any]:
+    return asyncio.run(_client(*args))
+
+
+def run(workers: int, db_path: Path, paths: list[str], args: argparse.Namespace) -> dict[str, Any]:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = _serve(workers, port, db_path)
+    try:
+        _wait_ready(base)
+        jobs = [(base, paths, args.concurrency, args.warmup, args.duration, args.seed + i) for i in range(args.clients)]
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            parts = pool.map(_client_process, jobs)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    latencies = sorted(x for part in parts for x in part["latencies"])
+    errors = sum(part["errors"] for part in parts)
+    if not latencies:
+        return {"workers": workers, "requests": 0, "errors": errors, "rps": 0.0}
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / args.duration, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1M or an order count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to run in turn")
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight per client process")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--data-dir", default=str(Path(tempfile.gettempdir()) / "bot-bench"))
+    parser.add_argument("--out", help="JSON results file (default: benchmarks/results/load-admin-<scale>-<time>.json)")
+    parser.add_argument("--keep", action="store_true", help=f"keep the scratch database under {_WORKDIR}")
+    args = parser.parse_args()
+
+    dataset, meta = ensure_dataset(args.scale, args.seed, args.data_dir)
+    _WORKDIR.mkdir(parents=True, exist_ok=True)
+    work = _WORKDIR / "admin.db"
+    shutil.copyfile(dataset, work)
+    paths = _targets(work, args.seed)
+    counts = [int(x) for x in args.workers.split(",") if x.strip()]
+    cores = os.cpu_count() or 1
+    if max(counts) + args.clients > cores:
+        print(f"note: {cores} CPU(s) for up to {max(counts)} workers + {args.clients} clients; scaling will flatten")
+
+    results = []
+    try:
+        for workers in counts:
+            r = run(workers, work, paths, args)
+            base_rps = results[0]["rps"] if results else r["rps"]
+            r["speedup"] = round(r["rps"] / base_rps, 2) if base_rps else 0.0
+            results.append(r)
+            print(
+                f"workers={workers:<3}{r['rps']:>9.1f} req/s  p50 {r.get('p50_ms', 0):.1f} ms  "
+                f"p95 {r.get('p95_ms', 0):.1f} ms  errors {r['errors']}  x{r['speedup']:.2f}"
+            )
+    finally:
+        if not args.keep:
+            shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "dataset": meta,
+            "clients": args.clients,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "cpu_count": cores,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    out = Path(args.out) if args.out else RESULTS_DIR / f"load-admin-{args.scale}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nresults: {out}")
+
+
+if __name__ == "__main__":
+    main()
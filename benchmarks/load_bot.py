@@ -0,0 +1,334 @@
+"""Concurrent-customer load test of ``app/main.py`` against the fake Bot API.
+
+Starts ``FakeTelegram`` in-process, runs the real dispatcher (``build_dispatcher``)
+with long polling against it, and lets ``--customers`` simulated users walk
+
+    /start → products → Telegram ready account → buy → pay by card
+    → no discount → receipt photo → comment → confirm
+
+``--concurrency`` of them at a time. Reports updates/sec, handler latency
+percentiles (dispatcher middleware, per update type) and end-to-end step
+latency (update queued → matching reply seen by the fake server).
+
+    python -m benchmarks.load_bot --customers 200 --concurrency 50 --latency-ms 30 --rate-limit 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+_WORKDIR = Path(tempfile.gettempdir()) / "bot-load"
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("BLOB_STORE_DIR", str(_WORKDIR / "blob_store"))
+
+from aiogram.types import TelegramObject  # noqa: E402
+
+from app import db  # noqa: E402
+from app.capture import UpdateCapture  # noqa: E402
+from app.catalog import get_variant  # noqa: E402
+from app.config import create_bot  # noqa: E402
+from app.keyboards import REPLY_BTN_PRODUCTS  # noqa: E402
+from app.main import build_dispatcher, setup_bot_menu  # noqa: E402
+from app.middlewares import UpdateCaptureMiddleware  # noqa: E402
+from app.prefetch import prefetch_worker  # noqa: E402
+
+from .dataset import USER_ID_BASE, use_database  # noqa: E402
+from .fake_telegram import FakeTelegram, Outgoing  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+CUSTOMER_ID_BASE = USER_ID_BASE + 50_000_000
+
+
+class StepFailed(Exception):
+    pass
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 3)  # noqa: E731
+    return {
+        "n": len(ordered),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+class HandlerTimer:
+    """Outer ``dp.update`` middleware recording how long each update took to handle.
+
+    Also tracks updates still being handled per user, so a customer does not
+    send its next update while the handler that replied is still running
+    (e.g. before it has switched FSM state). A human could not type that fast.
+    """
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors = 0
+        self._in_flight: dict[int, int] = defaultdict(int)
+        self._idle: dict[int, asyncio.Event] = {}
+
+    def _event(self, user_id: int) -> asyncio.Event:
+        event = self._idle.get(user_id)
+        if event is None:
+            event = self._idle[user_id] = asyncio.Event()
+            event.set()
+        return event
+
+    async def idle(self, user_id: int) -> None:
+        await self._event(user_id).wait()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is not None:
+            self._in_flight[user.id] += 1
+            self._event(user.id).clear()
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.samples[event.event_type].append(time.perf_counter() - start)
+            if user is not None:
+                self._in_flight[user.id] -= 1
+                if not self._in_flight[user.id]:
+                    self._idle[user.id].set()
+
+
+class Customer:
+    def __init__(self, fake: FakeTelegram, timer: HandlerTimer, user_id: int, timeout: float) -> None:
+        self.fake = fake
+        self.timer = timer
+        self.user_id = user_id
+        self.timeout = timeout
+        self.inbox = fake.watch(user_id)
+        self.steps: dict[str, float] = {}
+
+    async def _expect(self, step: str, push: Callable[[], int], *, button: str | None = None, text: str | None = None) -> Outgoing:
+        await self.timer.idle(self.user_id)
+        # replies still in flight from the previous step must not satisfy this one
+        while not self.inbox.empty():
+            self.inbox.get_nowait()
+        start = time.perf_counter()
+        push()
+        deadline = start + self.timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise StepFailed(f"{step}: no reply within {self.timeout}s")
+            try:
+                reply = await asyncio.wait_for(self.inbox.get(), remaining)
+            except asyncio.TimeoutError:
+                continue
+            if reply.method == "answerCallbackQuery":
+                raise StepFailed(f"{step}: alert {reply.text!r}")
+            if button is not None and not any(re.match(button, data) for data in reply.callback_data()):
+                continue
+            if text is not None and text not in reply.text:
+                continue
+            self.steps[step] = reply.at - start
+            return reply
+
+    async def walk(self) -> None:
+        uid = self.user_id
+        fake = self.fake
+        await self._expect("start", lambda: fake.push_text(uid, "/start"), text="خوش آمدید")
+        await self._expect("products", lambda: fake.push_text(uid, REPLY_BTN_PRODUCTS), button="shop:tg$")
+        await self._expect("shop_tg", lambda: fake.push_callback(uid, "shop:tg"), button="tg:ready$")
+        await self._expect("tg_ready", lambda: fake.push_callback(uid, "tg:ready"), button="tg:ready:pre$")
+        await self._expect("tg_ready_pre", lambda: fake.push_callback(uid, "tg:ready:pre"), button="tg:ready:pre:buy$")
+        reply = await self._expect("buy", lambda: fake.push_callback(uid, "tg:ready:pre:buy"), button=r"cart:paycard:\d+$")
+        order_id = next(
+            int(data.rsplit(":", 1)[1]) for data in reply.callback_data() if data.startswith("cart:paycard:")
+        )
+        await self._expect(
+            "paycard",
+            lambda: fake.push_callback(uid, f"cart:paycard:{order_id}"),
+            button=f"cart:discount:no:card:{order_id}$",
+        )
+        await self._expect(
+            "no_discount",
+            lambda: fake.push_callback(uid, f"cart:discount:no:card:{order_id}"),
+            button=f"cart:cancel:{order_id}$",
+        )
+        await self._expect("receipt", lambda: fake.push_photo(uid), text="توضیح")
+        await self._expect(
+            "comment", lambda: fake.push_text(uid, "بدون توضیح"), button=f"cart:rcpt:confirm:{order_id}$"
+        )
+        await self._expect(
+            "confirm", lambda: fake.push_callback(uid, f"cart:rcpt:confirm:{order_id}"), text=f"#{order_id}"
+        )
+
+
+def _prepare_database(path: Path, customers: int) -> None:
+    if path.exists():
+        path.unlink()
+    use_database(path)
+    db.init_db()
+    for i in range(customers):
+        uid = CUSTOMER_ID_BASE + i
+        db.ensure_user(uid, f"user{uid}", f"user{uid}")
+        db.set_user_contact_verified(uid, f"+98912{i:07d}")
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    variant = get_variant("tg_ready_pre")
+    if not variant["available"] or int(variant["amount"]) <= 0:
+        raise SystemExit("tg_ready_pre must be available with a price (PRICE_TG_READY_PRE / AVAILABLE_TG_READY_PRE)")
+
+    _WORKDIR.mkdir(parents=True, exist_ok=True)
+    _prepare_database(_WORKDIR / "load.db", args.customers)
+
+    fake = FakeTelegram(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        record=args.record,
+        seed=args.seed,
+    )
+    base_url = await fake.start()
+    bot = create_bot(api_base=base_url)
+    dp = build_dispatcher()
+    timer = HandlerTimer()
+    dp.update.outer_middleware(timer)
+    capture = UpdateCapture(args.capture) if args.capture else None
+    if capture is not None:
+        dp.update.outer_middleware(UpdateCaptureMiddleware(capture))
+
+    await setup_bot_menu(bot)
+    background = [
+        asyncio.create_task(dp.start_polling(bot, polling_timeout=5, handle_signals=False)),
+        asyncio.create_task(prefetch_worker(bot)),
+    ]
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    customers = [Customer(fake, timer, CUSTOMER_ID_BASE + i, args.step_timeout) for i in range(args.customers)]
+    failures: list[str] = []
+
+    async def one(customer: Customer) -> None:
+        async with semaphore:
+            try:
+                await customer.walk()
+            except StepFailed as exc:
+                failures.append(f"{customer.user_id} {exc}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(c) for c in customers))
+    wall = time.perf_counter() - started
+
+    await dp.stop_polling()
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await bot.session.close()
+    await fake.close()
+    if capture is not None:
+        capture.close()
+
+    steps: dict[str, list[float]] = defaultdict(list)
+    for customer in customers:
+        for step, elapsed in customer.steps.items():
+            steps[step].append(elapsed)
+    handled = sum(len(samples) for samples in timer.samples.values())
+    return {
+        "meta": {
+            "customers": args.customers,
+            "concurrency": args.concurrency,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "rate_limit": args.rate_limit,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "wall_s": round(wall, 3),
+        "updates": handled,
+        "updates_per_s": round(handled / wall, 1) if wall else 0.0,
+        "completed": args.customers - len(failures),
+        "failed": failures,
+        "handler_errors": timer.errors,
+        "handler": {kind: _percentiles(samples) for kind, samples in sorted(timer.samples.items())},
+        "handler_all": _percentiles([s for samples in timer.samples.values() for s in samples]),
+        "steps": {step: _percentiles(samples) for step, samples in steps.items()},
+        "telegram": fake.traffic(),
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print(
+        f"{report['completed']}/{report['meta']['customers']} customers completed in {report['wall_s']}s — "
+        f"{report['updates']} updates, {report['updates_per_s']} updates/s, "
+        f"{report['handler_errors']} handler errors"
+    )
+    header = f"{'':<22}{'n':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    rows = [("handler (all)", report["handler_all"])]
+    rows += [(f"handler {kind}", stats) for kind, stats in report["handler"].items()]
+    rows += [(f"step {step}", stats) for step, stats in report["steps"].items()]
+    print(header)
+    print("-" * len(header))
+    for name, stats in rows:
+        if not stats.get("n"):
+            continue
+        print(
+            f"{name:<22}{stats['n']:>7}{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}"
+            f"{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}"
+        )
+    traffic = report["telegram"]
+    print(f"\nBot API: {traffic['calls']} calls, {traffic['rate_limited']} answered 429")
+    for method, stats in traffic["methods"].items():
+        print(f"  {method:<24}{stats['calls']:>7}{stats['rate_limited']:>6} x429")
+    for failure in report["failed"][:10]:
+        print("failed:", failure)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake Bot API latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of send/edit calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--step-timeout", type=float, default=15.0)
+    parser.add_argument("--record", help="JSONL file receiving every Bot API call")
+    parser.add_argument("--capture", help="also write the updates as a replayable gzip JSONL capture")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="JSON results file (default: benchmarks/results/load-<time>.json)")
+    parser.add_argument("--keep", action="store_true", help=f"keep the scratch database under {_WORKDIR}")
+    args = parser.parse_args()
+
+    # aiogram logs every handled update at INFO
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    report = asyncio.run(run(args))
+    _print_report(report)
+    out = Path(args.out) if args.out else RESULTS_DIR / f"load-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nresults: {out}")
+    if not args.keep:
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
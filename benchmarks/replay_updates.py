@@ -0,0 +1,322 @@
+"""Replay a captured update stream against a copy of the database.
+
+Reads a capture written by the bot with ``UPDATE_CAPTURE_PATH`` set, copies
+``--db`` (default ``DB_PATH``) into a scratch file, runs ``init_db`` on the
+copy, and feeds every update through the current build's dispatcher with
+``Dispatcher.feed_update``. Bot API calls go to the in-process fake server.
+
+``--speed 1`` keeps the recorded spacing (idle gaps clamped to ``--max-gap``),
+``--speed 10`` compresses it tenfold and ``--speed max`` sends updates as fast
+as handlers accept them. Updates from the same user are handled in order.
+
+Reports handler latency and SQLite statements per update, overall and per
+update kind, next to the latency measured when the capture was recorded::
+
+    python -m benchmarks.replay_updates captures/sale-day.jsonl.gz --speed 10
+    python -m benchmarks.replay_updates captures/sale-day.jsonl.gz --speed max --compare old.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+_WORKDIR = Path(tempfile.gettempdir()) / "bot-replay"
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("BLOB_STORE_DIR", str(_WORKDIR / "blob_store"))
+
+from aiogram.types import Update  # noqa: E402
+
+from app import db  # noqa: E402
+from app.capture import read_capture  # noqa: E402
+from app.config import DB_PATH, create_bot  # noqa: E402
+from app.main import build_dispatcher  # noqa: E402
+
+from .dataset import use_database  # noqa: E402
+from .fake_telegram import FakeTelegram  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+_CONTROL_STATEMENTS = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK")
+
+_queries: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar("replay_queries", default=None)
+
+
+def _count_statement(sql: str) -> None:
+    counter = _queries.get()
+    if counter is None:
+        return
+    counter[1] += 1
+    if not sql.lstrip().upper().startswith(_CONTROL_STATEMENTS):
+        counter[0] += 1
+
+
+def update_kind(update: dict[str, Any]) -> str:
+    """Coarse label used to group results, e.g. ``callback:cart`` or ``message:/start``."""
+
+    if "callback_query" in update:
+        data = update["callback_query"].get("data") or ""
+        return "callback:" + (data.split(":", 1)[0] or "?")
+    message = update.get("message") or update.get("edited_message")
+    if message is not None:
+        text = message.get("text") or ""
+        if text.startswith("/"):
+            return "message:" + text.split()[0].split("@")[0]
+        for kind in ("photo", "document", "contact", "video", "voice", "sticker"):
+            if kind in message:
+                return f"message:{kind}"
+        return "message:text"
+    keys = [key for key in update if key != "update_id"]
+    return keys[0] if keys else "unknown"
+
+
+def _user_id(update: dict[str, Any]) -> int:
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(value.get("from"), dict):
+            return int(value["from"].get("id") or 0)
+    return 0
+
+
+def _copy_database(source: Path, target: Path) -> None:
+    if target.exists():
+        target.unlink()
+    with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(target)) as dst:
+        src.backup(dst)
+
+
+def _summary(samples: list[float], scale: float = 1000.0) -> dict[str, float]:
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * scale, 3)  # noqa: E731
+    return {
+        "n": len(ordered),
+        "mean": round(statistics.fmean(ordered) * scale, 3),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(ordered[-1] * scale, 3),
+    }
+
+
+def load_records(path: str | Path, limit: int | None = None) -> list[dict[str, Any]]:
+    records = []
+    for record in read_capture(path):
+        records.append(record)
+        if limit and len(records) >= limit:
+            break
+    return records
+
+
+def schedule(records: list[dict[str, Any]], speed: float, max_gap: float) -> list[float]:
+    """Offsets (seconds from replay start) at which each record is fed."""
+
+    if not speed:
+        return [0.0] * len(records)
+    offsets, offset, previous = [], 0.0, None
+    for record in records:
+        ts = float(record.get("ts") or 0.0)
+        if previous is not None:
+            offset += min(max(ts - previous, 0.0), max_gap) / speed
+        previous = ts
+        offsets.append(offset)
+    return offsets
+
+
+async def replay(records: list[dict[str, Any]], args: argparse.Namespace) -> dict[str, Any]:
+    fake = FakeTelegram(latency=args.latency_ms / 1000, seed=args.seed)
+    base_url = await fake.start()
+    bot = create_bot(api_base=base_url)
+    dp = build_dispatcher()
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    queries: dict[str, list[float]] = defaultdict(list)
+    statements: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    locks: dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def handle(record: dict[str, Any]) -> None:
+        raw = record["update"]
+        kind = update_kind(raw)
+        try:
+            update = Update.model_validate(raw, context={"bot": bot})
+        except ValueError:
+            errors[kind] += 1
+            semaphore.release()
+            return
+        try:
+            async with locks[_user_id(raw)]:
+                counter = [0, 0]
+                token = _queries.set(counter)
+                start = time.perf_counter()
+                try:
+                    await dp.feed_update(bot, update)
+                except Exception:
+                    errors[kind] += 1
+                finally:
+                    latencies[kind].append(time.perf_counter() - start)
+                    _queries.reset(token)
+                queries[kind].append(counter[0])
+                statements[kind].append(counter[1])
+        finally:
+            semaphore.release()
+
+    db.add_query_listener(_count_statement)
+    offsets = schedule(records, args.speed, args.max_gap)
+    tasks = []
+    started = time.perf_counter()
+    try:
+        for record, offset in zip(records, offsets):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(handle(record)))
+        await asyncio.gather(*tasks)
+    finally:
+        db.remove_query_listener(_count_statement)
+    wall = time.perf_counter() - started
+
+    await bot.session.close()
+    await fake.close()
+
+    captured: dict[str, list[float]] = defaultdict(list)
+    for record in records:
+        if record.get("ms") is not None:
+            captured[update_kind(record["update"])].append(float(record["ms"]) / 1000)
+
+    def merged(groups: dict[str, list[float]]) -> list[float]:
+        return [value for values in groups.values() for value in values]
+
+    kinds = sorted(latencies, key=lambda kind: -len(latencies[kind]))
+    handled = sum(len(values) for values in latencies.values())
+    return {
+        "meta": {
+            "capture": str(args.capture),
+            "database": str(args.db),
+            "speed": args.speed or "max",
+            "max_gap_s": args.max_gap,
+            "latency_ms": args.latency_ms,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "wall_s": round(wall, 3),
+        "updates": handled,
+        "updates_per_s": round(handled / wall, 1) if wall else 0.0,
+        "errors": dict(errors),
+        "bot_api_calls": fake.traffic()["calls"],
+        "all": {
+            "latency_ms": _summary(merged(latencies)),
+            "captured_ms": _summary(merged(captured)),
+            "queries": _summary(merged(queries), scale=1.0),
+            "statements": _summary(merged(statements), scale=1.0),
+            "queries_total": int(sum(merged(queries))),
+        },
+        "kinds": {
+            kind: {
+                "latency_ms": _summary(latencies[kind]),
+                "captured_ms": _summary(captured.get(kind, [])),
+                "queries": _summary(queries[kind], scale=1.0),
+                "statements": _summary(statements[kind], scale=1.0),
+            }
+            for kind in kinds
+        },
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    errors = sum(report["errors"].values())
+    print(
+        f"{report['updates']} updates in {report['wall_s']}s at speed {report['meta']['speed']} — "
+        f"{report['updates_per_s']} updates/s, {errors} errors, "
+        f"{report['all']['queries_total']} queries, {report['bot_api_calls']} Bot API calls"
+    )
+    header = (
+        f"{'':<26}{'n':>7}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        f"{'rec p50':>9}{'q mean':>8}{'q max':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    rows = [("all", report["all"])] + list(report["kinds"].items())
+    for name, row in rows:
+        lat, rec, q = row["latency_ms"], row["captured_ms"], row["queries"]
+        if not lat.get("n"):
+            continue
+        rec_p50 = f"{rec['p50']:>9.2f}" if rec.get("n") else f"{'—':>9}"
+        print(
+            f"{name[:25]:<26}{lat['n']:>7}{lat['p50']:>9.2f}{lat['p90']:>9.2f}{lat['p99']:>9.2f}"
+            f"{lat['max']:>9.2f}{rec_p50}{q['mean']:>8.1f}{q['max']:>7.0f}"
+        )
+
+
+def compare(current: dict[str, Any], previous: dict[str, Any]) -> None:
+    print("\nvs previous run (p90 latency, mean queries):")
+    old_kinds = {"all": previous.get("all", {}), **previous.get("kinds", {})}
+    new_kinds = {"all": current["all"], **current["kinds"]}
+    for kind, row in new_kinds.items():
+        old = old_kinds.get(kind)
+        if not old or not old.get("latency_ms", {}).get("n") or not row["latency_ms"].get("n"):
+            continue
+        p90_old, p90_new = old["latency_ms"]["p90"], row["latency_ms"]["p90"]
+        q_old, q_new = old["queries"]["mean"], row["queries"]["mean"]
+        ratio = p90_new / p90_old if p90_old else float("inf")
+        print(f"  {kind[:25]:<26}{p90_old:>9.2f} → {p90_new:<9.2f}({ratio:.2f}x)  queries {q_old:.1f} → {q_new:.1f}")
+
+
+def _speed(value: str) -> float:
+    value = value.strip().lower()
+    return 0.0 if value == "max" else float(value.rstrip("x×"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="gzip JSONL written via UPDATE_CAPTURE_PATH")
+    parser.add_argument("--db", default=DB_PATH, help="database to copy (default: DB_PATH)")
+    parser.add_argument("--speed", type=_speed, default=1.0, help="1, 10, … or max")
+    parser.add_argument("--max-gap", type=float, default=30.0, help="clamp idle gaps in the capture (seconds)")
+    parser.add_argument("--limit", type=int, help="replay only the first N updates")
+    parser.add_argument("--concurrency", type=int, default=256, help="updates in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake Bot API latency per call")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="JSON results file (default: benchmarks/results/replay-<time>.json)")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    parser.add_argument("--keep", action="store_true", help=f"keep the database copy under {_WORKDIR}")
+    args = parser.parse_args()
+
+    records = load_records(args.capture, args.limit)
+    if not records:
+        raise SystemExit(f"no updates in {args.capture}")
+    _WORKDIR.mkdir(parents=True, exist_ok=True)
+    copy = _WORKDIR / "replay.db"
+    _copy_database(Path(args.db), copy)
+    use_database(copy)
+    db.init_db()
+
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    report = asyncio.run(replay(records, args))
+    _print_report(report)
+    out = Path(args.out) if args.out else RESULTS_DIR / f"replay-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nresults: {out}")
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text("utf-8")))
+    if not args.keep:
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()